@@ -3,14 +3,17 @@ import os
 import time
 import json
 import random
-import math
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Playwright-compatible Camoufox (synchronous)
-from camoufox.sync_api import Camoufox
 from playwright.sync_api import TimeoutError as PlaywrightTimeout, Error as PlaywrightError
+from scraper_common import keywords
+from scraper_common.browser import instrument_browser
+from scraper_common.deeplinks import DeepLinks, follow
+from scraper_common.pagecheck import PageBlocked, check, goto, wait_for
+from humanize import Human, Tunables
+from store import NodeCache, VehicleDetails
 
 # --- Config / env ----------------------------------------------------------
 load_dotenv()
@@ -25,106 +28,13 @@ DEBUG_DIR = Path(os.getenv("DEBUG_DIR", "/tmp/7zap_debug"))
 DEBUG_DIR.mkdir(parents=True, exist_ok=True)
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 
-# Humanization tunables (conservative)
-HUMAN_DELAY_RANGE = (0.08, 0.28)
-TYPE_DELAY_RANGE_MS = (30, 90)
-MOUSE_STEPS_RANGE = (8, 28)
-SCROLL_CHANCE = 0.25
-SCROLL_PIXELS = (120, 420)
+# Humanization tunables (conservative: the humanize defaults), scaled down
+# by the session's profile (HUMANIZE_PROFILE)
+TUNABLES = Tunables()
 
 # --- Helpers ---------------------------------------------------------------
-def short_sleep(a=None, b=None):
-    lo, hi = (a, b) if a is not None else HUMAN_DELAY_RANGE
-    time.sleep(random.uniform(lo, hi))
-
-def bezier(p0, p1, p2, p3, t):
-    u = 1 - t
-    return (
-        (u**3) * p0[0] + 3 * (u**2) * t * p1[0] + 3 * u * (t**2) * p2[0] + (t**3) * p3[0],
-        (u**3) * p0[1] + 3 * (u**2) * t * p1[1] + 3 * u * (t**2) * p2[1] + (t**3) * p3[1],
-    )
-
-_MOUSE_POS = [random.randint(60, 240), random.randint(80, 260)]
-
-def move_mouse_curve(page, tx, ty):
-    global _MOUSE_POS
-    sx, sy = _MOUSE_POS
-    ex, ey = float(tx), float(ty)
-    dist = math.hypot(ex - sx, ey - sy) + 1
-    angle = math.atan2(ey - sy, ex - sx)
-    r = dist / 2.0
-    c1 = (sx + r * math.cos(angle + random.uniform(-0.35, 0.35)),
-          sy + r * math.sin(angle + random.uniform(-0.35, 0.35)))
-    c2 = (sx + r * math.cos(angle + random.uniform(-0.35, 0.35)),
-          sy + r * math.sin(angle + random.uniform(-0.35, 0.35)))
-    steps = random.randint(*MOUSE_STEPS_RANGE)
-    for i in range(1, steps + 1):
-        t = i / steps
-        x, y = bezier((sx, sy), c1, c2, (ex, ey), t)
-        try:
-            page.mouse.move(float(x), float(y), steps=1)
-        except Exception:
-            # best-effort; ignore movement errors
-            pass
-    for _ in range(random.randint(0, 2)):
-        try:
-            page.mouse.move(ex + random.uniform(-1.2, 1.2), ey + random.uniform(-1.2, 1.2), steps=1)
-        except Exception:
-            pass
-    _MOUSE_POS = [ex, ey]
-
-def click_like_human(page, locator, timeout=30000):
-    locator.wait_for(state="visible", timeout=timeout)
-    locator.scroll_into_view_if_needed()
-    bbox = locator.bounding_box()
-    if not bbox:
-        locator.click()
-        return
-    tx = bbox["x"] + random.uniform(bbox["width"] * 0.2, bbox["width"] * 0.8)
-    ty = bbox["y"] + random.uniform(bbox["height"] * 0.2, bbox["height"] * 0.8)
-    move_mouse_curve(page, tx, ty)
-    short_sleep(0.04, 0.14)
-    try:
-        page.mouse.down()
-        short_sleep(0.02, 0.06)
-        page.mouse.up()
-    except Exception:
-        locator.click()
-
-def type_like_human(page, locator, text):
-    try:
-        locator.click()
-    except Exception:
-        pass
-    short_sleep(0.04, 0.12)
-    for ch in text:
-        if random.random() < 0.05:
-            short_sleep(0.12, 0.35)
-        try:
-            page.keyboard.type(ch, delay=random.randint(*TYPE_DELAY_RANGE_MS))
-        except Exception:
-            try:
-                locator.fill(text)
-                return
-            except Exception:
-                pass
-
-def maybe_scroll(page):
-    if random.random() < SCROLL_CHANCE:
-        try:
-            page.mouse.wheel(0, random.randint(*SCROLL_PIXELS))
-        except Exception:
-            pass
-
-# Artifact helpers
-_console_logs = []
-def attach_console(page):
-    try:
-        page.on("console", lambda msg: _console_logs.append(f"{msg.type}: {msg.text}"))
-    except Exception:
-        pass
-
-def save_artifacts(page, tag):
+def save_artifacts(human, tag):
+    page = human.page
     ts = int(time.time())
     base = DEBUG_DIR / f"{ts}_{tag}"
     out = []
@@ -142,7 +52,7 @@ def save_artifacts(page, tag):
         logger.debug("html dump failed: %s", e)
     try:
         logf = base.with_suffix(".log")
-        logf.write_text("\n".join(_console_logs))
+        logf.write_text("\n".join(human.console))
         out.append(str(logf))
     except Exception:
         pass
@@ -173,12 +83,23 @@ def upload_to_gcs(paths):
 
 # --- Main flow -------------------------------------------------------------
 def require_args():
+    """VIN, canonical parts asked for, and whether to answer with a part -> numbers map.
+
+    ``<vin> <part>`` answers a list; ``<vin> part,part`` and ``<vin> --all``
+    (every AC part of the shared keywords) answer a map.
+    """
     if len(sys.argv) < 3:
-        print("Usage: python get_ac_parts.py <vin> <part>")
+        print("Usage: python get_ac_parts.py <vin> <part>[,<part>...]|--all")
         sys.exit(1)
     vin = sys.argv[1].strip()
-    part = " ".join(sys.argv[2:]).strip().lower()
-    return vin, part
+    if sys.argv[2] == "--all":
+        return vin, list(keywords.parts("7zap", "get_ac_parts.py")), True
+    names = " ".join(sys.argv[2:]).split(",")
+    parts = []
+    for name in names:
+        resolved = keywords.resolve("7zap", name)
+        parts.append(resolved.part if resolved else keywords.normalize(name))
+    return vin, parts, len(names) > 1
 
 def validate_env():
     if not (ZAP_USER and ZAP_PASS):
@@ -204,86 +125,202 @@ def find_vin_input(page, timeout=15000):
             continue
     return None
 
-def extract_parts_for(page, part):
-    parts = []
-    if part == "compressor":
-        page.locator(".zp-element-title.nodeTitle", has_text="Compressor / Parts").first.click()
-        page.locator(".zp-element-title.nodeTitle", has_text="HEATING & AIR CONDITIONING - COMPRESSOR").first.click()
-        rows = page.locator("div.px-1.flex-grow-1 > span", has_text="COMPRESSOR ASSY")
-    elif part == "evaporator":
-        page.locator(".zp-element-title.nodeTitle", has_text="Controls / Regulation").first.click()
-        page.locator(".zp-element-title.nodeTitle", has_text="HEATING & AIR CONDITIONING - COOLER UNIT").first.click()
-        rows = page.locator("div.px-1.flex-grow-1 > span", has_text="EVAPORATOR SUB-ASSY")
-    elif part == "expansion valve":
-        page.locator(".zp-element-title.nodeTitle", has_text="Controls / Regulation").first.click()
-        page.locator(".zp-element-title.nodeTitle", has_text="HEATING & AIR CONDITIONING - COOLER UNIT").first.click()
-        rows = page.locator("div.px-1.flex-grow-1 > span", has_text="VALVE")
-    else:
-        return parts
+def open_modification(human, vin):
+    """Click path from the logged-in home page to the VIN's first modification."""
+    page = human.page
+    # Focus / open search
     try:
-        rows.first.wait_for(state="attached", timeout=20000)
-        count = rows.count()
-        for i in range(count):
+        search_toggle = page.locator(".search.w-100, .search-toggle, .search-box").first
+        if search_toggle:
             try:
-                num = rows.nth(i).locator("strong").inner_text().strip()
-                if num:
-                    parts.append(num)
+                human.click_like_human(search_toggle)
             except Exception:
-                continue
+                pass
+    except Exception:
+        pass
+
+    vin_input = find_vin_input(page, timeout=20000)
+    if vin_input is None:
+        # try opening search via keyboard
+        try:
+            page.keyboard.press("/")
+            human.sleep(0.15, 0.4)
+            vin_input = find_vin_input(page, timeout=8000)
+        except Exception:
+            vin_input = None
+
+    if vin_input is None:
+        save_artifacts(human, "vin_input_missing")
+        raise PlaywrightTimeout("VIN input not found")
+
+    human.click_like_human(vin_input)
+    human.type_like_human(vin_input, vin)
+    human.sleep(0.25, 0.6)
+
+    # wait for results and click first modification
+    table = page.locator("#htmlTableModifications, .modifications-table").first
+    try:
+        # Returns early with PageBlocked if a challenge shows up instead
+        wait_for(page, "#htmlTableModifications a, .modifications-table a", timeout=45000)
+        # Vehicle data for /7zap/get-car-details while the table is up
+        try:
+            VehicleDetails().capture(page, vin)
+        except Exception as e:
+            logger.debug("modifications table not captured: %s", e)
+        first_mod = table.locator("a").first
+        first_mod.wait_for(state="visible", timeout=45000)
+        human.maybe_scroll()
+        human.click_like_human(first_mod, timeout=45000)
+    except PlaywrightTimeout:
+        save_artifacts(human, "first_mod_missing")
+        raise PlaywrightTimeout("First modification not found")
+
+    page.wait_for_load_state("domcontentloaded", timeout=30000)
+    human.sleep(1.2, 2.6)
+
+# Every part row under the open node in one evaluation: its text and the
+# part number in its <strong>
+_PART_ROWS_JS = """
+() => Array.from(document.querySelectorAll("div.px-1.flex-grow-1 > span"), (span) => {
+  const strong = span.querySelector("strong");
+  return {
+    text: (span.textContent || "").split(/\\s+/).filter(Boolean).join(" "),
+    num: strong ? (strong.textContent || "").trim() : "",
+  };
+})
+"""
+
+def open_ac_section(human):
+    """Expand and navigate to the AC section of the modification page."""
+    page = human.page
+    try:
+        wait_for(page, ".zp-element-title.nodeTitle", timeout=45000)
+        ac = page.locator(".zp-element-title.nodeTitle", has_text="Air Conditioning").first
+        ac.wait_for(state="visible", timeout=45000)
+        ac.scroll_into_view_if_needed()
+        human.click_like_human(ac)
     except PlaywrightTimeout:
-        logger.debug("rows did not appear for part=%s", part)
-    return parts
+        save_artifacts(human, "ac_section_missing")
+        raise PlaywrightTimeout("Air Conditioning section not found")
+
+    page.wait_for_load_state("domcontentloaded", timeout=30000)
+    human.sleep(1.2, 2.6)
+
+def node_paths(parts):
+    """Distinct catalog node paths (keywords ``nodes``) the parts need, in first-use order."""
+    paths = []
+    for part in parts:
+        resolved = keywords.resolve("7zap", part)
+        if resolved and tuple(resolved.plan["nodes"]) not in paths:
+            paths.append(tuple(resolved.plan["nodes"]))
+    return paths
+
+def parts_from(nodes, part):
+    """Part numbers of ``part`` from the rows of its node (``nodes``: path -> rows)."""
+    resolved = keywords.resolve("7zap", part)
+    if not resolved:
+        return []
+    label = resolved.plan["row"].lower()
+    rows = nodes.get(tuple(resolved.plan["nodes"])) or []
+    return [row["num"] for row in rows if row["num"] and label in row["text"].lower()]
+
+def read_node(page, path):
+    """Open the node at ``path`` (from the AC section) and read its part rows."""
+    for node in path:
+        page.locator(".zp-element-title.nodeTitle", has_text=node).first.click()
+    try:
+        page.locator("div.px-1.flex-grow-1 > span").first.wait_for(state="attached", timeout=20000)
+    except PlaywrightTimeout:
+        logger.debug("rows did not appear for node=%s", path[-1])
+        return []
+    return page.evaluate(_PART_ROWS_JS)
+
+def cached_nodes(cache, modification, paths):
+    """Rows of the ``paths`` cached for ``modification`` (nothing when it is not known)."""
+    if not modification:
+        return {}
+    found = {}
+    for path in paths:
+        rows = cache.get(modification, path)
+        if rows is not None:
+            found[path] = rows
+    return found
 
 def main():
-    vin, part = require_args()
+    vin, parts, as_map = require_args()
+
+    def answer(nodes):
+        result = {part: parts_from(nodes, part) for part in parts}
+        for part, nums in result.items():
+            logger.info("Extracted %d parts for %s", len(nums), part)
+        print(json.dumps(result if as_map else result[parts[0]], indent=1))
+
+    # Nodes read before for this VIN's modification (store.NodeCache), found
+    # through its stored deep link; all there means no browser at all
+    links = DeepLinks("7zap", vin)
+    cache = NodeCache()
+    paths = node_paths(parts)
+    nodes = cached_nodes(cache, links.get("vehicle"), paths)
+    if len(nodes) == len(paths):
+        answer(nodes)
+        return 0
+
     validate_env()
-    logger.info("VIN=%s part=%s headless=%s", vin, part, HEADLESS)
+    logger.info("VIN=%s parts=%s headless=%s", vin, parts, HEADLESS)
+
+    # Playwright-compatible Camoufox (synchronous). Imported only once the
+    # arguments and credentials are known to be usable: it is the heaviest
+    # import of any scraper (pre-imported when running under the fork server).
+    from camoufox.sync_api import Camoufox
 
+    human = None
     try:
         with Camoufox(headless=HEADLESS, humanize=False, window=(1366, 864)) as browser:
+            instrument_browser(browser)
             page = browser.new_page()
-            attach_console(page)
+            human = Human(page, TUNABLES)
             try:
                 # prefer explicit english landing to stabilise UI
                 page.goto("https://7zap.com/en/", timeout=60000)
             except Exception:
                 page.goto("https://7zap.com", timeout=60000)
             page.wait_for_load_state("domcontentloaded", timeout=30000)
-            short_sleep()
-            maybe_scroll(page)
+            check(page)
+            human.sleep()
+            human.maybe_scroll()
 
             # accept cookie banners (best-effort)
             try:
                 consent = page.locator("button:has-text('Accept'), button:has-text('I agree'), #onetrust-accept-btn-handler").first
                 if consent and consent.is_visible():
-                    click_like_human(page, consent)
-                    short_sleep()
+                    human.click_like_human(consent)
+                    human.sleep()
             except Exception:
                 pass
 
             # open login
             login_icon = page.locator("a:has(i.fa-user), a.account, .cabinet-link, a[href*='login']").first
             try:
-                click_like_human(page, login_icon)
+                human.click_like_human(login_icon)
             except PlaywrightTimeout:
                 logger.debug("login icon not clickable; continuing")
 
-            short_sleep()
+            human.sleep()
             # try to fill creds if modal exists
             try:
                 panel = page.locator("div.cabinet-panel-on").first
                 if panel and panel.is_visible():
                     user_input = panel.locator("input").nth(0)
                     pass_input = panel.locator("input").nth(1)
-                    click_like_human(page, user_input)
-                    type_like_human(page, user_input, ZAP_USER)
-                    short_sleep()
-                    click_like_human(page, pass_input)
-                    type_like_human(page, pass_input, ZAP_PASS)
-                    short_sleep()
+                    human.click_like_human(user_input)
+                    human.type_like_human(user_input, ZAP_USER)
+                    human.sleep()
+                    human.click_like_human(pass_input)
+                    human.type_like_human(pass_input, ZAP_PASS)
+                    human.sleep()
                     submit_btn = panel.locator("button:has-text('Login'), button[type='submit']").first
                     try:
-                        click_like_human(page, submit_btn)
+                        human.click_like_human(submit_btn)
                     except Exception:
                         pass
             except Exception:
@@ -293,70 +330,40 @@ def main():
             page.wait_for_timeout(1500)
             maybe_long = random.random()
             if maybe_long < 0.3:
-                short_sleep(0.5, 1.2)
-
-            # Focus / open search
-            try:
-                search_toggle = page.locator(".search.w-100, .search-toggle, .search-box").first
-                if search_toggle:
-                    try:
-                        click_like_human(page, search_toggle)
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-
-            vin_input = find_vin_input(page, timeout=20000)
-            if vin_input is None:
-                # try opening search via keyboard
-                try:
-                    page.keyboard.press("/")
-                    short_sleep(0.15, 0.4)
-                    vin_input = find_vin_input(page, timeout=8000)
-                except Exception:
-                    vin_input = None
-
-            if vin_input is None:
-                save_artifacts(page, "vin_input_missing")
-                raise PlaywrightTimeout("VIN input not found")
-
-            click_like_human(page, vin_input)
-            type_like_human(page, vin_input, vin)
-            short_sleep(0.25, 0.6)
-
-            # wait for results and click first modification
-            table = page.locator("#htmlTableModifications, .modifications-table").first
-            try:
-                first_mod = table.locator("a").first
-                first_mod.wait_for(state="visible", timeout=45000)
-                maybe_scroll(page)
-                click_like_human(page, first_mod, timeout=45000)
-            except PlaywrightTimeout:
-                save_artifacts(page, "first_mod_missing")
-                raise PlaywrightTimeout("First modification not found")
-
-            page.wait_for_load_state("domcontentloaded", timeout=30000)
-            short_sleep(1.2, 2.6)
-
-            # expand and navigate to AC section
-            try:
-                ac = page.locator(".zp-element-title.nodeTitle", has_text="Air Conditioning").first
-                ac.wait_for(state="visible", timeout=45000)
-                ac.scroll_into_view_if_needed()
-                click_like_human(page, ac)
-            except PlaywrightTimeout:
-                save_artifacts(page, "ac_section_missing")
-                raise PlaywrightTimeout("Air Conditioning section not found")
-
-            page.wait_for_load_state("domcontentloaded", timeout=30000)
-            short_sleep(1.2, 2.6)
-
-            part_nums = extract_parts_for(page, part)
-            logger.info("Extracted %d parts for %s", len(part_nums), part)
-            print(json.dumps(part_nums, indent=1))
+                human.sleep(0.5, 1.2)
+
+            # Modification page: opened directly when this VIN was looked up
+            # before (scraper_common/deeplinks.py)
+            follow(page, links, "vehicle", ".zp-element-title.nodeTitle",
+                   lambda: open_modification(human, vin))
+            modification = links.get("vehicle") or page.url
+            nodes = cached_nodes(cache, modification, paths)
+
+            # Each node not cached yet is read once, from a fresh AC section
+            for i, path in enumerate(p for p in paths if p not in nodes):
+                if i:
+                    goto(page, modification, wait_until="domcontentloaded")
+                open_ac_section(human)
+                rows = read_node(page, path)
+                if rows:
+                    cache.put(modification, path, rows)
+                nodes[path] = rows
+
+            human.done()
+            answer(nodes)
             return 0
 
+    except PageBlocked as e:
+        if human:
+            human.done(blocked=True)
+        logger.error("Blocked: %s", e)
+        print(f"Blocked: {e.kind}")
+        return 4
     except PlaywrightTimeout as e:
+        # 7zap tends to stall rather than answer a challenge page: a timeout
+        # counts as blocked for profile selection
+        if human:
+            human.done(blocked=True)
         logger.error("Operation timed out: %s", e)
         # ensure artifacts printed to stdout so server can capture paths
         try:
@@ -376,6 +383,10 @@ def main():
         logger.exception("Unhandled error")
         print(f"Error: {e}")
         return 1
+    finally:
+        # Any other failure says nothing about the profile: not counted
+        if human:
+            human.done(record=False)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,295 @@
+"""Human-looking input for 7zap pages, one session object per page.
+
+``Human(page, tunables)`` keeps everything the helpers used to share as
+module globals: where its mouse is, and the page's recent console lines
+(a ring buffer of ``CONSOLE_LOG_LIMIT`` lines, dumped with the debug
+artifacts). Any number of pages can therefore run in one process without
+their mouse paths or logs mixing.
+
+Each session runs one of three profiles:
+
+    full    the script's tunables as given
+    light   short mouse paths, no typing pauses, pauses at 30%
+    off     plain clicks and fills, no pauses or scrolling
+
+``HUMANIZE_PROFILE`` picks one; ``auto`` (the default) takes the cheapest
+profile, but not below ``HUMANIZE_MIN_PROFILE``, whose block rate over the
+last ``HUMANIZE_WINDOW_H`` hours is at most ``HUMANIZE_MAX_BLOCK_RATE``.
+Outcomes are kept in ``humanize.sqlite`` (see ``state``); ``done`` records
+the session's, and reports the time spent on humanized input as
+``humanize.ms``. A run that failed for reasons that say nothing about
+detection ends with ``done(record=False)`` and is not counted.
+
+Input goes out in few driver calls: a mouse path is sent as a handful of
+``mouse.move(steps=n)`` segments and text as one ``keyboard.type`` per run
+of keys between pauses. (Synthetic events dispatched inside the page would
+be cheaper still, but are untrusted and tell a script from a user.)
+
+Input is best-effort: a failed mouse move is skipped, a failed press falls
+back to ``locator.click()`` and failed typing to ``locator.fill()``.
+"""
+import os
+import math
+import time
+import random
+from collections import deque, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from scraper_common import metrics, state
+
+CONSOLE_LOG_LIMIT = int(os.getenv("CONSOLE_LOG_LIMIT", "500"))
+PROFILE = os.getenv("HUMANIZE_PROFILE", "auto").lower()
+MIN_PROFILE = os.getenv("HUMANIZE_MIN_PROFILE", "light").lower()
+MAX_BLOCK_RATE = float(os.getenv("HUMANIZE_MAX_BLOCK_RATE", "0.1"))
+WINDOW_S = float(os.getenv("HUMANIZE_WINDOW_H", "6")) * 3600.0
+
+# Cheapest first
+PROFILES = ("off", "light", "full")
+
+Tunables = namedtuple(
+    "Tunables",
+    "delay click_hesitation after_click long_think type_delay_ms key_pause_chance"
+    " mouse_steps jitter scroll_chance scroll_pixels after_scroll start"
+    " pace mouse path_segments",
+    defaults=(
+        (0.08, 0.28),   # delay: short pause between actions (s)
+        (0.04, 0.14),   # click_hesitation: over the target, before pressing
+        None,           # after_click: pause after a click, if any
+        (0.6, 1.2),     # long_think: an occasional longer pause
+        (30, 90),       # type_delay_ms: per key
+        0.05,           # key_pause_chance: chance of a pause before a key
+        (8, 28),        # mouse_steps: points along a mouse path
+        1.2,            # jitter: overshoot wiggle at the end of a path (px)
+        0.25,           # scroll_chance
+        (120, 420),     # scroll_pixels
+        None,           # after_scroll: pause after a scroll, if any
+        ((60, 240), (80, 260)),  # start: x and y ranges of the first mouse position
+        1.0,            # pace: factor on every pause
+        True,           # mouse: move and press the mouse (else locator clicks / fills)
+        4,              # path_segments: driver calls a mouse path is sent in
+    ),
+)
+
+
+def profile_tunables(profile: str, full: Tunables) -> Tunables:
+    """``full`` scaled down to ``profile``."""
+    if profile == "off":
+        return full._replace(pace=0.0, mouse=False, scroll_chance=0.0, key_pause_chance=0.0)
+    if profile == "light":
+        return full._replace(
+            pace=0.3, mouse_steps=(4, 8), path_segments=2, jitter=0.0,
+            key_pause_chance=0.0, type_delay_ms=(10, 30), scroll_chance=full.scroll_chance / 2,
+        )
+    return full
+
+
+_DB_FILE = "humanize.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    profile TEXT NOT NULL,
+    blocked INTEGER NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_finished ON runs (finished);
+"""
+
+
+def _db():
+    conn = state.connect(_DB_FILE)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def block_rates() -> Dict[str, float]:
+    """Block rate of each profile over the window (0 for a profile without runs)."""
+    rows = _db().execute(
+        "SELECT profile, AVG(blocked) FROM runs WHERE finished >= ? GROUP BY profile",
+        (time.time() - WINDOW_S,),
+    ).fetchall()
+    rates = {profile: 0.0 for profile in PROFILES}
+    rates.update(dict(rows))
+    return rates
+
+
+def choose_profile() -> str:
+    if PROFILE in PROFILES:
+        return PROFILE
+    floor = PROFILES.index(MIN_PROFILE) if MIN_PROFILE in PROFILES else 0
+    try:
+        rates = block_rates()
+    except Exception:
+        return "full"
+    for profile in PROFILES[floor:]:
+        if rates[profile] <= MAX_BLOCK_RATE:
+            return profile
+    return "full"
+
+
+def bezier(p0, p1, p2, p3, t):
+    u = 1 - t
+    return (
+        (u**3) * p0[0] + 3 * (u**2) * t * p1[0] + 3 * u * (t**2) * p2[0] + (t**3) * p3[0],
+        (u**3) * p0[1] + 3 * (u**2) * t * p1[1] + 3 * u * (t**2) * p2[1] + (t**3) * p3[1],
+    )
+
+
+class Human:
+    """Humanized mouse, keyboard and scrolling on one page."""
+
+    def __init__(self, page, tunables: Tunables = Tunables(), profile: Optional[str] = None,
+                 console_limit: int = CONSOLE_LOG_LIMIT):
+        self.page = page
+        self.profile = profile or choose_profile()
+        self.tunables = profile_tunables(self.profile, tunables)
+        (x_lo, x_hi), (y_lo, y_hi) = tunables.start
+        self.mouse: Tuple[float, float] = (random.randint(x_lo, x_hi), random.randint(y_lo, y_hi))
+        self.console = deque(maxlen=console_limit)
+        # Seconds spent on pauses and humanized input
+        self.spent_s = 0.0
+        self._done = False
+        try:
+            page.on("console", lambda msg: self.console.append(f"{msg.type}: {msg.text}"))
+        except Exception:
+            pass
+
+    def done(self, blocked: bool = False, record: bool = True):
+        """Report the session's humanization time and, with ``record``, its outcome for profile selection.
+
+        Only the first call counts, so a script can call ``done(record=False)``
+        in a ``finally`` after recording the outcome on its success and
+        block paths.
+        """
+        if self._done:
+            return
+        self._done = True
+        metrics.emit("humanize.ms", self.spent_s * 1000.0, profile=self.profile)
+        if not record:
+            return
+        metrics.emit("humanize.runs", 1, profile=self.profile, result="blocked" if blocked else "ok")
+        try:
+            conn = _db()
+            now = time.time()
+            conn.execute(
+                "INSERT INTO runs (profile, blocked, finished) VALUES (?, ?, ?)",
+                (self.profile, int(blocked), now),
+            )
+            conn.execute("DELETE FROM runs WHERE finished < ?", (now - WINDOW_S,))
+        except Exception:
+            pass
+
+    def sleep(self, a=None, b=None):
+        lo, hi = (a, b) if a is not None else self.tunables.delay
+        seconds = random.uniform(lo, hi) * self.tunables.pace
+        if seconds > 0:
+            time.sleep(seconds)
+            self.spent_s += seconds
+
+    def maybe_long_think(self, p=0.22):
+        if random.random() < p:
+            self.sleep(*self.tunables.long_think)
+
+    def path(self, tx: float, ty: float) -> List[Tuple[float, float]]:
+        """Points of a curved mouse path from the current position to (tx, ty)."""
+        sx, sy = self.mouse
+        ex, ey = float(tx), float(ty)
+        dist = math.hypot(ex - sx, ey - sy) + 1
+        angle = math.atan2(ey - sy, ex - sx)
+        r = dist / 2.0
+        c1 = (sx + r * math.cos(angle + random.uniform(-0.35, 0.35)),
+              sy + r * math.sin(angle + random.uniform(-0.35, 0.35)))
+        c2 = (sx + r * math.cos(angle + random.uniform(-0.35, 0.35)),
+              sy + r * math.sin(angle + random.uniform(-0.35, 0.35)))
+        steps = random.randint(*self.tunables.mouse_steps)
+        return [bezier((sx, sy), c1, c2, (ex, ey), i / steps) for i in range(1, steps + 1)]
+
+    def move_mouse_curve(self, tx, ty):
+        """Move along ``path``: a few waypoints, the driver filling in the points between."""
+        t0 = time.perf_counter()
+        points = self.path(tx, ty)
+        segments = max(1, min(self.tunables.path_segments, len(points)))
+        moves = []
+        sent = 0
+        for s in range(1, segments + 1):
+            end = round(s * len(points) / segments)
+            moves.append((points[end - 1], end - sent))
+            sent = end
+        jitter = self.tunables.jitter
+        if jitter:
+            for _ in range(random.randint(0, 2)):
+                moves.append(((tx + random.uniform(-jitter, jitter), ty + random.uniform(-jitter, jitter)), 1))
+        for (x, y), steps in moves:
+            try:
+                self.page.mouse.move(float(x), float(y), steps=steps)
+            except Exception:
+                # best-effort; ignore movement errors
+                pass
+        self.mouse = (float(tx), float(ty))
+        self.spent_s += time.perf_counter() - t0
+
+    def click_like_human(self, locator, timeout: Optional[float] = None):
+        if not self.tunables.mouse:
+            locator.click(timeout=timeout)
+            return
+        locator.wait_for(state="visible", timeout=timeout)
+        locator.scroll_into_view_if_needed()
+        bbox = locator.bounding_box()
+        if not bbox:
+            try:
+                locator.hover(timeout=2000)
+                bbox = locator.bounding_box()
+            except Exception:
+                pass
+        if not bbox:
+            locator.click()
+            return
+        tx = bbox["x"] + random.uniform(bbox["width"] * 0.2, bbox["width"] * 0.8)
+        ty = bbox["y"] + random.uniform(bbox["height"] * 0.2, bbox["height"] * 0.8)
+        self.move_mouse_curve(tx, ty)
+        self.sleep(*self.tunables.click_hesitation)
+        try:
+            self.page.mouse.down()
+            self.sleep(0.02, 0.06)
+            self.page.mouse.up()
+        except Exception:
+            locator.click()
+        if self.tunables.after_click:
+            self.sleep(*self.tunables.after_click)
+
+    def type_like_human(self, locator, text: str):
+        if not self.tunables.mouse:
+            locator.fill(text)
+            return
+        try:
+            locator.click()
+        except Exception:
+            pass
+        self.sleep(0.04, 0.12)
+        # Runs of keys typed in one call each, pausing between runs
+        runs = [""]
+        for ch in text:
+            if runs[-1] and random.random() < self.tunables.key_pause_chance:
+                runs.append("")
+            runs[-1] += ch
+        for i, keys in enumerate(runs):
+            if i:
+                self.sleep(0.12, 0.35)
+            t0 = time.perf_counter()
+            try:
+                self.page.keyboard.type(keys, delay=random.randint(*self.tunables.type_delay_ms))
+            except Exception:
+                try:
+                    locator.fill(text)
+                    return
+                except Exception:
+                    pass
+            finally:
+                self.spent_s += time.perf_counter() - t0
+
+    def maybe_scroll(self):
+        if random.random() < self.tunables.scroll_chance:
+            try:
+                self.page.mouse.wheel(0, random.randint(*self.tunables.scroll_pixels))
+            except Exception:
+                return
+            if self.tunables.after_scroll:
+                self.sleep(*self.tunables.after_scroll)
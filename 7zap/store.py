@@ -0,0 +1,107 @@
+"""What 7zap runs have read, kept for the next ones (``7zap.sqlite``, see ``state``).
+
+``VehicleDetails`` holds per VIN the vehicle data of the VIN search's
+modifications table, captured by whichever script ran the search.
+``NodeCache`` holds the part rows of each catalog node per modification
+(the modification page's URL), read once and shared by every part the
+node lists. Entries older than ``ZAP_CACHE_TTL_H`` hours are not used.
+"""
+import os
+import json
+import time
+from typing import Dict, List, Optional, Sequence
+
+from scraper_common import state
+
+CACHE_TTL_S = float(os.getenv("ZAP_CACHE_TTL_H", "168")) * 3600.0
+
+_DB_FILE = "7zap.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    modification TEXT NOT NULL,
+    path TEXT NOT NULL,
+    rows TEXT NOT NULL,
+    read REAL NOT NULL,
+    PRIMARY KEY (modification, path)
+);
+CREATE TABLE IF NOT EXISTS vehicles (
+    vin TEXT PRIMARY KEY,
+    details TEXT NOT NULL,
+    read REAL NOT NULL
+);
+"""
+
+# Header -> value of the modifications table the VIN search shows, in one
+# evaluation; column 0 ("#") is skipped
+MODIFICATIONS_JS = """
+() => {
+  const table = document.querySelector("#htmlTableModifications");
+  if (!table) return {};
+  const headers = Array.from(table.querySelectorAll("thead tr th"), (th) => th.innerText.trim());
+  const values = Array.from(table.querySelectorAll("tbody tr td"), (td) => td.innerText.trim());
+  const details = {};
+  for (let i = 1; i < Math.min(headers.length, values.length); i++) details[headers[i]] = values[i];
+  return details;
+}
+"""
+
+
+def _path_key(path: Sequence[str]) -> str:
+    return " > ".join(path)
+
+
+class NodeCache:
+    def __init__(self):
+        self.conn = state.connect(_DB_FILE)
+        self.conn.executescript(_SCHEMA)
+
+    def get(self, modification: str, path: Sequence[str]) -> Optional[List[Dict[str, str]]]:
+        """Fresh rows (``{"text", "num"}``) of the node at ``path``, else None."""
+        row = self.conn.execute(
+            "SELECT rows, read FROM nodes WHERE modification = ? AND path = ?",
+            (modification, _path_key(path)),
+        ).fetchone()
+        if not row or time.time() - row[1] > CACHE_TTL_S:
+            return None
+        return json.loads(row[0])
+
+    def put(self, modification: str, path: Sequence[str], rows: List[Dict[str, str]]):
+        self.conn.execute(
+            "INSERT INTO nodes (modification, path, rows, read) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(modification, path) DO UPDATE SET rows = excluded.rows, read = excluded.read",
+            (modification, _path_key(path), json.dumps(rows, ensure_ascii=False), time.time()),
+        )
+
+
+class VehicleDetails:
+    def __init__(self):
+        self.conn = state.connect(_DB_FILE)
+        self.conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _key(vin: str) -> str:
+        return vin.strip().upper()
+
+    def get(self, vin: str) -> Optional[Dict[str, str]]:
+        """Fresh stored vehicle data of ``vin``, else None."""
+        row = self.conn.execute(
+            "SELECT details, read FROM vehicles WHERE vin = ?", (self._key(vin),)
+        ).fetchone()
+        if not row or time.time() - row[1] > CACHE_TTL_S:
+            return None
+        return json.loads(row[0])
+
+    def put(self, vin: str, details: Dict[str, str]):
+        if not details:
+            return
+        self.conn.execute(
+            "INSERT INTO vehicles (vin, details, read) VALUES (?, ?, ?) "
+            "ON CONFLICT(vin) DO UPDATE SET details = excluded.details, read = excluded.read",
+            (self._key(vin), json.dumps(details, ensure_ascii=False), time.time()),
+        )
+
+    def capture(self, page, vin: str) -> Dict[str, str]:
+        """Read the modifications table the page shows and store it for ``vin``."""
+        details = page.evaluate(MODIFICATIONS_JS)
+        self.put(vin, details)
+        return details
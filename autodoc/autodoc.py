@@ -1,6 +1,8 @@
 import sys
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common.pagecheck import goto, wait_for
 import re
 import json
 
@@ -10,12 +12,12 @@ def main():
         sys.exit(1)
     part_num = str(sys.argv[1]).capitalize()
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True,timeout=30000)
+        browser = launch_chromium(p, headless=True,timeout=30000)
         context = browser.new_context()
         context.set_default_timeout(60000)
         context.set_default_navigation_timeout(60000)
         page = context.new_page()
-        page.goto(f"https://www.autodoc.co.uk/spares-search?keyword={part_num}")
+        goto(page, f"https://www.autodoc.co.uk/spares-search?keyword={part_num}")
         page.wait_for_load_state('domcontentloaded')
         
         #reject cookies
@@ -30,7 +32,7 @@ def main():
             
 
             
-        first_listing = page.locator(".listing-item__name").nth(0)
+        first_listing = wait_for(page, ".listing-item__name", timeout=60000).nth(0)
         first_listing.click()
         page.wait_for_load_state('domcontentloaded')
         
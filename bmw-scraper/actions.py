@@ -1,64 +1,196 @@
+import re
+from functools import cached_property
+from typing import List, Optional
+from scraper_common import keywords, metrics, partindex
+from scraper_common.deeplinks import DeepLinks, follow_path
+from scraper_common.pagecheck import goto
+from info_layer.ac_info import ACInfo
+from info_layer.brake_info import BrakeInfo
+from info_layer.general_info import GeneralInfo
+from info_layer.quick_service_info import QuickServiceInfo
+from info_layer.radiator_info import RadiatorInfo
 from operator_layer.general_operator import GeneralOperator
-from operator_layer.ac_operator import ACOperator
-from playwright.sync_api import Page
-from operator_layer.quick_service_operator import QuickServiceOperator
-from operator_layer.brake_operator import BrakeOperator
-from operator_layer.radiator_operator import RadiatorOperator
+from partsdb import OfflinePlan, PartsDB, normalize_vin
+
+REALOEM_HOME = "http://www.realoem.com"
+
+# Keyword maps of the find_* flows, from the shared catalog keywords
+# (scraper_common/keywords.json); callers pass canonical part names.
 AC_KEYWORD_MAP = {
-    "evaporator": "evaporator_expansion_valve",
-    "expansion valve": "evaporator_expansion_valve",
-    "microfilter": "microfilter",
-    "heater": "heater_radiator",
-    "fresh air": "fresh_air_grille",
-    "air channel": "air_channel",
-    "cooling hose": "cooling_water_hoses",
-    "aux hose": "coolant_hoses_aux",
-    "distribution housing": "dist_housing",
-    "filter housing": "filter_housing",
-    "condenser": "condenser",
-    "compressor": "compressor",
-    "compressor bracket": "compressor",
-    "bracket": "compressor"
+    name: r.plan["section"] for name, r in keywords.parts("realoem", "get_ac_parts.py").items()
 }
 
-OIL_SERVICE_KEYWORDS = [
-    "oil-filter",
-    "air filter",
-    "spark plugs",
-    "spark plug",
-    "micro filter",
-]
+_SERVICE_PARTS = keywords.parts("realoem", "get_maintenance_parts.py")
+
+OIL_SERVICE_KEYWORDS = [name for name, r in _SERVICE_PARTS.items() if r.plan["service"] == "oil"]
 
 BRAKE_SERVICE_KEYWORDS = {
-    "brake discs" : "brake disc",
-    "brake disc": "brake disc",
-    "front brake disc": "brake disc",
-    "rear brake disc": "brake disc"
+    name: r.plan["match"] for name, r in _SERVICE_PARTS.items() if r.plan["service"] == "brake"
+}
+
+
+def canonical_part(text: str) -> str:
+    """Canonical RealOEM part name of ``text`` (unchanged when unknown)."""
+    resolved = keywords.resolve("realoem", text)
+    return resolved.part if resolved else text
+
+
+def _title(selector: str) -> str:
+    """Subgroup title an info-layer ``has-text`` selector clicks."""
+    return re.search(r"has-text\('([^']+)'\)", selector).group(1)
+
+
+# (subgroup titles, description filter) of each find_brake_part_by_keyword branch
+BRAKE_OFFLINE = {
+    "front brake disc": ([_title(BrakeInfo.FRONT_BRAKE)], "brake disc"),
+    "rear brake disc": ([_title(BrakeInfo.REAR_BRAKE)], "brake disc"),
+    "front brake pad wear sensor": ([_title(BrakeInfo.FRONT_SENSOR)], "Brake pad wear sensor"),
+    "rear brake pad wear sensor": (
+        [_title(BrakeInfo.REAR_SENSOR), _title(BrakeInfo.REAR_SENSOR_ALT)],
+        "Brake pad wear sensor, rear",
+    ),
+    "brake pads": ([_title(BrakeInfo.BRAKE_PADS)], "brake pads"),
 }
 
+# ... and of each find_radiator_part_by_keyword branch
+RADIATOR_OFFLINE = {
+    "radiator": ([(_title(RadiatorInfo.RADIATOR), "MOUNTING")], "Radiator"),
+    "expansion tank": ([_title(RadiatorInfo.EXPANSION_TANK)], "Expansion tank"),
+    "fan housing w/ fan": (
+        [_title(RadiatorInfo.FAN_HOUSING_W_FAN), _title(RadiatorInfo.FAN_HOUSING_W_FAN_ALT)],
+        "Fan housing with fan",
+    ),
+}
+
+
+def offline_plan(flow: str, keyword: str) -> Optional[OfflinePlan]:
+    """Where the find_<flow>_part_by_keyword answer sits in the offline parts DB."""
+    kw = keyword.lower()
+    if flow == "ac":
+        section = AC_KEYWORD_MAP.get(kw)
+        if not section:
+            return None
+        exclude = ("oil", "bracket") if kw == "compressor" else ()
+        return OfflinePlan("heater and air conditioning", [_title(getattr(ACInfo, section.upper()))], kw, exclude)
+    if flow == "service":
+        if kw in OIL_SERVICE_KEYWORDS:
+            return OfflinePlan("service and scope of repair work", [_title(QuickServiceInfo.OIL_MAINTENANCE)],
+                               kw, with_qty=kw == "spark plug")
+        if kw in BRAKE_SERVICE_KEYWORDS:
+            return OfflinePlan("service and scope of repair work", [_title(QuickServiceInfo.BRAKE_SERVICE)],
+                               BRAKE_SERVICE_KEYWORDS[kw], ("repair kit",))
+        return None
+    if flow == "brake" and keyword in BRAKE_OFFLINE:
+        titles, match = BRAKE_OFFLINE[keyword]
+        return OfflinePlan("brakes", titles, match, ("repair kit",))
+    if flow == "radiator" and keyword in RADIATOR_OFFLINE:
+        titles, match = RADIATOR_OFFLINE[keyword]
+        return OfflinePlan("radiator", titles, match, ("screw cap", "bracket"), unique=True)
+    return None
+
+
+def find_offline(flow: str, vin: str, keyword: str) -> Optional[List]:
+    """Answer a find-part from the offline parts DB; None when the vehicle is not covered."""
+    plan = offline_plan(flow, keyword)
+    if plan is None:
+        return None
+    try:
+        with metrics.timer("partsdb.lookup_ms", flow=flow):
+            result = PartsDB().lookup(vin, plan)
+    except Exception:
+        result = None
+    metrics.emit("partsdb.lookup", 1, flow=flow, result="miss" if result is None else "hit")
+    return result
+
+
+
+def index_result(flow: str, vin: str, keyword: str, result: Optional[List]):
+    """Record part numbers found by a live find_* flow in the reverse part index."""
+    plan = offline_plan(flow, keyword)
+    if not plan or not result:
+        return
+    try:
+        vehicle = PartsDB().vehicle_for(vin) or f"VIN:{normalize_vin(vin)}"
+    except Exception:
+        vehicle = f"VIN:{normalize_vin(vin)}"
+    title = plan.titles[0]
+    subgroup = title if isinstance(title, str) else " ".join(title)
+    partindex.add(
+        (found[0] if isinstance(found, (list, tuple)) else found, vehicle, plan.group, subgroup, None)
+        for found in result
+    )
+
+
 class Actions:
     def __init__(self, page):
+        self.page = page
         self.general = GeneralOperator(page)
-        self.ac = ACOperator(page)
-        self.quick = QuickServiceOperator(page)
-        self.brake = BrakeOperator(page)
-        self.radiator = RadiatorOperator(page)
 
-    def find_ac_part_by_keyword(self, vin: str, keyword: str):
-        section = AC_KEYWORD_MAP.get(keyword.lower())
-        if not section:
-            raise ValueError(f"No AC section found for keyword: {keyword}")
+    # Section operators are imported on first use so a run only loads the
+    # one its flow needs (get_car_details needs none of them).
+    @cached_property
+    def ac(self):
+        from operator_layer.ac_operator import ACOperator
+        return ACOperator(self.page, self.general)
+
+    @cached_property
+    def quick(self):
+        from operator_layer.quick_service_operator import QuickServiceOperator
+        return QuickServiceOperator(self.page, self.general)
+
+    @cached_property
+    def brake(self):
+        from operator_layer.brake_operator import BrakeOperator
+        return BrakeOperator(self.page, self.general)
+
+    @cached_property
+    def radiator(self):
+        from operator_layer.radiator_operator import RadiatorOperator
+        return RadiatorOperator(self.page, self.general)
+
+    def _select_vehicle(self, vin: str, adblock_wait_ms: int = 0):
+        """Click path from the home page to the vehicle's group list."""
+        goto(self.page, REALOEM_HOME, wait_until="domcontentloaded")
+        if adblock_wait_ms:
+            self.general.await_adblock(adblock_wait_ms)
         self.general.dismiss_adblock()
         self.general.click_bmw_catalog()
         self.general.enter_vin(vin)
         self.general.click_first_search()
         self.general.click_browse_parts()
-        self.general.click_heater_ac()
+
+    def _open(self, vin: str, group: tuple, subgroup: Optional[tuple] = None, adblock_wait_ms: int = 0):
+        """Open a group page, or one of its subgroups, of ``vin``'s vehicle.
+
+        ``group`` is (group tile selector, click), ``subgroup`` is (name,
+        click). Pages opened before for the same vehicle are gone to
+        directly (scraper_common/deeplinks.py).
+        """
+        tile, click_group = group
+        # The group list shows .title tiles too: a group page is only
+        # recognised by the subgroup tile about to be clicked
+        group_ready = f"a:has(div:has-text('{subgroup[0]}'))" if subgroup else ".title"
+        steps = [
+            ("vehicle", tile, lambda: self._select_vehicle(vin, adblock_wait_ms)),
+            (f"group/{_title(tile)}", group_ready, click_group),
+        ]
+        if subgroup:
+            name, click_subgroup = subgroup
+            steps.append((f"subgroup/{name}", "#partsList", click_subgroup))
+        follow_path(self.page, DeepLinks("realoem", normalize_vin(vin)), steps)
+
+    def find_ac_part_by_keyword(self, vin: str, keyword: str):
+        section = AC_KEYWORD_MAP.get(keyword.lower())
+        if not section:
+            raise ValueError(f"No AC section found for keyword: {keyword}")
         ac_method = getattr(self.ac, f"click_{section}", None)
-        if ac_method:
-            ac_method()
-        else:
+        if not ac_method:
             raise ValueError(f"AC section '{section}' not found in ACOperator.")
+        self._open(
+            vin,
+            (GeneralInfo.HEATER_AC, self.general.click_heater_ac),
+            (_title(getattr(ACInfo, section.upper())), ac_method),
+        )
 
         self.general.page.wait_for_selector("tbody tr")
 
@@ -94,72 +226,57 @@ class Actions:
         return self.general.get_car_details()
     
     def find_service_part_by_keyword(self, vin: str, keyword:str):
-        self.general.dismiss_adblock()
-        self.general.click_bmw_catalog()
-        self.general.enter_vin(vin)
-        self.general.click_first_search()
-        self.general.click_browse_parts()
-        self.general.click_quick_service_parts()
-        
+        quick_service = (GeneralInfo.QUICK_SERVICE, self.general.click_quick_service_parts)
         result = None
         if keyword.lower() in OIL_SERVICE_KEYWORDS:
-            self.quick.click_oil_maintenance()
+            self._open(vin, quick_service, (_title(QuickServiceInfo.OIL_MAINTENANCE), self.quick.click_oil_maintenance))
             result = self.quick.filter_quick_service_table(keyword)
         elif keyword.lower() in BRAKE_SERVICE_KEYWORDS:
-            self.quick.click_brake_service()
+            self._open(vin, quick_service, (_title(QuickServiceInfo.BRAKE_SERVICE), self.quick.click_brake_service))
             result = self.quick.filter_brake_service_table(BRAKE_SERVICE_KEYWORDS[keyword])
         
         return result
     
     def find_brake_part_by_keyword(self, vin: str, keyword:str):
-        self.general.dismiss_adblock()
-        self.general.click_bmw_catalog()
-        self.general.enter_vin(vin)
-        self.general.click_first_search()
-        self.general.click_browse_parts()
-        self.general.click_brakes()
+        brakes = (GeneralInfo.BRAKES, self.general.click_brakes)
         result = None
         if keyword == "front brake disc":
-            self.brake.click_front_brake()
+            self._open(vin, brakes, (_title(BrakeInfo.FRONT_BRAKE), self.brake.click_front_brake))
             result = self.brake.filter_brake_table("brake disc")
             
         elif keyword == "rear brake disc":
-            self.brake.click_rear_brake()
+            self._open(vin, brakes, (_title(BrakeInfo.REAR_BRAKE), self.brake.click_rear_brake))
             result = self.brake.filter_brake_table("brake disc")
             
         elif keyword == "front brake pad wear sensor":
-            self.brake.click_front_sensor()
+            self._open(vin, brakes, (_title(BrakeInfo.FRONT_SENSOR), self.brake.click_front_sensor))
             result = self.brake.filter_brake_table("Brake pad wear sensor")
             
         elif keyword == "rear brake pad wear sensor":
-            self.brake.click_rear_sensor()
+            self._open(vin, brakes, (_title(BrakeInfo.REAR_SENSOR), self.brake.click_rear_sensor))
             result = self.brake.filter_brake_table("Brake pad wear sensor, rear")
             
         elif keyword == "brake pads":
-            self.brake.click_brake_pads()
+            self._open(vin, brakes, (_title(BrakeInfo.BRAKE_PADS), self.brake.click_brake_pads))
             result = self.brake.filter_brake_table(keyword)
             
         return result
     
     def find_radiator_part_by_keyword(self, vin:str, keyword:str):
-        self.general.await_adblock(4000)
-        self.general.dismiss_adblock()
-        self.general.click_bmw_catalog()
-        self.general.enter_vin(vin)
-        self.general.click_first_search()
-        self.general.click_browse_parts()
-        self.general.click_radiator()
+        radiator = (GeneralInfo.RADIATOR, self.general.click_radiator)
         result = None
         if keyword == "radiator":
-            self.radiator.click_radiator()
+            self._open(vin, radiator, ("RADIATOR, MOUNTING", self.radiator.click_radiator), adblock_wait_ms=4000)
             result = self.radiator.filter_radiator_parts("Radiator")
         
         if keyword == "expansion tank":
-            self.radiator.click_expansion_tank()
+            self._open(vin, radiator, (_title(RadiatorInfo.EXPANSION_TANK), self.radiator.click_expansion_tank),
+                       adblock_wait_ms=4000)
             result = self.radiator.filter_radiator_parts("Expansion tank")
         
         if keyword == "fan housing w/ fan":
-            self.radiator.click_fan_housing_w_fan()
+            self._open(vin, radiator, (_title(RadiatorInfo.FAN_HOUSING_W_FAN), self.radiator.click_fan_housing_w_fan),
+                       adblock_wait_ms=4000)
             result = self.radiator.filter_radiator_parts("Fan housing with fan")
             
-        return result
\ No newline at end of file
+        return result
@@ -0,0 +1,208 @@
+"""Materialize whole vehicles into the offline parts database (partsdb.py).
+
+    python crawl_vehicle.py [--every=DAYS] <vin> [group ...]
+        crawl every group (or the given ones) of the VIN's vehicle; groups
+        crawled within the vehicle's refresh interval are skipped
+    python crawl_vehicle.py --due [max]
+        crawl the vehicles whose refresh is due
+    python crawl_vehicle.py --report
+        coverage of every stored vehicle
+
+``--every`` sets the vehicle's refresh interval in days.
+"""
+import sys
+import json
+from urllib.parse import urljoin
+from typing import Dict, List, Optional
+from playwright.sync_api import sync_playwright
+from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common.checkpoint import failure_reason, unique_keys
+from scraper_common.pagecheck import PageBlocked, check
+from get_main_group_v2 import (
+    ALLOWED_GROUPS,
+    PAGE_RECYCLE_EVERY,
+    ROUTE_PATTERN,
+    open_group,
+    open_vehicle,
+    parse_table,
+    _pre_click_cleanup,
+    _recycle_page,
+    _route_wrapper,
+    _safe_click_subgroup,
+    _wait_for_titles,
+)
+from partsdb import PartsDB, vehicle_key
+
+
+def _crawl_group(context, page, vin: str, group: str):
+    """Parse every subgroup of ``group``; returns (page, names, entries, failed)."""
+    group_url = open_group(page, vin, group)
+
+    titles = page.locator(".title")
+    sub_items = []
+    for i in range(1, titles.count()):
+        try:
+            txt = (titles.nth(i).inner_text() or "").strip()
+            if not txt or "REP. KIT" in txt or "VALUE PARTS" in txt:
+                continue
+            sub_items.append((i, txt))
+        except Exception:
+            pass
+    names = unique_keys([name for _, name in sub_items])
+
+    entries: Dict[str, Dict] = {}
+    failed: List[Dict] = []
+    for visited, ((idx, name), key) in enumerate(zip(sub_items, names), 1):
+        try:
+            _pre_click_cleanup(page)
+            _safe_click_subgroup(page, titles, idx, timeout_ms=60_000)
+            check(page)
+            page.wait_for_load_state("domcontentloaded")
+            check(page)
+            page.locator("#partsList").wait_for(state="visible", timeout=30_000)
+
+            table_text = page.locator("#partsList").inner_text()
+            img_src = page.locator("#partsimg > img").first.get_attribute("src") or ""
+            entries[key] = {
+                "subgroup": name,
+                "diagram_image": urljoin("https://www.realoem.com", img_src),
+                "parts": parse_table(table_text),
+            }
+        except PageBlocked:
+            raise
+        except Exception as e:
+            failed.append({"subgroup": key, "error": failure_reason(e)})
+        finally:
+            try:
+                page.go_back(wait_until="domcontentloaded")
+                _wait_for_titles(page)
+            except Exception:
+                pass
+            if PAGE_RECYCLE_EVERY and visited % PAGE_RECYCLE_EVERY == 0:
+                page = _recycle_page(context, page, group_url)
+            titles = page.locator(".title")
+    return page, names, entries, failed
+
+
+def crawl(db: PartsDB, vin: str, groups: List[str], refresh_days: Optional[float] = None) -> Dict:
+    """Crawl ``groups`` of the vehicle of ``vin`` into ``db``; returns a summary.
+
+    A block page ends the crawl with ``PageBlocked`` once it is recorded on
+    the vehicle; any other failure is reported in the summary.
+    """
+    summary = {"vin": vin, "vehicle": None, "crawled": [], "skipped": [], "failed": [], "error": None}
+
+    with Stealth().use_sync(sync_playwright()) as p:
+        browser = launch_chromium(
+            p,
+            headless=True,
+            timeout=30_000,
+            args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
+        )
+        context = None
+        page = None
+        key = None
+        try:
+            context = browser.new_context(
+                viewport={"width": 1200, "height": 800},
+                user_agent=("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                            "(KHTML, like Gecko) Chrome/121.0 Safari/537.36"),
+            )
+            context.set_default_timeout(60_000)
+            context.set_default_navigation_timeout(60_000)
+            context.route(ROUTE_PATTERN, _route_wrapper)
+            page = context.new_page()
+
+            groups_url = open_vehicle(page, vin, groups[0])
+            key = vehicle_key(groups_url, vin)
+            summary["vehicle"] = key
+            db.register(vin, key)
+
+            for group in groups:
+                if db.group_fresh(key, group):
+                    summary["skipped"].append(group)
+                    continue
+                try:
+                    page, names, entries, failed = _crawl_group(context, page, vin, group)
+                except PageBlocked:
+                    raise
+                except Exception as e:
+                    db.store_group(key, group, [], {}, failure_reason(e))
+                    summary["failed"].append({"group": group, "error": failure_reason(e)})
+                    continue
+                error = f"{len(failed)} subgroup(s) failed" if failed else None
+                db.store_group(key, group, names, entries, error)
+                summary["crawled"].append({"group": group, "subgroups": len(names), "parsed": len(entries)})
+                if failed:
+                    summary["failed"].append({"group": group, "subgroups": failed})
+        except Exception as e:
+            summary["error"] = failure_reason(e)
+            if isinstance(e, PageBlocked):
+                raise
+        finally:
+            if key:
+                db.finish(
+                    key,
+                    complete=not summary["failed"] and not summary["error"],
+                    error=summary["error"],
+                    refresh_days=refresh_days,
+                )
+            try:
+                if page: page.close()
+            except Exception:
+                pass
+            try:
+                if context: context.close()
+            except Exception:
+                pass
+            try:
+                browser.close()
+            except Exception:
+                pass
+    return summary
+
+
+def main():
+    args = sys.argv[1:]
+    refresh_days = None
+    for arg in list(args):
+        if arg.startswith("--every="):
+            refresh_days = float(arg.split("=", 1)[1])
+            args.remove(arg)
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    db = PartsDB()
+    if args[0] == "--report":
+        print(json.dumps(db.report(ALLOWED_GROUPS), ensure_ascii=False, indent=2))
+        return
+
+    if args[0] == "--due":
+        limit = int(args[1]) if len(args) > 1 else None
+        runs = []
+        try:
+            for v in db.due(limit):
+                runs.append(crawl(db, v["vin"], list(ALLOWED_GROUPS)))
+        finally:
+            # Printed also when a block page stops the batch: the site is
+            # refusing us, the vehicles after it are not tried
+            print(json.dumps({"refreshed": runs}, ensure_ascii=False, indent=2))
+        return
+
+    vin = args[0].strip()
+    groups = [g.strip().lower() for g in args[1:]] or list(ALLOWED_GROUPS)
+    unknown = [g for g in groups if g not in ALLOWED_GROUPS]
+    if unknown:
+        print(f"Unsupported group(s) {', '.join(unknown)}. Allowed: {', '.join(ALLOWED_GROUPS.keys())}")
+        sys.exit(2)
+
+    summary = crawl(db, vin, groups, refresh_days)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if summary["error"]:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
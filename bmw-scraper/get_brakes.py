@@ -2,26 +2,32 @@ import sys
 from playwright.sync_api import sync_playwright
 from utils import block_ads
 from playwright_stealth import Stealth
-from actions import Actions
+from scraper_common.browser import launch_chromium
+from actions import Actions, canonical_part, find_offline, index_result
 import json
 def main():
     if len(sys.argv) < 3:
         print("Usage: python main.py <vin> <part>")
         sys.exit(1)
     vin = sys.argv[1]
-    part = " ".join(sys.argv[2:])  # Join all remaining args as part
+    part = canonical_part(" ".join(sys.argv[2:]))  # Join all remaining args as part
+
+    # Vehicles crawled into the offline parts DB are answered without a browser
+    local = find_offline("brake", vin, part)
+    if local is not None:
+        print(json.dumps(local, ensure_ascii=False))
+        return
 
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True,timeout=30000)
+        browser = launch_chromium(p, headless=True,timeout=30000)
         context = browser.new_context()
         context.set_default_timeout(60000)
         context.set_default_navigation_timeout(60000)
         page = context.new_page()
         page.route("**/*", block_ads)
-        page.goto("http://www.realoem.com")
-        page.wait_for_load_state('domcontentloaded')
         actions = Actions(page)
         result = actions.find_brake_part_by_keyword(vin,part)
+        index_result("brake", vin, part, result)
         print(json.dumps(result))
         #page.wait_for_timeout(10000)
         browser.close()
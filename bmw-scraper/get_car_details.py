@@ -3,6 +3,8 @@ sys.stdout.reconfigure(encoding='utf-8')
 from playwright.sync_api import sync_playwright
 from utils import block_ads
 from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common.pagecheck import goto
 from actions import Actions
 
 def main():
@@ -12,13 +14,13 @@ def main():
     vin = sys.argv[1]
 
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True,timeout=30000)
+        browser = launch_chromium(p, headless=True,timeout=30000)
         context = browser.new_context()
         context.set_default_timeout(60000)
         context.set_default_navigation_timeout(60000)
         page = context.new_page()
         page.route("**/*", block_ads)
-        page.goto("http://www.realoem.com")
+        goto(page, "http://www.realoem.com")
         page.wait_for_load_state('domcontentloaded')
         actions = Actions(page)
         details = actions.get_car_details(vin)
@@ -5,6 +5,11 @@ from urllib.parse import urljoin
 from typing import List, Dict, Optional
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common import partindex
+from scraper_common.checkpoint import CrawlCheckpoint, unique_keys
+from scraper_common.pagecheck import PageBlocked, goto
+from partsdb import vehicle_key
 from utils import block_ads 
 
 ROUTE_PATTERN = "**/*"
@@ -102,23 +107,23 @@ def parse_table(table_text: str) -> List[Dict]:
     return items
 
 
-# --- Main scraping logic --- #
+def _back_to_group(page, group_url: str):
+    if page.url != group_url:
+        page.go_back(wait_until="domcontentloaded")
+    if page.url != group_url:
+        page.goto(group_url, wait_until="domcontentloaded")
+    page.locator(".title").first.wait_for(state="attached")
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python get_main_group.py <vin> <group>")
-        sys.exit(1)
 
-    vin = sys.argv[1].strip()
-    group_in = " ".join(sys.argv[2:]).strip().lower()
-    if group_in not in ALLOWED_GROUPS:
-        print(f"Unsupported group '{group_in}'. Allowed: {', '.join(ALLOWED_GROUPS.keys())}")
-        sys.exit(2)
+# --- Main scraping logic --- #
 
+def crawl(vin: str, group_in: str, checkpoint: CrawlCheckpoint, stored: Dict[str, Dict]) -> List[Dict]:
+    """Visit every subgroup not in ``stored``; returns all results in catalog order."""
     results = []
+    crawl_error = None
 
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True, timeout=30000)
+        browser = launch_chromium(p, headless=True, timeout=30000)
         context = browser.new_context()
         context.set_default_timeout(60000)
         context.set_default_navigation_timeout(60000)
@@ -126,7 +131,7 @@ def main():
 
         page = context.new_page()
         try:
-            page.goto("http://www.realoem.com", wait_until="domcontentloaded")
+            goto(page, "http://www.realoem.com", wait_until="domcontentloaded")
             page.get_by_text("enter BMW catalog", exact=False).click()
             page.wait_for_load_state("domcontentloaded")
 
@@ -141,30 +146,56 @@ def main():
             page.wait_for_load_state("domcontentloaded")
 
             page.locator(".title").first.wait_for(state="attached")
+            group_url = page.url
             titles = page.locator(".title").all()[1:]  # skip header
 
+            entries = []
             for link in titles:
                 name = link.inner_text()
                 if "REP. KIT" in name or "VALUE PARTS" in name:
                     continue
-                link.click()
-                page.wait_for_load_state("domcontentloaded")
-                page.wait_for_timeout(3000)
-                table_text = page.locator("#partsList").inner_text()
-                img_src = page.locator("#partsimg > img").get_attribute("src") or ""
-                full_img = urljoin("http://www.realoem.com", img_src)
-
-                # Parse and store cleaned data
-                parsed_table = parse_table(table_text)
-                results.append({
-                    "subgroup":name,
-                    "diagram_image": full_img,
-                    "parts": parsed_table
-                })
-
-                page.go_back(wait_until="domcontentloaded")
-        except Exception:
-            pass
+                entries.append((link, name))
+            keys = unique_keys([name for _, name in entries])
+            checkpoint.set_plan(keys)
+
+            for (link, name), key in zip(entries, keys):
+                if key in stored:
+                    results.append(stored[key])
+                    continue
+                try:
+                    link.click()
+                    page.wait_for_load_state("domcontentloaded")
+                    page.wait_for_timeout(3000)
+                    table_text = page.locator("#partsList").inner_text()
+                    img_src = page.locator("#partsimg > img").get_attribute("src") or ""
+                    full_img = urljoin("http://www.realoem.com", img_src)
+
+                    # Parse and store cleaned data
+                    parsed_table = parse_table(table_text)
+                    entry = {
+                        "subgroup":name,
+                        "diagram_image": full_img,
+                        "parts": parsed_table
+                    }
+                    results.append(entry)
+                    checkpoint.done(key, entry)
+                    partindex.add(
+                        (p["part_number"], vehicle_key(group_url, vin), group_in, name, p["item_no"])
+                        for p in parsed_table
+                        if p["part_number"]
+                    )
+                except Exception as e:
+                    checkpoint.failed(key, e)
+                    if isinstance(e, PageBlocked):
+                        raise
+                finally:
+                    _back_to_group(page, group_url)
+        except Exception as e:
+            # Kept in the checkpoint; the next run resumes
+            checkpoint.crawl_failed(e)
+            if isinstance(e, PageBlocked):
+                raise
+            crawl_error = e
         finally:
             try:
                 context.unroute(ROUTE_PATTERN, block_ads)
@@ -183,11 +214,39 @@ def main():
             except Exception:
                 pass
 
+    # Nothing to show for the run: fail it, so it is not taken for an answer
+    if crawl_error is not None and not results:
+        raise crawl_error
+    return results
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python get_main_group.py <vin> <group>")
+        sys.exit(1)
+
+    vin = sys.argv[1].strip()
+    group_in = " ".join(sys.argv[2:]).strip().lower()
+    if group_in not in ALLOWED_GROUPS:
+        print(f"Unsupported group '{group_in}'. Allowed: {', '.join(ALLOWED_GROUPS.keys())}")
+        sys.exit(2)
+
+    # Subgroups finished by an earlier (interrupted) run are not visited again
+    checkpoint = CrawlCheckpoint("get_main_group", vin, group_in)
+    planned = checkpoint.plan() or []
+    stored = checkpoint.load()
+
+    if planned and len(stored) == len(planned):
+        results = [stored[key] for key in planned]
+    else:
+        results = crawl(vin, group_in, checkpoint, stored)
+
     # --- Final structured output ---
     clean_output = {
         # "vin": vin,
         # "group": ALLOWED_GROUPS[group_in],
-        "subgroups": results
+        "subgroups": results,
+        "completeness": checkpoint.report(),
     }
 
     print(json.dumps(clean_output, ensure_ascii=False, indent=2))
@@ -7,9 +7,22 @@ from urllib.parse import urljoin
 from typing import List, Dict, Optional
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common import partindex
+from scraper_common.checkpoint import CrawlCheckpoint, unique_keys
+from scraper_common.deeplinks import DeepLinks, follow_path
+from scraper_common.pagecheck import PageBlocked, check, goto
+from partsdb import normalize_vin, vehicle_key
 from utils import block_ads
 
 ROUTE_PATTERN = "**/*"
+# Every click + go_back leaves another document in the page's history; swap in
+# a fresh page on the group URL after this many subgroups to keep memory flat.
+PAGE_RECYCLE_EVERY = int(os.getenv("PAGE_RECYCLE_EVERY", "12"))
+# SCRAPER_STREAM=ndjson: print one JSON line per subgroup as soon as it is
+# parsed ({"type": "subgroup", ...}, {"type": "error", ...}, then
+# {"type": "done", ...}) instead of one document at the end.
+STREAM = os.getenv("SCRAPER_STREAM", "").lower() == "ndjson"
 
 ALLOWED_GROUPS = {
     "engine": "ENGINE",
@@ -104,11 +117,11 @@ def parse_table(table_text: str) -> List[Dict]:
 def _route_wrapper(route):
     url = route.request.url
     if "realoem.com" in url:
-        return route.continue_()
+        return route.fallback()
     try:
         return block_ads(route)  # keep existing behavior for non-core hosts
     except Exception:
-        return route.continue_()
+        return route.fallback()
 
 def _pre_click_cleanup(page):
     js = """
@@ -181,6 +194,87 @@ def _safe_click_subgroup(page, titles_locator, idx, timeout_ms=60000):
         raise last_err
     raise RuntimeError("Failed to click subgroup")
 
+def _wait_for_titles(page):
+    page.wait_for_selector(".title", state="visible", timeout=30_000)
+    page.wait_for_function("document.querySelectorAll('.title').length > 1", timeout=30_000)
+
+def _select_vehicle(page, vin: str):
+    """Click path from the home page to the vehicle's group list."""
+    goto(page, "https://www.realoem.com", wait_until="domcontentloaded")
+    page.get_by_text("enter BMW catalog", exact=False).first.click()
+    page.wait_for_load_state("domcontentloaded")
+    check(page)
+
+    page.locator("#vin").fill(vin)
+    page.locator("input[type='submit'][value='Search']").first.click()
+    page.wait_for_load_state("domcontentloaded")
+    check(page)
+
+    try:
+        page.wait_for_timeout(1000)
+        if page.locator("span.ggmtgz:has-text('×')").first.is_visible():
+            page.locator("span.ggmtgz:has-text('×')").first.click()
+    except Exception:
+        pass
+
+    page.get_by_text("Browse Parts", exact=False).first.click()
+    page.wait_for_load_state("domcontentloaded")
+    check(page)
+
+
+def _vehicle_step(page, vin: str, group: str):
+    # The group list is good when it shows the group about to be opened
+    tile = f"a:has(div:has-text('{ALLOWED_GROUPS[group]}'))"
+    return ("vehicle", tile, lambda: _select_vehicle(page, vin))
+
+
+def open_vehicle(page, vin: str, group: str) -> str:
+    """Open the group list of ``vin``'s vehicle; returns its URL.
+
+    Goes to the list directly when it was opened before for the vehicle
+    (scraper_common/deeplinks.py); ``group`` is one the list must show.
+    """
+    follow_path(page, DeepLinks("realoem", normalize_vin(vin)), [_vehicle_step(page, vin, group)])
+    return page.url
+
+
+def open_group(page, vin: str, group: str) -> str:
+    """Open ``group`` of ``vin``'s vehicle, by deep link when possible; returns its URL."""
+    label = ALLOWED_GROUPS[group]
+
+    def click_group():
+        page.get_by_text(label, exact=False).first.click()
+        page.wait_for_load_state("domcontentloaded")
+        check(page)
+
+    follow_path(page, DeepLinks("realoem", normalize_vin(vin)), [
+        _vehicle_step(page, vin, group),
+        (f"group/{label}", ".title", click_group),
+    ])
+    _wait_for_titles(page)
+    return page.url
+
+def _recycle_page(context, page, group_url):
+    """Open ``group_url`` in a fresh page and close ``page``; keep the old one on failure."""
+    fresh = context.new_page()
+    try:
+        goto(fresh, group_url, wait_until="domcontentloaded")
+        _wait_for_titles(fresh)
+    except Exception:
+        try:
+            fresh.close()
+        except Exception:
+            pass
+        return page
+    try:
+        page.close()
+    except Exception:
+        pass
+    return fresh
+
+def _emit(record: Dict):
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
 # ---------- main ----------
 
 def main():
@@ -197,9 +291,28 @@ def main():
         sys.exit(2)
 
     results: List[Dict] = []
+    parsed = failed = 0
+
+    # Subgroups finished by an earlier (interrupted) run are not visited again
+    checkpoint = CrawlCheckpoint("get_main_group_v2", vin, group_in, subgroup_filters)
+    stored = checkpoint.load()
+    planned = checkpoint.plan() or []
+    if planned and len(stored) == len(planned):
+        for key in planned:
+            if STREAM:
+                _emit(dict(stored[key], type="subgroup", resumed=True))
+            else:
+                results.append(stored[key])
+        if STREAM:
+            _emit({"type": "done", "parsed": 0, "failed": 0, "completeness": checkpoint.report()})
+        else:
+            print(json.dumps({"subgroups": results, "completeness": checkpoint.report()},
+                             ensure_ascii=False, indent=2))
+        return
 
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(
+        browser = launch_chromium(
+            p,
             headless=True,
             timeout=30_000,
             args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
@@ -207,6 +320,7 @@ def main():
 
         context = None
         page = None
+        crawl_error = None
         try:
             context = browser.new_context(
                 viewport={"width": 1200, "height": 800},
@@ -219,30 +333,8 @@ def main():
 
             page = context.new_page()
 
-            page.goto("https://www.realoem.com", wait_until="domcontentloaded")
-            page.get_by_text("enter BMW catalog", exact=False).first.click()
-            page.wait_for_load_state("domcontentloaded")
-
-            page.locator("#vin").fill(vin)
-            page.locator("input[type='submit'][value='Search']").first.click()
-            page.wait_for_load_state("domcontentloaded")
-
-            try:
-                page.wait_for_timeout(1000)
-                if page.locator("span.ggmtgz:has-text('×')").first.is_visible():
-                    page.locator("span.ggmtgz:has-text('×')").first.click()
-            except Exception:
-                pass
-
-            page.get_by_text("Browse Parts", exact=False).first.click()
-            page.wait_for_load_state("domcontentloaded")
-
-            page.get_by_text(ALLOWED_GROUPS[group_in], exact=False).first.click()
-            page.wait_for_load_state("domcontentloaded")
-
-            # Ensure subgroup list is fully populated
-            page.wait_for_selector(".title", state="visible", timeout=30_000)
-            page.wait_for_function("document.querySelectorAll('.title').length > 1", timeout=30_000)
+            # Group page, with its subgroup list fully populated
+            group_url = open_group(page, vin, group_in)
 
             titles = page.locator(".title")
             count = titles.count()
@@ -263,12 +355,24 @@ def main():
                 norm = lambda s: s.strip().lower()
                 sub_items = [(i, n) for (i, n) in sub_items if any(f in norm(n) for f in subgroup_filters)]
 
+            keys = unique_keys([name for _, name in sub_items])
+            checkpoint.set_plan(keys)
+
             # Visit each subgroup via click (session-safe)
-            for idx, name in sub_items:
+            visited = 0
+            for (idx, name), key in zip(sub_items, keys):
+                if key in stored:
+                    if STREAM:
+                        _emit(dict(stored[key], type="subgroup", resumed=True))
+                    else:
+                        results.append(stored[key])
+                    continue
+                visited += 1
                 try:
                     _pre_click_cleanup(page)
                     _safe_click_subgroup(page, titles, idx, timeout_ms=60_000)
                     page.wait_for_load_state("domcontentloaded")
+                    check(page)
                     page.locator("#partsList").wait_for(state="visible", timeout=30_000)
 
                     table_text = page.locator("#partsList").inner_text()
@@ -276,22 +380,45 @@ def main():
                     full_img = urljoin("https://www.realoem.com", img_src)
 
                     parsed_table = parse_table(table_text)
-                    results.append({
+                    entry = {
                         "subgroup": name,
                         "diagram_image": full_img,
                         "parts": parsed_table
-                    })
-                except Exception:
-                    pass
+                    }
+                    parsed += 1
+                    checkpoint.done(key, entry)
+                    partindex.add(
+                        (p["part_number"], vehicle_key(group_url, vin), group_in, name, p["item_no"])
+                        for p in parsed_table
+                        if p["part_number"]
+                    )
+                    if STREAM:
+                        _emit(dict(entry, type="subgroup"))
+                    else:
+                        results.append(entry)
+                except Exception as e:
+                    failed += 1
+                    checkpoint.failed(key, e)
+                    if isinstance(e, PageBlocked):
+                        raise
+                    if STREAM:
+                        _emit({"type": "error", "subgroup": name, "error": str(e).splitlines()[0] if str(e) else type(e).__name__})
                 finally:
                     try:
                         page.go_back(wait_until="domcontentloaded")
-                        page.wait_for_selector(".title", state="visible", timeout=30_000)
-                        page.wait_for_function("document.querySelectorAll('.title').length > 1", timeout=30_000)
-                        titles = page.locator(".title")  # re-evaluate after navigation
+                        _wait_for_titles(page)
                     except Exception:
                         pass
+                    if PAGE_RECYCLE_EVERY and visited % PAGE_RECYCLE_EVERY == 0:
+                        page = _recycle_page(context, page, group_url)
+                    titles = page.locator(".title")  # re-evaluate after navigation
 
+        except Exception as e:
+            # Kept in the checkpoint; the next run resumes
+            checkpoint.crawl_failed(e)
+            if isinstance(e, PageBlocked):
+                raise
+            crawl_error = e
         finally:
             try:
                 if page: page.close()
@@ -306,7 +433,16 @@ def main():
             except Exception:
                 pass
 
-    print(json.dumps({"subgroups": results}, ensure_ascii=False, indent=2))
+    # Nothing to show for the run: fail it as before, so it is not taken for an answer
+    if crawl_error is not None and parsed == 0 and not stored:
+        raise crawl_error
+
+    if STREAM:
+        _emit({"type": "done", "parsed": parsed, "failed": failed,
+               "completeness": checkpoint.report()})
+    else:
+        print(json.dumps({"subgroups": results, "completeness": checkpoint.report()},
+                         ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
     main()
@@ -5,6 +5,8 @@ from urllib.parse import urljoin
 from typing import List, Dict, Optional
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common.pagecheck import goto
 from utils import block_ads
 
 ROUTE_PATTERN = "**/*"
@@ -48,11 +50,11 @@ ALLOWED_GROUPS = {
 def _route_wrapper(route):
     url = route.request.url
     if "realoem.com" in url:
-        return route.continue_()
+        return route.fallback()
     try:
         return block_ads(route)
     except Exception:
-        return route.continue_()
+        return route.fallback()
 
 def _defuse_overlays(page):
     js = """
@@ -103,7 +105,8 @@ def main():
     subgroups: List[str] = []
 
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(
+        browser = launch_chromium(
+            p,
             headless=True,
             timeout=30_000,
             args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
@@ -123,7 +126,7 @@ def main():
 
             page = context.new_page()
 
-            page.goto("https://www.realoem.com", wait_until="domcontentloaded")
+            goto(page, "https://www.realoem.com", wait_until="domcontentloaded")
             page.get_by_text("enter BMW catalog", exact=False).first.click()
             page.wait_for_load_state("domcontentloaded")
 
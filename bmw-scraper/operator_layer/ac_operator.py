@@ -1,39 +1,42 @@
+from typing import Optional
 from info_layer.ac_info import ACInfo
+from operator_layer.general_operator import GeneralOperator
 from playwright.sync_api import Page
 
 class ACOperator:
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, general: Optional[GeneralOperator] = None):
         self.page = page
+        self.general = general or GeneralOperator(page)
 
     def click_fresh_air_grille(self):
-        self.page.locator(ACInfo.FRESH_AIR_GRILLE).click()
+        self.general.open_link(ACInfo.FRESH_AIR_GRILLE)
 
     def click_air_channel(self):
-        self.page.locator(ACInfo.AIR_CHANNEL).click()
+        self.general.open_link(ACInfo.AIR_CHANNEL)
 
     def click_microfilter(self):
-        self.page.locator(ACInfo.MICROFILTER).click()
+        self.general.open_link(ACInfo.MICROFILTER)
 
     def click_heater_radiator(self):
-        self.page.locator(ACInfo.HEATER_RADIATOR).click()
+        self.general.open_link(ACInfo.HEATER_RADIATOR)
 
     def click_cooling_water_hoses(self):
-        self.page.locator(ACInfo.COOLING_WATER_HOSES).click()
+        self.general.open_link(ACInfo.COOLING_WATER_HOSES)
 
     def click_coolant_hoses_aux(self):
-        self.page.locator(ACInfo.COOLANT_HOSES_AUX).click()
+        self.general.open_link(ACInfo.COOLANT_HOSES_AUX)
 
     def click_evaporator_expansion_valve(self):
-        self.page.locator(ACInfo.EVAPORATOR_EXPANSION_VALVE).click()
+        self.general.open_link(ACInfo.EVAPORATOR_EXPANSION_VALVE)
 
     def click_dist_housing(self):
-        self.page.locator(ACInfo.DIST_HOUSING).click()
+        self.general.open_link(ACInfo.DIST_HOUSING)
 
     def click_filter_housing(self):
-        self.page.locator(ACInfo.FILTER_HOUSING).click()
+        self.general.open_link(ACInfo.FILTER_HOUSING)
         
     def click_compressor(self):
-        self.page.locator(ACInfo.COMPRESSOR).click()
+        self.general.open_link(ACInfo.COMPRESSOR)
         
     def click_condenser(self):
-        self.page.locator(ACInfo.CONDENSER).click()
\ No newline at end of file
+        self.general.open_link(ACInfo.CONDENSER)
\ No newline at end of file
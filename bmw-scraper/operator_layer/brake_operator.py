@@ -1,27 +1,30 @@
+from typing import Optional
 from playwright.sync_api import Page
 from info_layer.brake_info import BrakeInfo
+from operator_layer.general_operator import GeneralOperator
 
 class BrakeOperator:
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, general: Optional[GeneralOperator] = None):
         self.page = page
+        self.general = general or GeneralOperator(page)
         
     def click_front_sensor(self):
-        self.page.locator(BrakeInfo.FRONT_SENSOR).nth(0).click()
+        self.general.open_link(BrakeInfo.FRONT_SENSOR)
         
     def click_front_brake(self):
-        self.page.locator(BrakeInfo.FRONT_BRAKE).click()
+        self.general.open_link(BrakeInfo.FRONT_BRAKE)
         
     def click_rear_brake(self):
-        self.page.locator(BrakeInfo.REAR_BRAKE).click()
+        self.general.open_link(BrakeInfo.REAR_BRAKE)
     
     def click_rear_sensor(self):
         try:
-            self.page.locator(BrakeInfo.REAR_SENSOR).click()
+            self.general.open_link(BrakeInfo.REAR_SENSOR)
         except:
-            self.page.locator(BrakeInfo.REAR_SENSOR_ALT).click()
+            self.general.open_link(BrakeInfo.REAR_SENSOR_ALT)
         
     def click_brake_pads(self):
-        self.page.locator(BrakeInfo.BRAKE_PADS).click()
+        self.general.open_link(BrakeInfo.BRAKE_PADS)
     
     def filter_brake_table(self, keyword: str):
         table = self.page.locator(BrakeInfo.BRAKE_TABLE)
@@ -1,10 +1,86 @@
+import re
+from typing import Dict, Optional
 from playwright.sync_api import Page
 from info_layer.general_info import GeneralInfo
+from scraper_common import metrics
+from scraper_common.pagecheck import check, goto
+
+# Label -> href of every tile link on a page (groups on the group list,
+# subgroups on a group page), read in one evaluation. A tile is a link
+# holding a title div, or a link inside a .title.
+_LINK_MAP_JS = """
+() => {
+  const norm = (t) => (t || "").replace(/\\s+/g, " ").trim().toUpperCase();
+  const map = {};
+  for (const a of document.querySelectorAll("a[href]")) {
+    const title = a.querySelector(".title") || a.querySelector("div") || a.closest(".title");
+    const label = title ? norm(title.innerText) : "";
+    if (label && !(label in map)) map[label] = a.href;
+  }
+  return map;
+}
+"""
+
+# Link maps by page URL (the URL carries the vehicle id). Module state, so
+# it only lasts one script run: each run is its own process under the
+# gateway's fork server, and only a flow opening the same page twice reuses
+# an entry.
+_LINK_MAPS: Dict[str, Dict[str, str]] = {}
+
+
+def _label(selector: str) -> Optional[str]:
+    """Text an info-layer ``has-text`` selector looks for, upper case."""
+    m = re.search(r"has-text\('([^']+)'\)", selector)
+    return m.group(1).upper() if m else None
+
 
 class GeneralOperator:
     def __init__(self, page: Page):
         self.page = page
         
+    def link_map(self) -> Dict[str, str]:
+        """Label -> href of the tiles on the current page (one evaluation, cached per run)."""
+        url = self.page.url
+        if url in _LINK_MAPS:
+            return _LINK_MAPS[url]
+        links = self.page.evaluate(_LINK_MAP_JS)
+        if links:
+            _LINK_MAPS[url] = links
+        return links
+
+    def open_link(self, selector: str, timeout: Optional[float] = None):
+        """Open the tile ``selector`` names by its exact label.
+
+        The label is the selector's ``has-text`` text; a label that only
+        starts one tile's title (e.g. "AUDIO, NAVIGATION") names that tile.
+        Only when the page has no such tile is the selector clicked (its
+        first match). ``timeout`` only bounds finding that match; a link
+        that was found loads within the navigation timeout.
+        """
+        label = _label(selector)
+        links = self.link_map() if label else {}
+        href = links.get(label)
+        via = "label"
+        if href is None and label:
+            prefixed = [name for name in links if name.startswith(label)]
+            href = links[prefixed[0]] if len(prefixed) == 1 else None
+            via = "prefix"
+        if href is None:
+            metrics.emit("realoem.open_link", 1, via="selector")
+            self.click_through(self.page.locator(selector).first, timeout=timeout)
+            return
+        metrics.emit("realoem.open_link", 1, via=via)
+        goto(self.page, href, wait_until="domcontentloaded")
+
+    def click_through(self, locator, timeout: Optional[float] = None):
+        """Click a link that loads another page, and check that page like ``goto`` does.
+
+        ``timeout`` bounds the click (finding the element), not the load.
+        """
+        locator.click(timeout=timeout)
+        self.page.wait_for_load_state("domcontentloaded")
+        check(self.page)
+
     def await_adblock(self, t):
         self.page.wait_for_timeout(t)
         
@@ -13,118 +89,118 @@ class GeneralOperator:
             self.page.locator(GeneralInfo.DISMISS_ADBLOCK).click()
 
     def click_bmw_catalog(self):
-        self.page.locator(GeneralInfo.BMW_CATALOG).click()
+        self.click_through(self.page.locator(GeneralInfo.BMW_CATALOG))
 
     def enter_vin(self, vin: str):
         self.page.locator(GeneralInfo.VIN_INPUT).fill(vin)
 
     def click_first_search(self):
-        self.page.locator(GeneralInfo.FIRST_SEARCH_BUTTON).nth(0).click()
+        self.click_through(self.page.locator(GeneralInfo.FIRST_SEARCH_BUTTON).nth(0))
 
     def click_browse_parts(self):
-        self.page.locator(GeneralInfo.BROWSE_PARTS_BUTTON).click()
+        self.click_through(self.page.locator(GeneralInfo.BROWSE_PARTS_BUTTON))
 
     def click_engine(self):
-        self.page.locator(GeneralInfo.ENGINE).click()
+        self.open_link(GeneralInfo.ENGINE)
 
     def click_technical_literature(self):
-        self.page.locator(GeneralInfo.TECHNICAL_LITERATURE).click()
+        self.open_link(GeneralInfo.TECHNICAL_LITERATURE)
 
     def click_radiator(self):
-        self.page.locator(GeneralInfo.RADIATOR).click()
+        self.open_link(GeneralInfo.RADIATOR)
 
     def click_clutch(self):
-        self.page.locator(GeneralInfo.CLUTCH).click()
+        self.open_link(GeneralInfo.CLUTCH)
 
     def click_fuel_supply(self):
-        self.page.locator(GeneralInfo.FUEL_SUPPLY).click()
+        self.open_link(GeneralInfo.FUEL_SUPPLY)
 
     def click_exhaust_system(self):
-        self.page.locator(GeneralInfo.EXHAUST_SYSTEM).click()
+        self.open_link(GeneralInfo.EXHAUST_SYSTEM)
 
     def click_drive_shaft(self):
-        self.page.locator(GeneralInfo.DRIVE_SHAFT).click()
+        self.open_link(GeneralInfo.DRIVE_SHAFT)
 
     def click_gearshift(self):
-        self.page.locator(GeneralInfo.GEARSHIFT).click()
+        self.open_link(GeneralInfo.GEARSHIFT)
 
     def click_steering(self):
-        self.page.locator(GeneralInfo.STEERING).click()
+        self.open_link(GeneralInfo.STEERING)
 
     def click_suspension(self):
-        self.page.locator(GeneralInfo.SUSPENSION).click()
+        self.open_link(GeneralInfo.SUSPENSION)
 
     def click_brakes(self):
-        self.page.locator(GeneralInfo.BRAKES).click()
+        self.open_link(GeneralInfo.BRAKES)
 
     def click_wheels(self):
-        self.page.locator(GeneralInfo.WHEELS).click()
+        self.open_link(GeneralInfo.WHEELS)
 
     def click_retrofitting(self):
-        self.page.locator(GeneralInfo.RETROFITTING).click()
+        self.open_link(GeneralInfo.RETROFITTING)
 
     def click_engine_elec_system(self):
-        self.page.locator(GeneralInfo.ENGINE_ELEC_SYSTEM).click()
+        self.open_link(GeneralInfo.ENGINE_ELEC_SYSTEM)
 
     def click_fuel_prep(self):
-        self.page.locator(GeneralInfo.FUEL_PREP).click()
+        self.open_link(GeneralInfo.FUEL_PREP)
 
     def click_automatic_transmission(self):
-        self.page.locator(GeneralInfo.AUTOMATIC_TRANSMISSION).click()
+        self.open_link(GeneralInfo.AUTOMATIC_TRANSMISSION)
 
     def click_manual_transmission(self):
-        self.page.locator(GeneralInfo.MANUAL_TRANSMISSION).click()
+        self.open_link(GeneralInfo.MANUAL_TRANSMISSION)
 
     def click_trim(self):
-        self.page.locator(GeneralInfo.TRIM).click()
+        self.open_link(GeneralInfo.TRIM)
 
     def click_pedals(self):
-        self.page.locator(GeneralInfo.PEDALS).click()
+        self.open_link(GeneralInfo.PEDALS)
 
     def click_bodywork(self):
-        self.page.locator(GeneralInfo.BODYWORK).click()
+        self.open_link(GeneralInfo.BODYWORK)
 
     def click_vehicle_trim(self):
-        self.page.locator(GeneralInfo.VEHICLE_TRIM).click()
+        self.open_link(GeneralInfo.VEHICLE_TRIM)
 
     def click_seats(self):
-        self.page.locator(GeneralInfo.SEATS).click()
+        self.open_link(GeneralInfo.SEATS)
 
     def click_sliding_roof(self):
-        self.page.locator(GeneralInfo.SLIDING_ROOF).click()
+        self.open_link(GeneralInfo.SLIDING_ROOF)
 
     def click_instruments(self):
-        self.page.locator(GeneralInfo.INSTRUMENTS).click()
+        self.open_link(GeneralInfo.INSTRUMENTS)
 
     def click_lighting(self):
-        self.page.locator(GeneralInfo.LIGHTING).click()
+        self.open_link(GeneralInfo.LIGHTING)
 
     def click_heater_ac(self):
-        self.page.locator(GeneralInfo.HEATER_AC).click()
+        self.open_link(GeneralInfo.HEATER_AC)
 
     def click_audio_nav(self):
-        self.page.locator(GeneralInfo.AUDIO_NAV).click()
+        self.open_link(GeneralInfo.AUDIO_NAV)
 
     def click_distance_systems(self):
-        self.page.locator(GeneralInfo.DISTANCE_SYSTEMS).click()
+        self.open_link(GeneralInfo.DISTANCE_SYSTEMS)
 
     def click_equ_parts(self):
-        self.page.locator(GeneralInfo.EQU_PARTS).click()
+        self.open_link(GeneralInfo.EQU_PARTS)
 
     def click_restraint_system(self):
-        self.page.locator(GeneralInfo.RESTRAINT_SYSTEM).click()
+        self.open_link(GeneralInfo.RESTRAINT_SYSTEM)
 
     def click_aux_materials(self):
-        self.page.locator(GeneralInfo.AUX_MATERIALS).click()
+        self.open_link(GeneralInfo.AUX_MATERIALS)
 
     def click_comm_systems(self):
-        self.page.locator(GeneralInfo.COMM_SYSTEMS).click()
+        self.open_link(GeneralInfo.COMM_SYSTEMS)
 
     def click_value_parts(self):
-        self.page.locator(GeneralInfo.VALUE_PARTS).click()
+        self.open_link(GeneralInfo.VALUE_PARTS)
     
     def click_quick_service_parts(self):
-        self.page.locator(GeneralInfo.QUICK_SERVICE).click()
+        self.open_link(GeneralInfo.QUICK_SERVICE)
     
     def get_car_details(self):
         details = {}
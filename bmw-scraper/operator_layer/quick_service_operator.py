@@ -1,15 +1,18 @@
+from typing import Optional
 from playwright.sync_api import Page
 from info_layer.quick_service_info import QuickServiceInfo
+from operator_layer.general_operator import GeneralOperator
 
 class QuickServiceOperator:
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, general: Optional[GeneralOperator] = None):
         self.page = page
+        self.general = general or GeneralOperator(page)
         
     def click_oil_maintenance(self):
-        self.page.locator(QuickServiceInfo.OIL_MAINTENANCE).click()
+        self.general.open_link(QuickServiceInfo.OIL_MAINTENANCE)
         
     def click_brake_service(self):
-        self.page.locator(QuickServiceInfo.BRAKE_SERVICE).click()
+        self.general.open_link(QuickServiceInfo.BRAKE_SERVICE)
         
     def filter_quick_service_table(self,keyword: str):
         table = self.page.locator(QuickServiceInfo.QUICK_SERVICE_TABLE)
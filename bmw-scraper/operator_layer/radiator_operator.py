@@ -1,21 +1,24 @@
+from typing import Optional
 from info_layer.radiator_info import RadiatorInfo
+from operator_layer.general_operator import GeneralOperator
 from playwright.sync_api import Page, Error
 
 class RadiatorOperator:
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, general: Optional[GeneralOperator] = None):
         self.page = page
+        self.general = general or GeneralOperator(page)
         
     def click_radiator(self):
-        self.page.locator(RadiatorInfo.RADIATOR,has_text="MOUNTING").click()
+        self.general.click_through(self.page.locator(RadiatorInfo.RADIATOR,has_text="MOUNTING"))
     
     def click_expansion_tank(self):
-        self.page.locator(RadiatorInfo.EXPANSION_TANK).click()
+        self.general.open_link(RadiatorInfo.EXPANSION_TANK)
         
     def click_fan_housing_w_fan(self):
         try:
-            self.page.locator(RadiatorInfo.FAN_HOUSING_W_FAN).click(timeout=5000)
+            self.general.open_link(RadiatorInfo.FAN_HOUSING_W_FAN, timeout=5000)
         except Error:
-            self.page.locator(RadiatorInfo.FAN_HOUSING_W_FAN_ALT).click(timeout=10000)
+            self.general.open_link(RadiatorInfo.FAN_HOUSING_W_FAN_ALT, timeout=10000)
             
     def filter_radiator_parts(self, keyword: str):
         table = self.page.locator(RadiatorInfo.RADIATOR_TABLE)
@@ -0,0 +1,445 @@
+"""Offline RealOEM parts database, filled by ``crawl_vehicle.py``.
+
+Whole vehicles (every group of ``ALLOWED_GROUPS``, every subgroup) are parsed
+with ``parse_table`` and kept in ``parts.sqlite`` (see ``scraper_common.state``)
+keyed by vehicle key, the RealOEM ``partgrp?id=...`` of the VIN's
+configuration. VINs seen by the crawler are mapped to their vehicle, so a
+``find-part`` for any of them is answered locally (``lookup``).
+
+Every vehicle has its own refresh schedule: ``refresh_due`` is set to
+``refresh_days`` after each crawl (``PARTSDB_REFRESH_DAYS`` unless the
+vehicle was given its own), and ``due`` lists the vehicles to crawl again.
+Data older than ``PARTSDB_MAX_AGE_DAYS`` is not answered from.
+
+``parts_fts`` is an FTS5 index over description, supplement and notes of
+every stored row; ``search`` finds parts by free text across all groups of a
+vehicle, ranked by bm25 and optionally limited to a production date range.
+"""
+import os
+import re
+import json
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from scraper_common import partindex, state
+
+REFRESH_DAYS = float(os.getenv("PARTSDB_REFRESH_DAYS", "30"))
+MAX_AGE_DAYS = float(os.getenv("PARTSDB_MAX_AGE_DAYS", "90"))
+# A crawl that left groups missing is retried sooner than a full refresh
+RETRY_HOURS = float(os.getenv("PARTSDB_RETRY_H", "6"))
+
+_DB_FILE = "parts.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vehicles (
+    key TEXT PRIMARY KEY,
+    crawled REAL,
+    refresh_days REAL,
+    refresh_due REAL,
+    status TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS vins (
+    vin TEXT PRIMARY KEY,
+    vehicle TEXT NOT NULL,
+    seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vehicle_groups (
+    vehicle TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    subgroups INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    crawled REAL NOT NULL,
+    error TEXT,
+    PRIMARY KEY (vehicle, grp)
+);
+CREATE TABLE IF NOT EXISTS subgroups (
+    vehicle TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    diagram_image TEXT,
+    crawled REAL NOT NULL,
+    PRIMARY KEY (vehicle, grp, name)
+);
+CREATE TABLE IF NOT EXISTS parts (
+    id INTEGER PRIMARY KEY,
+    vehicle TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    subgroup TEXT NOT NULL,
+    item_no TEXT,
+    description TEXT,
+    supplement TEXT,
+    quantity TEXT,
+    from_date TEXT,
+    to_date TEXT,
+    part_number TEXT,
+    price TEXT,
+    notes TEXT,
+    valid_from INTEGER,
+    valid_to INTEGER
+);
+CREATE INDEX IF NOT EXISTS parts_subgroup ON parts (vehicle, grp, subgroup);
+CREATE INDEX IF NOT EXISTS parts_number ON parts (part_number);
+CREATE INDEX IF NOT EXISTS vins_vehicle ON vins (vehicle);
+CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5 (
+    description, supplement, notes,
+    content = 'parts', content_rowid = 'id', tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS parts_fts_insert AFTER INSERT ON parts BEGIN
+    INSERT INTO parts_fts (rowid, description, supplement, notes)
+    VALUES (new.id, new.description, new.supplement, new.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS parts_fts_delete AFTER DELETE ON parts BEGIN
+    INSERT INTO parts_fts (parts_fts, rowid, description, supplement, notes)
+    VALUES ('delete', old.id, old.description, old.supplement, old.notes);
+END;
+"""
+# Bumped with every change _migrate() has to apply to an existing file
+_SCHEMA_VERSION = 1
+
+# bm25 weights of description, supplement, notes
+_RANK = "bm25(parts_fts, 10.0, 4.0, 1.0)"
+
+_MONTH = re.compile(r"^\s*(?:(\d{1,2})[/.-](\d{4})|(\d{4})(?:[/.-]?(\d{1,2}))?)\s*$")
+
+# Where a find_* flow reads its answer: the group, the subgroup (first title
+# containing every word of one of ``titles``, in catalog order), the
+# description filter and words that exclude a row. Rows whose notes say
+# "ended" are skipped, as on the live page.
+OfflinePlan = namedtuple(
+    "OfflinePlan", "group titles match exclude unique with_qty", defaults=((), False, False)
+)
+
+
+def normalize_vin(vin: str) -> str:
+    """RealOEM identifies a BMW by the last 7 characters of the VIN."""
+    return vin.strip().upper()[-7:]
+
+
+def vehicle_key(url: str, vin: str) -> str:
+    """Key of the vehicle whose group list is at ``url`` (``partgrp?id=...``)."""
+    ids = parse_qs(urlparse(url).query).get("id")
+    return ids[0] if ids else f"VIN:{normalize_vin(vin)}"
+
+
+def month_key(text: Optional[str], end: bool = False) -> Optional[int]:
+    """``YYYYMM`` of a catalog date ("09/2004", "2004-09", "200409"); a bare
+    year is its first month, or its last with ``end``."""
+    m = _MONTH.match(text or "")
+    if not m:
+        return None
+    if m.group(1):
+        year, month = int(m.group(2)), int(m.group(1))
+    else:
+        year = int(m.group(3))
+        month = int(m.group(4)) if m.group(4) else (12 if end else 1)
+    return year * 100 + month if 1 <= month <= 12 else None
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)) if ts else None
+
+
+def _title_matches(title: str, alternative) -> bool:
+    words = (alternative,) if isinstance(alternative, str) else alternative
+    return all(w.upper() in title.upper() for w in words)
+
+
+class PartsDB:
+    def __init__(self):
+        self.conn = state.connect(_DB_FILE)
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {r[1] for r in self.conn.execute("PRAGMA table_info(parts)")}
+            if "valid_from" not in columns:
+                self.conn.execute("ALTER TABLE parts ADD COLUMN valid_from INTEGER")
+                self.conn.execute("ALTER TABLE parts ADD COLUMN valid_to INTEGER")
+                self.conn.executemany(
+                    "UPDATE parts SET valid_from = ?, valid_to = ? WHERE id = ?",
+                    [
+                        (month_key(f), month_key(t, end=True), i)
+                        for i, f, t in self.conn.execute("SELECT id, from_date, to_date FROM parts").fetchall()
+                    ],
+                )
+            # Rows stored before the index existed
+            self.conn.execute("INSERT INTO parts_fts (parts_fts) VALUES ('rebuild')")
+            self.conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # -- writes (crawler) ---------------------------------------------------
+
+    def register(self, vin: str, key: str):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute("INSERT OR IGNORE INTO vehicles (key) VALUES (?)", (key,))
+        self.conn.execute(
+            "INSERT INTO vins (vin, vehicle, seen) VALUES (?, ?, ?) "
+            "ON CONFLICT(vin) DO UPDATE SET vehicle = excluded.vehicle, seen = excluded.seen",
+            (normalize_vin(vin), key, now),
+        )
+        self.conn.execute("COMMIT")
+
+    def group_fresh(self, key: str, group: str) -> bool:
+        """The group was fully crawled within the vehicle's refresh interval."""
+        row = self.conn.execute(
+            "SELECT g.crawled, g.done = g.subgroups AND g.error IS NULL, v.refresh_days "
+            "FROM vehicle_groups g JOIN vehicles v ON v.key = g.vehicle WHERE g.vehicle = ? AND g.grp = ?",
+            (key, group),
+        ).fetchone()
+        if not row or not row[1]:
+            return False
+        days = row[2] if row[2] is not None else REFRESH_DAYS
+        return time.time() - row[0] < days * 86400.0
+
+    def store_group(self, key: str, group: str, names: List[str], entries: Dict[str, Dict],
+                    error: Optional[str] = None):
+        """Replace the parsed subgroups of ``group``; ``entries`` maps name to entry.
+
+        Subgroups that failed this time keep their previous data. When the
+        whole list was read, subgroups no longer listed are dropped.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for position, name in enumerate(names):
+                entry = entries.get(name)
+                if entry is None:
+                    continue
+                self.conn.execute(
+                    "DELETE FROM parts WHERE vehicle = ? AND grp = ? AND subgroup = ?", (key, group, name)
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO subgroups (vehicle, grp, name, position, diagram_image, crawled) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, group, name, position, entry.get("diagram_image"), now),
+                )
+                self.conn.executemany(
+                    "INSERT INTO parts (vehicle, grp, subgroup, item_no, description, supplement, "
+                    "quantity, from_date, to_date, part_number, price, notes, valid_from, valid_to) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (key, group, name, p["item_no"], p["description"], p["supplement"],
+                         p["quantity"], p["from_date"], p["to_date"], p["part_number"], p["price"],
+                         json.dumps(p["notes"], ensure_ascii=False),
+                         month_key(p["from_date"]), month_key(p["to_date"], end=True))
+                        for p in entry.get("parts") or []
+                    ],
+                )
+            if names and error is None:
+                marks = ",".join("?" * len(names))
+                self.conn.execute(
+                    f"DELETE FROM parts WHERE vehicle = ? AND grp = ? AND subgroup NOT IN ({marks})",
+                    (key, group, *names),
+                )
+                self.conn.execute(
+                    f"DELETE FROM subgroups WHERE vehicle = ? AND grp = ? AND name NOT IN ({marks})",
+                    (key, group, *names),
+                )
+            done = self.conn.execute(
+                "SELECT COUNT(*) FROM subgroups WHERE vehicle = ? AND grp = ? AND crawled = ?",
+                (key, group, now),
+            ).fetchone()[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO vehicle_groups (vehicle, grp, subgroups, done, crawled, error) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, group, len(names), done, now, error),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        partindex.add(
+            (p["part_number"], key, group, name, p["item_no"])
+            for name, entry in entries.items()
+            for p in entry.get("parts") or []
+            if p["part_number"]
+        )
+
+    def finish(self, key: str, complete: bool, error: Optional[str] = None,
+               refresh_days: Optional[float] = None):
+        """Record a finished crawl of ``key`` and schedule its next one."""
+        now = time.time()
+        if refresh_days is not None:
+            self.conn.execute("UPDATE vehicles SET refresh_days = ? WHERE key = ?", (refresh_days, key))
+        days = self.conn.execute(
+            "SELECT COALESCE(refresh_days, ?) FROM vehicles WHERE key = ?", (REFRESH_DAYS, key)
+        ).fetchone()[0]
+        due = now + (days * 86400.0 if complete else RETRY_HOURS * 3600.0)
+        self.conn.execute(
+            "UPDATE vehicles SET crawled = ?, refresh_due = ?, status = ?, error = ? WHERE key = ?",
+            (now, due, "complete" if complete else "partial", error, key),
+        )
+
+    # -- schedule -----------------------------------------------------------
+
+    def due(self, limit: Optional[int] = None) -> List[Dict]:
+        """Vehicles whose refresh is due, most overdue first, with a VIN to crawl them by."""
+        rows = self.conn.execute(
+            "SELECT v.key, (SELECT vin FROM vins WHERE vehicle = v.key ORDER BY seen DESC LIMIT 1) "
+            "FROM vehicles v WHERE v.refresh_due IS NULL OR v.refresh_due <= ? "
+            "ORDER BY COALESCE(v.refresh_due, 0) LIMIT ?",
+            (time.time(), limit if limit else -1),
+        ).fetchall()
+        return [{"vehicle": key, "vin": vin} for key, vin in rows if vin]
+
+    # -- reads --------------------------------------------------------------
+
+    def vehicle_for(self, vin: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT vehicle FROM vins WHERE vin = ?", (normalize_vin(vin),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def vins_of(self, key: str) -> List[str]:
+        return [r[0] for r in self.conn.execute(
+            "SELECT vin FROM vins WHERE vehicle = ? ORDER BY seen DESC", (key,))]
+
+    def subgroup_rows(self, key: str, group: str, titles: Iterable) -> Optional[List[Dict]]:
+        """Parts of the first stored subgroup matching ``titles``; None when not covered."""
+        max_age = time.time() - MAX_AGE_DAYS * 86400.0
+        names = [
+            r[0]
+            for r in self.conn.execute(
+                "SELECT name FROM subgroups WHERE vehicle = ? AND grp = ? AND crawled >= ? "
+                "ORDER BY position",
+                (key, group, max_age),
+            )
+        ]
+        for alternative in titles:
+            for name in names:
+                if _title_matches(name, alternative):
+                    return [
+                        {"description": r[0], "quantity": r[1], "part_number": r[2],
+                         "notes": json.loads(r[3] or "[]")}
+                        for r in self.conn.execute(
+                            "SELECT description, quantity, part_number, notes FROM parts "
+                            "WHERE vehicle = ? AND grp = ? AND subgroup = ? ORDER BY id",
+                            (key, group, name),
+                        )
+                    ]
+        return None
+
+    def lookup(self, vin: str, plan: OfflinePlan) -> Optional[List]:
+        """Part numbers a find_* flow would return for ``vin``, or None if not covered."""
+        key = self.vehicle_for(vin)
+        rows = self.subgroup_rows(key, plan.group, plan.titles) if key else None
+        if rows is None:
+            return None
+        match = plan.match.lower()
+        found = []
+        for row in rows:
+            description = (row["description"] or "").lower()
+            notes = " ".join(row["notes"]).lower()
+            if match not in description or "ended" in notes or not row["part_number"]:
+                continue
+            if any(word in description for word in plan.exclude):
+                continue
+            found.append((row["part_number"], row["quantity"]) if plan.with_qty else row["part_number"])
+        return list(dict.fromkeys(found)) if plan.unique else found
+
+    def search(self, query: str, vehicle: Optional[str] = None, from_date: Optional[str] = None,
+               to_date: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Stored parts matching every word of ``query`` (as a prefix), best first.
+
+        ``from_date``/``to_date`` keep the parts whose validity overlaps that
+        range; a part without a from/up-to date is open on that side.
+        """
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        sql = [
+            f"SELECT p.vehicle, p.grp, p.subgroup, s.diagram_image, p.item_no, p.description, "
+            f"p.supplement, p.quantity, p.from_date, p.to_date, p.part_number, p.price, p.notes, "
+            f"{_RANK} FROM parts_fts JOIN parts p ON p.id = parts_fts.rowid "
+            f"JOIN subgroups s ON s.vehicle = p.vehicle AND s.grp = p.grp AND s.name = p.subgroup "
+            f"WHERE parts_fts MATCH ? AND s.crawled >= ?"
+        ]
+        params: List = [" ".join(f'"{t}"*' for t in terms), time.time() - MAX_AGE_DAYS * 86400.0]
+        if vehicle:
+            sql.append("AND p.vehicle = ?")
+            params.append(vehicle)
+        since = month_key(from_date)
+        if since:
+            sql.append("AND (p.valid_to IS NULL OR p.valid_to >= ?)")
+            params.append(since)
+        until = month_key(to_date, end=True)
+        if until:
+            sql.append("AND (p.valid_from IS NULL OR p.valid_from <= ?)")
+            params.append(until)
+        sql.append(f"ORDER BY {_RANK} LIMIT ?")
+        params.append(limit)
+
+        columns = ("vehicle", "group", "subgroup", "diagram_image", "item_no", "description",
+                   "supplement", "quantity", "from_date", "to_date", "part_number", "price")
+        results = []
+        for row in self.conn.execute(" ".join(sql), params):
+            item = dict(zip(columns, row))
+            item["notes"] = json.loads(row[12] or "[]")
+            item["score"] = round(-row[13], 3)
+            results.append(item)
+        return results
+
+    def index_entries(self) -> Iterable[partindex.Entry]:
+        """Every stored part as a reverse index entry (see ``partindex.rebuild``)."""
+        return self.conn.execute(
+            "SELECT part_number, vehicle, grp, subgroup, item_no FROM parts WHERE part_number IS NOT NULL"
+        )
+
+    # -- coverage -----------------------------------------------------------
+
+    def report(self, groups: Iterable[str]) -> Dict:
+        """Coverage of every stored vehicle against ``groups`` (the allowed group keys)."""
+        groups = list(groups)
+        now = time.time()
+        vehicles = []
+        for key, crawled, refresh_days, refresh_due, status, error in self.conn.execute(
+            "SELECT key, crawled, refresh_days, refresh_due, status, error "
+            "FROM vehicles ORDER BY key"
+        ).fetchall():
+            stored = {
+                r[0]: r[1:]
+                for r in self.conn.execute(
+                    "SELECT grp, subgroups, done, error FROM vehicle_groups WHERE vehicle = ?", (key,)
+                )
+            }
+            complete = [g for g in groups if g in stored and stored[g][0] == stored[g][1] and not stored[g][2]]
+            parts = self.conn.execute(
+                "SELECT COUNT(*) FROM parts WHERE vehicle = ?", (key,)
+            ).fetchone()[0]
+            vehicles.append({
+                "vehicle": key,
+                "vins": self.vins_of(key),
+                "status": status,
+                "crawled": _iso(crawled),
+                "refresh_days": refresh_days if refresh_days is not None else REFRESH_DAYS,
+                "refresh_due": _iso(refresh_due),
+                "overdue": refresh_due is None or refresh_due <= now,
+                "groups_complete": len(complete),
+                "groups_total": len(groups),
+                "subgroups": sum(s[1] for s in stored.values()),
+                "parts": parts,
+                "missing": [g for g in groups if g not in stored],
+                "failed": [
+                    {"group": g, "done": s[1], "subgroups": s[0], "error": s[2]}
+                    for g, s in stored.items()
+                    if g not in complete
+                ],
+                "error": error,
+            })
+        return {
+            "vehicles": vehicles,
+            "total": len(vehicles),
+            "complete": sum(1 for v in vehicles if v["groups_complete"] == len(groups)),
+            "due": sum(1 for v in vehicles if v["overdue"]),
+        }
@@ -0,0 +1,64 @@
+"""Free-text search over the offline parts database (partsdb.py).
+
+    python search_parts.py [--vin=VIN] [--from=MM/YYYY] [--to=MM/YYYY]
+                           [--limit=N] [--numbers] [--] <query ...>
+
+With ``--vin`` only that VIN's vehicle is searched. ``--numbers`` prints just
+the part numbers still in production, like the find-part flows do, or
+``null`` when the VIN's vehicle has not been crawled.
+"""
+import sys
+import json
+from scraper_common import metrics
+from partsdb import PartsDB
+
+
+def main():
+    options = {}
+    words = []
+    args = sys.argv[1:]
+    for i, arg in enumerate(args):
+        if arg == "--":
+            words.extend(args[i + 1:])
+            break
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        else:
+            words.append(arg)
+    query = " ".join(words).strip()
+    if not query:
+        print(__doc__)
+        sys.exit(1)
+
+    db = PartsDB()
+    vin = options.get("vin")
+    vehicle = db.vehicle_for(vin) if vin else None
+    if vin and not vehicle:
+        print(json.dumps(None if "numbers" in options else
+                         {"query": query, "vehicle": None, "covered": False, "results": []}))
+        return
+
+    with metrics.timer("partsdb.search_ms"):
+        results = db.search(
+            query,
+            vehicle=vehicle,
+            from_date=options.get("from"),
+            to_date=options.get("to"),
+            limit=int(options.get("limit") or 50),
+        )
+
+    if "numbers" in options:
+        numbers = [
+            r["part_number"]
+            for r in results
+            if r["part_number"] and "ended" not in " ".join(r["notes"]).lower()
+        ]
+        print(json.dumps(list(dict.fromkeys(numbers))))
+        return
+    print(json.dumps({"query": query, "vehicle": vehicle, "covered": True, "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
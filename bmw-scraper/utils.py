@@ -87,4 +87,4 @@ def block_ads(route):
         #print(f"Blocking ad request: {url}")
         route.abort()
     else:
-        route.continue_()
\ No newline at end of file
+        route.fallback()
\ No newline at end of file
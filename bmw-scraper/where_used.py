@@ -0,0 +1,52 @@
+"""Which cached vehicles take a part number (scraper_common/partindex.py).
+
+    python where_used.py <part number>
+    python where_used.py --compact     merge the index log now
+    python where_used.py --rebuild     rebuild the index from the parts database
+"""
+import sys
+import json
+import time
+from scraper_common import metrics, partindex
+from partsdb import PartsDB
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    if sys.argv[1] == "--compact":
+        partindex.compact()
+        print(json.dumps({"entries": len(partindex.PartIndex())}))
+        return
+    if sys.argv[1] == "--rebuild":
+        partindex.rebuild(PartsDB().index_entries())
+        print(json.dumps({"entries": len(partindex.PartIndex())}))
+        return
+
+    part_number = " ".join(sys.argv[1:])
+    started = time.perf_counter()
+    uses = partindex.PartIndex().lookup(part_number)
+    lookup_us = (time.perf_counter() - started) * 1e6
+    metrics.emit("partindex.lookup_us", lookup_us)
+
+    db = PartsDB()
+    vehicles = {}
+    for use in uses:
+        vehicle = vehicles.setdefault(use["vehicle"], {
+            "vehicle": use["vehicle"],
+            "vins": db.vins_of(use["vehicle"]),
+            "uses": [],
+        })
+        vehicle["uses"].append({k: use[k] for k in ("group", "subgroup", "item_no")})
+
+    print(json.dumps({
+        "part_number": partindex.normalize(part_number),
+        "vehicles": list(vehicles.values()),
+        "lookup_us": round(lookup_us, 1),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
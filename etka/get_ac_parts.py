@@ -1,13 +1,16 @@
 # get_ac_parts.py
-import os
 import re
 import sys
 import json
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright, Page, ElementHandle
+from playwright.sync_api import sync_playwright, Page
 from playwright_stealth import Stealth
+from scraper_common import keywords, metrics
+from scraper_common.checkpoint import failure_reason
+from scraper_common.pagecheck import PageBlocked
+from session import Snapshots, open_session, search_vin
 
 load_dotenv()
 
@@ -18,185 +21,255 @@ load_dotenv()
 def normalize_text(s: str) -> str:
     return " ".join(s.split()).lower()
 
-def get_hex_color(el: ElementHandle) -> str:
-    color = el.evaluate("el => getComputedStyle(el).color")
-    rgb = list(map(int, re.findall(r"\d+", color)[:3]))
-    return "#{:02x}{:02x}{:02x}".format(*rgb)
-
-def is_row_active(row_el: ElementHandle) -> bool:
-    for td in row_el.query_selector_all("td"):
-        if get_hex_color(td) == "#212529":
-            return True
-    return False
-
-def find_by_match(
-    rows: List[ElementHandle],
-    predicate: Callable[[str], bool],
-    normalize: Callable[[str], str] = normalize_text,
-) -> Optional[ElementHandle]:
-    for row in rows:
-        text = row.evaluate("el => el.textContent || ''")
-        text = normalize(text)
-        if predicate(text) and is_row_active(row):
-            return row
-    return None
+# Every sub-group row in one evaluation: its normalized text, whether it is
+# active (some cell drawn in #212529) and, for the round-trip report, how many
+# cells a cell-by-cell colour check reads before deciding.
+_SUBGROUP_ROWS_JS = """
+() => {
+  const active = (td) => {
+    const nums = (getComputedStyle(td).color.match(/\\d+/g) || []).slice(0, 3).map(Number);
+    return nums.length === 3 && nums[0] === 0x21 && nums[1] === 0x25 && nums[2] === 0x29;
+  };
+  return Array.from(document.querySelectorAll("table.subGrTable tr")).map((row, index) => {
+    const tds = Array.from(row.querySelectorAll("td"));
+    const first = tds.findIndex(active);
+    return {
+      index,
+      text: (row.textContent || "").split(/\\s+/).filter(Boolean).join(" ").toLowerCase(),
+      active: first >= 0,
+      cells_read: first >= 0 ? first + 1 : tds.length,
+    };
+  });
+}
+"""
 
-def try_keywords(
-    rows: List[ElementHandle],
-    keywords: List[str],
-    normalize: Callable[[str], str] = normalize_text,
-) -> Optional[ElementHandle]:
+def _matchers(kw: str) -> List[Callable[[str], bool]]:
+    # Best first: exact, prefix, contains
+    return [lambda t: t == kw, lambda t: t.startswith(kw), lambda t: kw in t]
+
+def pick_row(rows: List[Dict], keywords: List[str]) -> Optional[Dict]:
+    """First active row matching the earliest keyword, best match kind first."""
     for kw in keywords:
-        target = (
-            find_by_match(rows, lambda t, kw=kw: t == kw, normalize)
-            or find_by_match(rows, lambda t, kw=kw: t.startswith(kw), normalize)
-            or find_by_match(rows, lambda t, kw=kw: kw in t, normalize)
-        )
-        if target:
-            return target
+        for match in _matchers(kw):
+            for row in rows:
+                if row["active"] and match(row["text"]):
+                    return row
     return None
 
+def per_cell_round_trips(rows: List[Dict], keywords: List[str]) -> int:
+    """Round trips the former per-row / per-cell matcher spent on ``keywords``.
+
+    It read each row's text, then for a matching row listed its cells and
+    read their colour one at a time until an active one.
+    """
+    trips = 0
+    for kw in keywords:
+        for match in _matchers(kw):
+            for row in rows:
+                trips += 1
+                if match(row["text"]):
+                    trips += 1 + row["cells_read"]
+                    if row["active"]:
+                        return trips
+    return trips
+
+# Names each part may appear under in the details table (canonical name
+# first), from the shared catalog keywords
 PART_ALIASES = {
-    "compressor": ["compressor", "ac compressor", "a/c compressor", "a c compressor"],
-    "condenser": ["condenser"],
-    "evaporator": ["evaporator"],
-    "expansion": ["expansion", "expansion valve", "valve", "regulation valve"],
+    name: keywords.names("superetka", name)
+    for name in keywords.parts("superetka", "get_ac_parts.py")
+}
+
+# Words that rule a details-table cell out for a part
+DISALLOWED = {
+    "compressor": ["bracket", "oil"],
+    "expansion": ["evaporator"],
 }
 
+# Every td.etkTd of the details table in document order, as records: the
+# part attributes (num, numn, title; null on description cells), its text,
+# whether it is drawn active (#212529), its row, and as ``parent`` the
+# index of the latest active part cell up to it (-1 before the first one),
+# the part a description cell belongs to.
+_DETAILS_RECORDS_JS = """
+() => {
+  const active = (td) => {
+    const nums = (getComputedStyle(td).color.match(/\\d+/g) || []).slice(0, 3).map(Number);
+    return nums.length === 3 && nums[0] === 0x21 && nums[1] === 0x25 && nums[2] === 0x29;
+  };
+  const records = [];
+  let parent = -1;
+  Array.from(document.querySelectorAll("table.detailsTable tr")).forEach((row, rowIndex) => {
+    for (const td of row.querySelectorAll("td.etkTd")) {
+      const text = (td.textContent || "").trim();
+      const isPart = td.hasAttribute("num");
+      const record = {
+        row: rowIndex,
+        num: isPart ? td.getAttribute("num") : null,
+        numn: isPart ? td.getAttribute("numn") : null,
+        title: isPart ? td.getAttribute("title") : null,
+        text,
+        active: active(td),
+        parent,
+      };
+      if (isPart && text && record.active) record.parent = parent = records.length;
+      records.push(record);
+    }
+  });
+  return records;
+}
+"""
+
+def normalize_cell(text: str) -> str:
+    """Lower-case alphanumerics and single spaces, as the details-table matcher compares."""
+    return " ".join(re.sub(r"[^a-z0-9\s]", "", (text or "").lower()).split())
+
+def find_part(records: List[Dict], part_key: str) -> Optional[Dict]:
+    """Part record of the first cell naming ``part_key`` (by its aliases), else None."""
+    aliases = [normalize_cell(a) for a in PART_ALIASES.get(part_key, [part_key])]
+    disallowed = DISALLOWED.get(part_key, [])
+    for record in records:
+        norm = normalize_cell(record["text"])
+        if record["parent"] < 0 or not norm:
+            continue
+        if any(w in norm for w in disallowed):
+            continue
+        for alias in aliases:
+            if norm.startswith(alias) if part_key == "expansion" else alias in norm:
+                return records[record["parent"]]
+    return None
+
+def _subgroup_searches(part_key: str) -> List[List[str]]:
+    searches = [[part_key]]
+    if part_key == "expansion":
+        searches.append(["evaporator", "electronic regulation"])
+    if part_key == "evaporator":
+        searches.append(["electronic regulation"])
+    return searches
+
+def _open_ac_group(page: Page) -> List[Dict]:
+    """Open "Air cond. system" on the main groups; returns its sub-group rows."""
+    page.wait_for_selector(".etka_newImg_mainTable li", timeout=120000)
+    page.evaluate("""
+        () => {
+            const items = Array.from(document.querySelectorAll(".etka_newImg_mainTable li"));
+            const acItem = items.find(el => el.innerText.includes("Air cond. system"));
+            if (acItem) acItem.click();
+        }
+    """)
+    page.wait_for_selector("table.subGrTable", timeout=120000)
+    page.evaluate("() => document.querySelector('table.subGrTable')?.scrollIntoView()")
+    page.wait_for_timeout(600)
+
+    # All rows read in one evaluation; matches are picked here
+    return page.evaluate(_SUBGROUP_ROWS_JS)
+
+def _pick_subgroup(rows: List[Dict], part_key: str) -> Optional[Dict]:
+    target_row = None
+    legacy_trips = 1  # the former query_selector_all of the rows
+    for search in _subgroup_searches(part_key):
+        target_row = pick_row(rows, search)
+        legacy_trips += per_cell_round_trips(rows, search)
+        if target_row:
+            break
+    metrics.emit("etka.subgroup_match.round_trips", 1, impl="evaluate")
+    metrics.emit("etka.subgroup_match.round_trips", legacy_trips, impl="per_cell")
+    return target_row
+
 # ----------------------------
 # Core scrape
 # ----------------------------
 
+def read_ac_parts(page: Page, vin: str, parts: List[str],
+                  snapshots: Optional[Snapshots] = None) -> Tuple[Dict[str, Optional[str]], Dict[str, str]]:
+    """Part numbers of ``parts`` on the vehicle's AC main group.
+
+    Expects a logged-in session showing the vehicle's main groups (after
+    ``session.search_vin``). Parts are grouped by the sub-group they live
+    in; each sub-group's details table is parsed once into records
+    (memoized per vehicle and sub-group in ``snapshots``) and every part on
+    it is answered from those. Returns the answers (None where the table
+    has no such part) and, per part without a fitting sub-group or whose
+    sub-group could not be read, the failure reason.
+    """
+    answers: Dict[str, Optional[str]] = {}
+    errors: Dict[str, str] = {}
+    rows = _open_ac_group(page)
+
+    by_subgroup: Dict[int, List[str]] = {}
+    for part_key in parts:
+        row = _pick_subgroup(rows, part_key)
+        if row:
+            by_subgroup.setdefault(row["index"], []).append(part_key)
+        else:
+            errors[part_key] = "No matching sub-group row found."
+
+    opened = False
+    for index, subgroup_parts in by_subgroup.items():
+        subgroup = rows[index]["text"]
+        try:
+            records = snapshots.details(vin, subgroup) if snapshots else None
+            metrics.emit("etka.details_records", 1, result="memo" if records is not None else "read")
+            if records is None:
+                if opened:
+                    # Back to the vehicle's main groups
+                    search_vin(page, vin)
+                    _open_ac_group(page)
+                page.locator("table.subGrTable tr").nth(index).click()
+                page.wait_for_selector("table.detailsTable", timeout=120000)
+                opened = True
+                records = page.evaluate(_DETAILS_RECORDS_JS)
+                if snapshots and records:
+                    snapshots.put_details(vin, subgroup, records)
+        except PageBlocked:
+            raise
+        except Exception as e:
+            for part_key in subgroup_parts:
+                errors[part_key] = failure_reason(e)
+            continue
+        for part_key in subgroup_parts:
+            record = find_part(records, part_key)
+            answers[part_key] = record["num"] if record else None
+    return answers, errors
+
+def scrape(vin: str, part_keys: List[str], store: List[str]) -> Dict:
+    """Answers for ``part_keys``: fresh ones from the VIN's snapshot, the rest read.
+
+    Only parts in ``store`` (canonical ones) are saved to the snapshot.
+    """
+    snapshots = Snapshots()
+    stored = snapshots.get(vin)["parts"]
+    answers = {part: stored[part] for part in part_keys if part in store and part in stored}
+    missing = [part for part in part_keys if part not in answers]
+    errors: Dict[str, str] = {}
+
+    if missing:
+        with Stealth().use_sync(sync_playwright()) as p, open_session(p) as page:
+            vehicle = search_vin(page, vin)
+            read, errors = read_ac_parts(page, vin, missing, snapshots)
+            snapshots.put(vin, vehicle, {part: num for part, num in read.items() if part in store})
+            answers.update(read)
+    return {"parts": answers, "errors": errors}
+
 def core_scrape(vin: str, part_type: str) -> Optional[str]:
-    user = os.getenv("ETKA_USER") or ""
-    pwd = os.getenv("ETKA_PASS") or ""
-    part_key = normalize_text(part_type)
-
-    with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True, timeout=30000)
-        context = browser.new_context()
-        context.set_default_timeout(60000)
-        context.set_default_navigation_timeout(60000)
-        page = context.new_page()
-
-        # Go to site & login if needed
-        page.goto("https://superetka.com/etka/", wait_until="domcontentloaded")
-        if page.locator('input[name="lgn"]').count() > 0:
-            page.locator('input[name="lgn"]').fill(user)
-            page.locator('input[name="pwd"]').fill(pwd)
-            page.locator("button[name='go']").click()
-            page.wait_for_load_state("networkidle")
-
-        # VIN search and close modal with Escape
-        page.locator("#vinSearch").fill(vin)
-        page.locator("#buttonVinSearch").click()
-        page.wait_for_selector("div.modal-content.ui-draggable", timeout=120000)
-        # page.wait_for_timeout(1000)
-        # #Modal2 > div > div > div.modal-footer.ui-draggable-handle > button
-        page.locator("#Modal2 > div > div > div.modal-footer.ui-draggable-handle > button").click()
-        page.wait_for_selector("div.modal-content.ui-draggable", state="hidden", timeout=120000)
-
-        # Click “Air cond. system”
-        page.wait_for_selector(".etka_newImg_mainTable li", timeout=120000)
-        page.evaluate("""
-            () => {
-                const items = Array.from(document.querySelectorAll(".etka_newImg_mainTable li"));
-                const acItem = items.find(el => el.innerText.includes("Air cond. system"));
-                if (acItem) acItem.click();
-            }
-        """)
-        page.wait_for_selector("table.subGrTable", timeout=120000)
-        page.evaluate("() => document.querySelector('table.subGrTable')?.scrollIntoView()")
-        page.wait_for_timeout(600)
-
-        # Build ElementHandle list (not Locators)
-        rows: List[ElementHandle] = page.query_selector_all("table.subGrTable tr")
-
-        kw = normalize_text(part_type)
-        target_row = try_keywords(rows, [kw])
-
-        if not target_row and kw == "expansion":
-            target_row = try_keywords(rows, ["evaporator", "electronic regulation"])
-        if not target_row and kw == "evaporator":
-            target_row = try_keywords(rows, ["electronic regulation"])
-
-        if not target_row:
-            print("No matching sub-group row found.")
-            browser.close()
-            return None
-
-        target_row.click()
-        page.wait_for_selector("table.detailsTable", timeout=120000)
-
-        # Extract part number in one DOM pass
-        aliases = PART_ALIASES.get(part_key, [part_key])
-        part_info = page.evaluate(
-            """([partKey, aliases]) => {
-                const normalize = (text) => (text || '')
-                    .toLowerCase()
-                    .replace(/[^a-z0-9\\s]/g, '')
-                    .replace(/\\s+/g, ' ')
-                    .trim();
-
-                const rows = Array.from(document.querySelectorAll("table.detailsTable tr"));
-                let lastValidPart = null;
-
-                const disallowedMap = {
-                    compressor: ["bracket", "oil"],
-                    expansion: ["evaporator"],
-                };
-                const disallowed = disallowedMap[partKey] || [];
-
-                const getHex = (el) => {
-                    const c = getComputedStyle(el).color;
-                    const nums = c.match(/\\d+/g)?.map(Number);
-                    if (!nums) return '';
-                    return "#" + nums.slice(0,3).map(v => v.toString(16).padStart(2, "0")).join("");
-                };
-
-                for (const row of rows) {
-                    const tds = Array.from(row.querySelectorAll("td.etkTd"));
-                    for (const td of tds) {
-                        const text = (td.textContent || '').trim();
-                        const norm = normalize(text);
-
-                        if (td.hasAttribute("num") && text) {
-                            const hex = getHex(td);
-                            if (hex === "#212529") {
-                                lastValidPart = {
-                                    num: td.getAttribute("num"),
-                                    numn: td.getAttribute("numn"),
-                                    title: td.getAttribute("title"),
-                                    text: text
-                                };
-                            }
-                        }
-
-                        if (!lastValidPart || !norm) continue;
-
-                        const hasDisallowed = disallowed.some(w => norm.includes(w));
-                        if (hasDisallowed) continue;
-
-                        for (let a of aliases) {
-                            const na = normalize(a);
-                            const isMatch = partKey === "expansion"
-                                ? norm.startsWith(na)
-                                : norm.includes(na);
-                            if (isMatch) return lastValidPart;
-                        }
-                    }
-                }
-                return null;
-            }""",
-            [part_key, aliases],
-        )
-
-        num = part_info["num"] if part_info else None
-        #print(f"🔩 {part_type} Part Number:", num or "Not found")
-        print(json.dumps(num))
-
-        browser.close()
-        return num
+    resolved = keywords.resolve("superetka", part_type)
+    part_key = resolved.part if resolved else normalize_text(part_type)
+
+    result = scrape(vin, [part_key], [part_key] if resolved else [])
+    if part_key in result["errors"]:
+        print(result["errors"][part_key])
+        return None
+
+    num = result["parts"][part_key]
+    #print(f"🔩 {part_type} Part Number:", num or "Not found")
+    print(json.dumps(num))
+    return num
+
+def scrape_all(vin: str) -> Dict:
+    """Every AC part of the vehicle in one call, keyed by canonical part."""
+    result = scrape(vin, list(PART_ALIASES), list(PART_ALIASES))
+    print(json.dumps(result, indent=1))
+    return result
 
 # ----------------------------
 # CLI
@@ -204,9 +277,12 @@ def core_scrape(vin: str, part_type: str) -> Optional[str]:
 
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python get_ac_parts.py <vin> <part>")
+        print("Usage: python get_ac_parts.py <vin> <part>|--all")
         sys.exit(1)
     vin = sys.argv[1]
+    if sys.argv[2] == "--all":
+        scrape_all(vin)
+        return
     part = " ".join(sys.argv[2:])
     core_scrape(vin, part)
 
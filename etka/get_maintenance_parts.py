@@ -1,12 +1,15 @@
-import os
 import re
 import sys
 import json
-from typing import Callable, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright, Page, ElementHandle
+from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeout
 from playwright_stealth import Stealth
+from scraper_common import keywords
+from scraper_common.checkpoint import failure_reason
+from scraper_common.pagecheck import PageBlocked
+from session import Snapshots, open_session, search_vin
 
 load_dotenv()
 
@@ -17,105 +20,162 @@ load_dotenv()
 def normalize_text(s: str) -> str:
     return " ".join(s.split()).lower()
 
-#returns key for appropriate part category
-def determine_category(s: str, part_type:dict) -> str:
-    return next((k for k, v in part_type.items() if s in v), None)
-
-    
-
-
-
-SERVICE_PARTS = {
-    "Spark plugs": ["spark plugs", "spark-plugs"],
-    "Air filter elements": ["air filter", "air-filter"],
-    "Engine oil filter": ["engine oil filter"],
-    "Engine oil" : ["engine oil"],
-    "Dust/pollen filter": ["dust filter", "pollen filter", "ac filter", "insert filter","harmful substance filter"],
-    "Transmisson oil": ["transmisson oil"],
-    "Toothed belt": ["toothed belt", "assembly belt"],
-    "Timing belt kits": ["timing belt", "timing belt kit"]
-
-}
-
-WEAR_PARTS = {
-    "Brake discs": ["brake discs","brake-discs"],
-    "Disc brake pads": ["disc brake pads"]
-}
-
 # ----------------------------
 # Core scrape
 # ----------------------------
 
-def core_scrape(vin: str, part_type: str) -> Optional[str]:
-    user = os.getenv("ETKA_USER") or ""
-    pwd = os.getenv("ETKA_PASS") or ""
-    part_key = normalize_text(part_type)
-    include_qty = False
-    if part_key in SERVICE_PARTS["Spark plugs"]:
-        include_qty = True
-    category = determine_category(part_key , SERVICE_PARTS) or determine_category(part_key , WEAR_PARTS) 
-    # #spareContent1 > table > tbody > tr:nth-child(1)
-    
-       
-    with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True, timeout=30000)
-        context = browser.new_context()
-        context.set_default_timeout(60000)
-        context.set_default_navigation_timeout(60000)
-        page = context.new_page()
-        
-        # Go to site & login if needed
-        page.goto("https://superetka.com/etka/", wait_until="domcontentloaded")
-        if page.locator('input[name="lgn"]').count() > 0:
-            page.locator('input[name="lgn"]').fill(user)
-            page.locator('input[name="pwd"]').fill(pwd)
-            page.locator("button[name='go']").click()
-            page.wait_for_load_state("domcontentloaded")
-
-        # VIN search and close modal with Escape
-        page.locator("#vinSearch").fill(vin)
-        page.locator("#buttonVinSearch").click()
-        page.wait_for_selector("div.modal-content.ui-draggable", timeout=120000)
-        page.locator("#Modal2 > div > div > div.modal-footer.ui-draggable-handle > button").click()
-        page.wait_for_selector("div.modal-content.ui-draggable", state="hidden", timeout=120000)
-        
-        #nav-epc > div.topButtons > table > tbody > tr:nth-child(1) > td:nth-child(2)
-        page.locator("#nav-epc > div.topButtons > table > tbody > tr").nth(0).locator("td").nth(1).click()
-        if category in WEAR_PARTS:
-            page.locator("#nav-spare1-tab").click()
-        pattern = re.compile(fr"^{category}$", re.IGNORECASE)
-        page.get_by_text(pattern).click()
-        page.wait_for_timeout(1000)
-        
-        #spareContent0 > table > tbody > tr   //single element
-        #spareContent0 > table > tbody > tr:nth-child(1)  //one out of multiple elements
-        #spareContent0 > table > tbody > tr:nth-child(1) > td:nth-child(6)
-        #spareContent0 > table > tbody > tr:nth-child(2) > td:nth-child(6)
-        #qty at index 5 and part num at 2
-        content_index = 1 if category in WEAR_PARTS else 0
-        data = []
-        rows = page.locator(f"#spareContent{content_index} > table > tbody > tr")
-        rows.first.wait_for(state="attached")
-        for i in range(rows.count()):
-            qty = rows.nth(i).locator("td").nth(5).inner_text()
-            if not re.match(r"\d+",qty):
-                continue
-            part_num = rows.nth(i).locator("td").nth(2).inner_text()
-            if include_qty:
-                data.append({"part":part_num, "qty": qty})
-            else:
-                data.append(part_num)
-
-        
+# Part number (column 3) and quantity (column 6) of every row of a
+# #spareContent<n> table, in one round trip
+_SPARE_ROWS_JS = """
+(index) => Array.from(
+  document.querySelectorAll(`#spareContent${index} > table > tbody > tr`),
+  (row) => {
+    const tds = row.querySelectorAll("td");
+    return [tds[2] ? tds[2].innerText : "", tds[5] ? tds[5].innerText : ""];
+  }
+)
+"""
+
+
+def _open_spare_parts(page: Page):
+    #nav-epc > div.topButtons > table > tbody > tr:nth-child(1) > td:nth-child(2)
+    page.locator("#nav-epc > div.topButtons > table > tbody > tr").nth(0).locator("td").nth(1).click()
+
+
+# Text of a #spareContent<n> table, to tell when a click has replaced it
+_SPARE_TEXT_JS = """
+(index) => {
+  const body = document.querySelector(`#spareContent${index} > table > tbody`);
+  return body ? body.innerText : "";
+}
+"""
+
+# How long a category click may take to replace the table shown before it
+CATEGORY_SWAP_TIMEOUT_MS = 5000
+
+
+def _read_category(page: Page, plan: Dict) -> List:
+    """Click ``plan``'s category on the open tab and read its table."""
+    # Service parts show in #spareContent0, wear parts in #spareContent1;
+    # qty at index 5 and part num at 2
+    content_index = 1 if plan["tab"] == "wear" else 0
+    before = page.evaluate(_SPARE_TEXT_JS, content_index)
+
+    pattern = re.compile(fr"^{plan['category']}$", re.IGNORECASE)
+    page.get_by_text(pattern).click()
+    page.locator(f"#spareContent{content_index} > table > tbody > tr").first.wait_for(state="attached")
+    # The table is replaced in place: reading too early would return the
+    # previous category's rows. It may also stay the same (the category was
+    # already showing), so waiting out the timeout is not an error.
+    try:
+        page.wait_for_function(
+            f"(before) => {{ const text = ({_SPARE_TEXT_JS})({content_index}); return text && text !== before; }}",
+            arg=before,
+            timeout=CATEGORY_SWAP_TIMEOUT_MS,
+        )
+    except PlaywrightTimeout:
+        pass
+    data = []
+    for part_num, qty in page.evaluate(_SPARE_ROWS_JS, content_index):
+        if not re.match(r"\d+", qty):
+            continue
+        if plan.get("qty"):
+            data.append({"part": part_num, "qty": qty})
+        else:
+            data.append(part_num)
+    return data
+
+
+def read_maintenance_part(page: Page, plan: Dict) -> List:
+    """Part numbers of a service / wear category (``plan`` from the shared keywords).
+
+    Expects a logged-in session showing the vehicle (after
+    ``session.search_vin``). With ``plan["qty"]`` each entry is
+    ``{"part", "qty"}``.
+    """
+    _open_spare_parts(page)
+    if plan["tab"] == "wear":
+        page.locator("#nav-spare1-tab").click()
+    return _read_category(page, plan)
+
+
+def read_maintenance_parts(page: Page, plans: Dict[str, Dict]) -> Tuple[Dict[str, List], Dict[str, str]]:
+    """``read_maintenance_part`` for several parts, opening each tab once.
+
+    ``plans`` maps canonical part to plan. Returns the answers and, per part
+    that could not be read, the failure reason.
+    """
+    answers: Dict[str, List] = {}
+    errors: Dict[str, str] = {}
+    _open_spare_parts(page)
+    on_wear_tab = False
+    # Service tab first: it is the one that opens
+    for part, plan in sorted(plans.items(), key=lambda item: item[1]["tab"] == "wear"):
+        try:
+            if plan["tab"] == "wear" and not on_wear_tab:
+                page.locator("#nav-spare1-tab").click()
+                on_wear_tab = True
+            answers[part] = _read_category(page, plan)
+        except PageBlocked:
+            raise
+        except Exception as e:
+            errors[part] = failure_reason(e)
+    return answers, errors
+
+
+def scrape_all(vin: str) -> Dict:
+    """Every service and wear category of the vehicle, keyed by canonical part."""
+    plans = {part: r.plan for part, r in keywords.parts("superetka", "get_maintenance_parts.py").items()}
+
+    # Categories read by earlier runs for this VIN (session.Snapshots)
+    snapshots = Snapshots()
+    stored = snapshots.get(vin)["parts"]
+    answers = {part: stored[part] for part in plans if part in stored}
+    missing = {part: plan for part, plan in plans.items() if part not in answers}
+    errors: Dict[str, str] = {}
+
+    if missing:
+        with Stealth().use_sync(sync_playwright()) as p, open_session(p) as page:
+            vehicle = search_vin(page, vin)
+            read, errors = read_maintenance_parts(page, missing)
+            snapshots.put(vin, vehicle, read)
+            answers.update(read)
+
+    result = {"parts": answers, "errors": errors}
+    print(json.dumps(result, indent=1))
+    return result
+
+def core_scrape(vin: str, part_type: str) -> Optional[List]:
+    # Category label and tab (service / wear parts) from the shared catalog keywords
+    resolved = keywords.resolve("superetka", part_type)
+    if not resolved or "category" not in resolved.plan:
+        print(f"Unsupported part '{part_type}'")
+        sys.exit(2)
+
+    # Answered by an earlier run for this VIN (session.Snapshots)
+    snapshots = Snapshots()
+    stored = snapshots.part(vin, resolved.part)
+    if stored is not None:
+        print(json.dumps(stored["answer"], indent=1))
+        return stored["answer"]
+
+    with Stealth().use_sync(sync_playwright()) as p, open_session(p) as page:
+        vehicle = search_vin(page, vin)
+        data = read_maintenance_part(page, resolved.plan)
+        snapshots.put(vin, vehicle, {resolved.part: data})
+
         print(json.dumps(data,indent=1))
-       
-        
+        return data
+
 
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python get_maintenance_parts.py <vin> <part>")
+        print("Usage: python get_maintenance_parts.py <vin> <part>|--all")
         sys.exit(1)
     vin = sys.argv[1]
+    if sys.argv[2] == "--all":
+        scrape_all(vin)
+        return
     part = " ".join(sys.argv[2:])
     core_scrape(vin, part)
 
@@ -0,0 +1,92 @@
+"""Vehicle data and any number of AC / maintenance parts from one ETKA session.
+
+    python get_snapshot.py <vin> [part ...]
+
+Each part is one argument ("air filter"). Answers come from the VIN's
+snapshot (session.Snapshots) where fresh; the rest is read after a single
+login, and stored back into the snapshot. Maintenance parts are read in one
+pass over the service and wear tabs.
+"""
+import sys
+import json
+from dotenv import load_dotenv
+from playwright.sync_api import sync_playwright
+from playwright_stealth import Stealth
+from scraper_common import keywords
+from scraper_common.checkpoint import failure_reason
+from scraper_common.pagecheck import PageBlocked
+from session import Snapshots, open_session, search_vin
+from get_ac_parts import read_ac_parts
+from get_maintenance_parts import read_maintenance_parts
+
+load_dotenv()
+
+
+def read_parts(page, vin, snapshots, wanted, missing):
+    """Read ``missing`` parts: the AC ones in one batch, the maintenance ones in one pass."""
+    read, errors = {}, {}
+    ac = [part for part in missing if wanted[part].script.endswith("/get_ac_parts.py")]
+    maintenance = {part: wanted[part].plan for part in missing if part not in ac}
+    steps = []
+    if ac:
+        steps.append((ac, lambda: read_ac_parts(page, vin, ac, snapshots)))
+    if maintenance:
+        steps.append((list(maintenance), lambda: read_maintenance_parts(page, maintenance)))
+    for i, (parts, read_step) in enumerate(steps):
+        try:
+            if i:
+                # Back to the vehicle's main groups
+                search_vin(page, vin)
+            answers, failed = read_step()
+            read.update(answers)
+            errors.update(failed)
+        except PageBlocked:
+            raise
+        except Exception as e:
+            for part in parts:
+                errors[part] = failure_reason(e)
+    return read, errors
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    vin = sys.argv[1].strip()
+
+    wanted = {}
+    unsupported = []
+    for text in sys.argv[2:]:
+        resolved = keywords.resolve("superetka", text)
+        if resolved:
+            wanted[resolved.part] = resolved
+        else:
+            unsupported.append(text)
+
+    snapshots = Snapshots()
+    snapshot = snapshots.get(vin)
+    vehicle = snapshot["vehicle"]
+    parts = {part: snapshot["parts"][part] for part in wanted if part in snapshot["parts"]}
+    cached = sorted(parts)
+    missing = [part for part in wanted if part not in parts]
+    errors = {}
+
+    if vehicle is None or missing:
+        with Stealth().use_sync(sync_playwright()) as p, open_session(p) as page:
+            vehicle = search_vin(page, vin)
+            read, errors = read_parts(page, vin, snapshots, wanted, missing)
+            snapshots.put(vin, vehicle, read)
+            parts.update(read)
+
+    print(json.dumps({
+        "vin": vin,
+        "vehicle": vehicle,
+        "parts": parts,
+        "cached": cached,
+        "errors": errors,
+        "unsupported": unsupported,
+    }, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""ETKA (superetka) session steps shared by the scripts, and vehicle snapshots.
+
+Every ETKA run opens a page on a leased account (``scraper_common.accounts``,
+starting from that account's stored session and logging in only when the
+login form shows) and searches the VIN; the search answers with a modal
+holding the vehicle data, which ``search_vin`` reads before closing it.
+
+Snapshots (``etka.sqlite``, see ``state``) keep per VIN the vehicle data and
+every part answer read so far, each with the time it was read. Any run that
+reads something stores it, and the scripts answer from a snapshot younger
+than ``ETKA_SNAPSHOT_TTL_H`` hours without opening a browser. The parsed
+records of each AC sub-group's details table are kept alongside, so every
+part on an already read sub-group is answered without opening it again.
+"""
+import os
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from scraper_common import accounts, state
+from scraper_common.browser import launch_chromium
+from scraper_common.checkpoint import failure_reason
+from scraper_common.pagecheck import PageBlocked, goto, wait_for
+
+ETKA_URL = "https://superetka.com/etka/"
+SNAPSHOT_TTL_S = float(os.getenv("ETKA_SNAPSHOT_TTL_H", "168")) * 3600.0
+
+_MODAL = "div.modal-content.ui-draggable"
+_MODAL_CLOSE = "#Modal2 > div > div > div.modal-footer.ui-draggable-handle > button"
+
+# Label -> value rows of the vehicle data table in the VIN search modal
+_VEHICLE_DATA_JS = """
+() => {
+  const tables = document.querySelectorAll("div.modal-dialog table tbody");
+  const data = {};
+  if (tables.length < 2) return data;
+  for (const row of tables[1].querySelectorAll("tr")) {
+    const tds = row.querySelectorAll("td");
+    if (tds.length >= 2) data[tds[0].innerText] = tds[1].innerText;
+  }
+  return data;
+}
+"""
+
+
+def login(page, account: accounts.Account):
+    """Open ETKA, logging in as ``account`` when the login form shows."""
+    goto(page, ETKA_URL, wait_until="domcontentloaded")
+    if page.locator('input[name="lgn"]').count() > 0:
+        page.locator('input[name="lgn"]').fill(account.user)
+        page.locator('input[name="pwd"]').fill(account.password)
+        page.locator("button[name='go']").click()
+        page.wait_for_load_state("domcontentloaded")
+        wait_for(page, "#vinSearch", allow_login=False)
+
+
+@contextmanager
+def open_session(p) -> Iterator[Any]:
+    """Logged-in ETKA page on a leased account; the browser closes on exit.
+
+    The account's session is stored once logged in. A failed login or a
+    block page counts against the account.
+    """
+    with accounts.lease("etka") as account:
+        browser = launch_chromium(p, headless=True, timeout=30000)
+        logged_in = False
+        try:
+            context = browser.new_context(**account.context_options())
+            context.set_default_timeout(60000)
+            context.set_default_navigation_timeout(60000)
+            page = context.new_page()
+            login(page, account)
+            logged_in = True
+            account.save(context)
+            yield page
+        except Exception as e:
+            if not logged_in or isinstance(e, PageBlocked):
+                account.failed(failure_reason(e))
+            raise
+        finally:
+            browser.close()
+
+
+def search_vin(page, vin: str, close: bool = True) -> Dict[str, str]:
+    """Search ``vin``; returns the vehicle data shown in the result modal.
+
+    The modal is closed afterwards unless ``close`` is False. Searching again
+    also brings a session back to the vehicle's main groups.
+    """
+    page.locator("#vinSearch").fill(vin)
+    page.locator("#buttonVinSearch").click()
+    page.wait_for_selector(_MODAL, timeout=120000)
+    page.locator("div.modal-dialog table tbody").nth(1).locator("tr").first.wait_for(state="attached")
+    data = page.evaluate(_VEHICLE_DATA_JS)
+    if close:
+        page.locator(_MODAL_CLOSE).click()
+        page.wait_for_selector(_MODAL, state="hidden", timeout=120000)
+    return data
+
+
+class Snapshots:
+    def __init__(self):
+        self.conn = state.connect("etka.sqlite")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " vin TEXT PRIMARY KEY,"
+            " vehicle TEXT, vehicle_read REAL,"
+            " parts TEXT NOT NULL DEFAULT '{}')"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS details ("
+            " vin TEXT NOT NULL, subgroup TEXT NOT NULL,"
+            " records TEXT NOT NULL, read REAL NOT NULL,"
+            " PRIMARY KEY (vin, subgroup))"
+        )
+
+    @staticmethod
+    def _key(vin: str) -> str:
+        return vin.strip().upper()
+
+    def get(self, vin: str) -> Dict[str, Any]:
+        """``{"vehicle": ..., "parts": {part: answer}}`` with only the fresh entries."""
+        row = self.conn.execute(
+            "SELECT vehicle, vehicle_read, parts FROM snapshots WHERE vin = ?", (self._key(vin),)
+        ).fetchone()
+        now = time.time()
+        if not row:
+            return {"vehicle": None, "parts": {}}
+        vehicle = json.loads(row[0]) if row[0] and now - row[1] <= SNAPSHOT_TTL_S else None
+        parts = {
+            part: entry["answer"]
+            for part, entry in json.loads(row[2]).items()
+            if now - entry["read"] <= SNAPSHOT_TTL_S
+        }
+        return {"vehicle": vehicle, "parts": parts}
+
+    def part(self, vin: str, part: str) -> Optional[Dict[str, Any]]:
+        """``{"answer": ...}`` for a fresh stored part answer, else None."""
+        parts = self.get(vin)["parts"]
+        return {"answer": parts[part]} if part in parts else None
+
+    def put(self, vin: str, vehicle: Optional[Dict[str, str]] = None, parts: Optional[Dict[str, Any]] = None):
+        """Merge what a run read into the VIN's snapshot.
+
+        Empty answers (None, no part numbers) are not stored: they are as
+        likely a page that did not load as a part the vehicle lacks, and
+        would otherwise be served for the whole TTL.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT vehicle, vehicle_read, parts FROM snapshots WHERE vin = ?", (self._key(vin),)
+            ).fetchone()
+            stored_vehicle, vehicle_read, stored_parts = row if row else (None, None, "{}")
+            if vehicle:
+                stored_vehicle, vehicle_read = json.dumps(vehicle, ensure_ascii=False), now
+            merged = json.loads(stored_parts)
+            for part, answer in (parts or {}).items():
+                if answer not in (None, "", [], {}):
+                    merged[part] = {"answer": answer, "read": now}
+            self.conn.execute(
+                "INSERT INTO snapshots (vin, vehicle, vehicle_read, parts) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(vin) DO UPDATE SET vehicle = excluded.vehicle, "
+                "vehicle_read = excluded.vehicle_read, parts = excluded.parts",
+                (self._key(vin), stored_vehicle, vehicle_read, json.dumps(merged, ensure_ascii=False)),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def details(self, vin: str, subgroup: str) -> Optional[List[Dict[str, Any]]]:
+        """Fresh details-table records of a sub-group of the vehicle, else None."""
+        row = self.conn.execute(
+            "SELECT records, read FROM details WHERE vin = ? AND subgroup = ?", (self._key(vin), subgroup)
+        ).fetchone()
+        if not row or time.time() - row[1] > SNAPSHOT_TTL_S:
+            return None
+        return json.loads(row[0])
+
+    def put_details(self, vin: str, subgroup: str, records: List[Dict[str, Any]]):
+        self.conn.execute(
+            "INSERT INTO details (vin, subgroup, records, read) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(vin, subgroup) DO UPDATE SET records = excluded.records, read = excluded.read",
+            (self._key(vin), subgroup, json.dumps(records, ensure_ascii=False), time.time()),
+        )
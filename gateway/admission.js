@@ -0,0 +1,353 @@
+// Admission control for scraper endpoints. Every admitted request runs a
+// Chromium, so the gateway caps how many run at once (overall and per
+// catalog), parks the rest in a bounded FIFO queue, and answers 429 with a
+// Retry-After once the queue is full or the instance is short on memory.
+//
+// Requests come in two classes. "interactive" lookups are started ahead of
+// queued "bulk" crawls and may push the newest bulk request out of a full
+// queue; bulk still gets every Nth start while both are waiting
+// (ADMISSION_BULK_MIN_SHARE) and, so a long crawl never holds the slots a
+// lookup needs, runs on its own cap instead of the catalog's.
+//
+//   ADMISSION_MAX_ACTIVE         runs allowed at once across all catalogs
+//   ADMISSION_CATALOG_LIMIT      default cap per catalog
+//   ADMISSION_LIMITS             per-catalog overrides, e.g. "realoem=2,7zap=1"
+//   ADMISSION_QUEUE_SIZE         requests allowed to wait
+//   ADMISSION_QUEUE_TIMEOUT_MS   how long one may wait before a 429
+//   ADMISSION_MIN_FREE_MB        free-memory watermark
+//   ADMISSION_BULK_MAX_ACTIVE    bulk runs allowed at once
+//   ADMISSION_BULK_MIN_SHARE     share of starts bulk gets under contention
+//
+// Catalogs behind a login (scraper_common/accounts.py) default to one run
+// per pooled session: their accounts (ETKA_ACCOUNTS, else ETKA_USER; ssg
+// likewise, else ETKA's) times ACCOUNT_MAX_SESSIONS. Catalogs running on
+// the same accounts also share that cap, so a request waits here for a
+// session rather than in the scraper for a lease.
+
+import fs from "fs";
+import os from "os";
+import * as metrics from "./metrics.js";
+
+const MAX_ACTIVE = Number(process.env.ADMISSION_MAX_ACTIVE || 2);
+const CATALOG_LIMIT = Number(process.env.ADMISSION_CATALOG_LIMIT || 1);
+const QUEUE_SIZE = Number(process.env.ADMISSION_QUEUE_SIZE || 20);
+const QUEUE_TIMEOUT_MS = Number(process.env.ADMISSION_QUEUE_TIMEOUT_MS || 120000);
+const MIN_FREE_MB = Number(process.env.ADMISSION_MIN_FREE_MB || 400);
+const BULK_MAX_ACTIVE = Number(
+  process.env.ADMISSION_BULK_MAX_ACTIVE || Math.max(1, MAX_ACTIVE - 1)
+);
+const BULK_MIN_SHARE = Number(process.env.ADMISSION_BULK_MIN_SHARE || 0.2);
+// Interactive starts in a row before a waiting bulk request goes first
+const BULK_EVERY = BULK_MIN_SHARE > 0 ? Math.max(1, Math.round(1 / BULK_MIN_SHARE) - 1) : Infinity;
+// Used for Retry-After until a catalog has finished a few runs
+const DEFAULT_RUN_MS = 20000;
+
+const catalogLimits = Object.fromEntries(
+  (process.env.ADMISSION_LIMITS || "")
+    .split(",")
+    .map((pair) => pair.split("=").map((s) => s.trim()))
+    .filter(([name, value]) => name && Number(value) > 0)
+    .map(([name, value]) => [name, Number(value)])
+);
+
+// Catalog -> env prefix of its accounts, and the catalog whose accounts it
+// runs on without its own (as accounts.credentials() reads them)
+const ACCOUNT_POOLS = { superetka: "ETKA", ssg: "SSG" };
+const ACCOUNT_FALLBACK = { ssg: "superetka" };
+
+function ownAccounts(name) {
+  const prefix = ACCOUNT_POOLS[name];
+  if (!prefix) return 0;
+  const accounts = (process.env[`${prefix}_ACCOUNTS`] || "")
+    .split(",")
+    .filter((item) => item.trim().split(":")[0]);
+  if (accounts.length) return accounts.length;
+  return process.env[`${prefix}_USER`] ? 1 : 0;
+}
+
+// Catalog whose accounts `name` runs on, or null if it needs no login.
+function accountPool(name) {
+  if (!ACCOUNT_POOLS[name]) return null;
+  if (!ownAccounts(name) && ACCOUNT_FALLBACK[name]) return accountPool(ACCOUNT_FALLBACK[name]);
+  return name;
+}
+
+function accountCapacity(name) {
+  const pool = accountPool(name);
+  return pool ? ownAccounts(pool) * Number(process.env.ACCOUNT_MAX_SESSIONS || 1) : 0;
+}
+
+export const INTERACTIVE = "interactive";
+export const BULK = "bulk";
+
+const catalogs = new Map();
+const queues = { [INTERACTIVE]: [], [BULK]: [] };
+const classes = {
+  [INTERACTIVE]: { active: 0, admitted: 0, rejected: 0, preempted: 0 },
+  [BULK]: { active: 0, admitted: 0, rejected: 0, preempted: 0, runMs: DEFAULT_RUN_MS },
+};
+let active = 0;
+let interactiveSinceBulk = 0;
+
+function queuedCount() {
+  return queues[INTERACTIVE].length + queues[BULK].length;
+}
+
+function catalogState(name) {
+  let state = catalogs.get(name);
+  if (!state) {
+    state = {
+      limit: catalogLimits[name] || accountCapacity(name) || CATALOG_LIMIT,
+      pool: accountPool(name),
+      poolLimit: accountCapacity(name),
+      active: 0,
+      runMs: DEFAULT_RUN_MS,
+      admitted: 0,
+      rejected: 0,
+    };
+    catalogs.set(name, state);
+  }
+  return state;
+}
+
+function readNumber(file) {
+  try {
+    const value = fs.readFileSync(file, "utf8").trim();
+    return value === "max" ? Infinity : Number(value);
+  } catch {
+    return NaN;
+  }
+}
+
+// Page cache the kernel can drop on demand is not counted as used.
+function inactiveFileBytes(file, field) {
+  try {
+    const line = fs
+      .readFileSync(file, "utf8")
+      .split("\n")
+      .find((l) => l.startsWith(`${field} `));
+    return line ? Number(line.split(" ")[1]) : 0;
+  } catch {
+    return 0;
+  }
+}
+
+// Free memory of the container (cgroup v2, then v1), else of the host.
+export function freeMemoryMb() {
+  const cgroups = [
+    ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current",
+      "/sys/fs/cgroup/memory.stat", "inactive_file"],
+    ["/sys/fs/cgroup/memory/memory.limit_in_bytes",
+      "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+      "/sys/fs/cgroup/memory/memory.stat", "total_inactive_file"],
+  ];
+  for (const [limitFile, usageFile, statFile, field] of cgroups) {
+    const limit = Math.min(readNumber(limitFile), os.totalmem());
+    const usage = readNumber(usageFile);
+    if (Number.isFinite(limit) && Number.isFinite(usage)) {
+      const used = Math.max(0, usage - inactiveFileBytes(statFile, field));
+      return (limit - used) / 1024 / 1024;
+    }
+  }
+  return os.freemem() / 1024 / 1024;
+}
+
+function retryAfterSeconds(state, priority) {
+  const counted = priority === BULK ? classes[BULK] : state;
+  const limit = priority === BULK ? BULK_MAX_ACTIVE : state.limit;
+  const slots = Math.max(1, Math.min(limit, MAX_ACTIVE));
+  const ahead = queues[priority].length + counted.active;
+  return Math.max(1, Math.ceil(((ahead / slots) * counted.runMs) / 1000));
+}
+
+function reject(entry, reason) {
+  const { catalog, state, priority, res } = entry;
+  const retryAfter = retryAfterSeconds(state, priority);
+  state.rejected += 1;
+  classes[priority].rejected += 1;
+  metrics.inc("admission.rejected", { catalog, class: priority, reason });
+  res.set("Retry-After", String(retryAfter));
+  res.status(429).json({
+    error: "Too Many Requests",
+    reason,
+    retry_after_s: retryAfter,
+  });
+}
+
+// Runs of all catalogs on the account pool `pool`.
+function poolActive(pool) {
+  let n = 0;
+  for (const state of catalogs.values()) if (state.pool === pool) n += state.active;
+  return n;
+}
+
+function poolFull(state) {
+  return state.pool !== null && state.poolLimit > 0 && poolActive(state.pool) >= state.poolLimit;
+}
+
+// Bulk runs are held to their own cap; the catalog cap is for lookups.
+function canStart(entry) {
+  if (active >= MAX_ACTIVE) return false;
+  if (entry.priority === BULK) return classes[BULK].active < BULK_MAX_ACTIVE;
+  return entry.state.active < entry.state.limit && !poolFull(entry.state);
+}
+
+function start(entry) {
+  const { catalog, state, priority, res } = entry;
+  const counted = priority === BULK ? classes[BULK] : state;
+  active += 1;
+  counted.active += 1;
+  state.admitted += 1;
+  classes[priority].admitted += 1;
+  if (priority === BULK) interactiveSinceBulk = 0;
+  else interactiveSinceBulk += 1;
+  const queuedMs = Date.now() - entry.enqueuedAt;
+  metrics.observe("admission.queue_ms", { catalog, class: priority }, queuedMs);
+  res.set("X-Queue-Time-Ms", String(queuedMs));
+
+  const startedAt = Date.now();
+  let released = false;
+  // "close" fires both after the response is sent and when the client
+  // goes away, so the slot is always handed back exactly once.
+  res.on("close", () => {
+    if (released) return;
+    released = true;
+    active -= 1;
+    counted.active -= 1;
+    // Smoothed run time, used for Retry-After estimates
+    counted.runMs = counted.runMs * 0.8 + (Date.now() - startedAt) * 0.2;
+    pump();
+  });
+  entry.next();
+}
+
+// Oldest startable entry of one class (FIFO per catalog is kept because
+// entries of a catalog share its cap).
+function firstStartable(priority) {
+  return queues[priority].find(canStart);
+}
+
+// Starts queued requests while slots and memory allow: interactive first,
+// unless bulk is owed its share. Low memory only holds the queue while
+// something is running that will free it up again.
+function pump() {
+  for (;;) {
+    const interactive = firstStartable(INTERACTIVE);
+    const bulk = firstStartable(BULK);
+    if (!interactive && !bulk) return;
+    if (active > 0 && freeMemoryMb() < MIN_FREE_MB) return;
+    const entry =
+      bulk && (!interactive || interactiveSinceBulk >= BULK_EVERY)
+        ? bulk
+        : interactive;
+    dequeue(entry);
+    start(entry);
+  }
+}
+
+function dequeue(entry) {
+  const queue = queues[entry.priority];
+  const i = queue.indexOf(entry);
+  if (i >= 0) queue.splice(i, 1);
+  clearTimeout(entry.timer);
+}
+
+// Takes a slot of `catalog` for an extra run that must not wait (a hedge,
+// gateway/hedge.js): only while one is free, memory allows and no request is
+// queued, so it never delays an admitted request. Returns the function that
+// hands the slot back, or null.
+export function tryAcquire(catalog) {
+  const state = catalogState(catalog);
+  if (active >= MAX_ACTIVE || state.active >= state.limit || poolFull(state)) return null;
+  if (queuedCount() > 0 || freeMemoryMb() < MIN_FREE_MB) return null;
+  active += 1;
+  state.active += 1;
+  let released = false;
+  return () => {
+    if (released) return;
+    released = true;
+    active -= 1;
+    state.active -= 1;
+    pump();
+  };
+}
+
+// Express middleware guarding a scraper endpoint of `catalog`.
+export function admit(catalog, { priority = INTERACTIVE } = {}) {
+  return (req, res, next) => {
+    const state = catalogState(catalog);
+    const entry = { catalog, state, priority, res, next, enqueuedAt: Date.now() };
+
+    if (freeMemoryMb() < MIN_FREE_MB && active > 0) {
+      return reject(entry, "low_memory");
+    }
+    const waiting = queues[priority].some((e) =>
+      priority === BULK ? true : e.catalog === catalog
+    );
+    if (canStart(entry) && !waiting) {
+      return start(entry);
+    }
+    if (queuedCount() >= QUEUE_SIZE) {
+      // A lookup takes the place of the newest queued crawl
+      const victim = priority === INTERACTIVE && queues[BULK].at(-1);
+      if (!victim) return reject(entry, "queue_full");
+      dequeue(victim);
+      classes[BULK].preempted += 1;
+      reject(victim, "preempted");
+    }
+
+    queues[priority].push(entry);
+    metrics.observe("admission.queue_depth", { class: priority }, queues[priority].length, [
+      0, 1, 2, 5, 10, 20, 50,
+    ]);
+    entry.timer = setTimeout(() => {
+      dequeue(entry);
+      metrics.observe(
+        "admission.queue_ms",
+        { catalog, class: priority },
+        Date.now() - entry.enqueuedAt
+      );
+      reject(entry, "queue_timeout");
+    }, QUEUE_TIMEOUT_MS);
+    // Client gave up while waiting
+    res.on("close", () => {
+      if (queues[priority].includes(entry)) {
+        dequeue(entry);
+        metrics.inc("admission.abandoned", { catalog, class: priority });
+      }
+    });
+  };
+}
+
+export function stats() {
+  return {
+    active,
+    max_active: MAX_ACTIVE,
+    queued: queuedCount(),
+    queue_size: QUEUE_SIZE,
+    free_memory_mb: Math.round(freeMemoryMb()),
+    min_free_mb: MIN_FREE_MB,
+    classes: {
+      [INTERACTIVE]: { ...classes[INTERACTIVE], queued: queues[INTERACTIVE].length },
+      [BULK]: {
+        ...classes[BULK],
+        queued: queues[BULK].length,
+        max_active: BULK_MAX_ACTIVE,
+        min_share: BULK_MIN_SHARE,
+      },
+    },
+    catalogs: Object.fromEntries(
+      [...catalogs].map(([name, s]) => [
+        name,
+        {
+          limit: s.limit,
+          active: s.active,
+          queued: queues[INTERACTIVE].filter((e) => e.catalog === name).length,
+          admitted: s.admitted,
+          rejected: s.rejected,
+          avg_run_ms: Math.round(s.runMs),
+        },
+      ])
+    ),
+  };
+}
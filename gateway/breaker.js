@@ -0,0 +1,167 @@
+// Per-catalog circuit breakers. When a catalog is down or blocking us, every
+// request would otherwise start a browser and sit through minute-long
+// timeouts; instead the breaker opens on a high recent error or timeout
+// rate and answers 503 straight away. After BREAKER_OPEN_MS one probe
+// request is let through (half-open): success closes the breaker, failure
+// opens it again for twice as long (up to BREAKER_MAX_OPEN_MS).
+//
+//   BREAKER_WINDOW          outcomes considered per catalog
+//   BREAKER_WINDOW_MS       ...and only those younger than this
+//   BREAKER_MIN_REQUESTS    outcomes needed before the breaker may open
+//   BREAKER_FAILURE_RATE    open at this share of failures (any kind)
+//   BREAKER_TIMEOUT_RATE    open at this share of timeouts/blocks
+//   BREAKER_OPEN_MS         first open period
+//   BREAKER_MAX_OPEN_MS     longest open period
+
+import * as metrics from "./metrics.js";
+
+const WINDOW = Number(process.env.BREAKER_WINDOW || 20);
+const WINDOW_MS = Number(process.env.BREAKER_WINDOW_MS || 5 * 60 * 1000);
+const MIN_REQUESTS = Number(process.env.BREAKER_MIN_REQUESTS || 5);
+const FAILURE_RATE = Number(process.env.BREAKER_FAILURE_RATE || 0.5);
+const TIMEOUT_RATE = Number(process.env.BREAKER_TIMEOUT_RATE || 0.3);
+const OPEN_MS = Number(process.env.BREAKER_OPEN_MS || 60000);
+const MAX_OPEN_MS = Number(process.env.BREAKER_MAX_OPEN_MS || 10 * 60 * 1000);
+
+export const CLOSED = "closed";
+export const OPEN = "open";
+export const HALF_OPEN = "half_open";
+
+// Failure kinds counted towards BREAKER_TIMEOUT_RATE: the catalog is not
+// answering, as opposed to a script error on a page that did load.
+const SLOW_KINDS = new Set(["timeout", "blocked"]);
+
+const breakers = new Map();
+
+function breaker(catalog) {
+  let b = breakers.get(catalog);
+  if (!b) {
+    b = {
+      state: CLOSED,
+      outcomes: [],
+      openedAt: 0,
+      openMs: OPEN_MS,
+      probing: false,
+      lastFailure: null,
+      opened: 0,
+      fastFailed: 0,
+    };
+    breakers.set(catalog, b);
+  }
+  return b;
+}
+
+function transition(catalog, b, state) {
+  b.state = state;
+  metrics.inc("breaker.transition", { catalog, to: state });
+  console.log(`[BREAKER] ${catalog} -> ${state}`);
+}
+
+function open(catalog, b, openMs) {
+  b.openedAt = Date.now();
+  b.openMs = openMs;
+  b.opened += 1;
+  transition(catalog, b, OPEN);
+}
+
+function rates(b) {
+  const cutoff = Date.now() - WINDOW_MS;
+  b.outcomes = b.outcomes.filter((o) => o.at >= cutoff).slice(-WINDOW);
+  const n = b.outcomes.length;
+  const failures = b.outcomes.filter((o) => o.kind !== "ok");
+  return {
+    requests: n,
+    failure_rate: n ? failures.length / n : 0,
+    timeout_rate: n ? failures.filter((o) => SLOW_KINDS.has(o.kind)).length / n : 0,
+  };
+}
+
+// `kind` is "ok", or the failure kind ("error", "timeout", "blocked", ...).
+function record(catalog, b, kind, wasProbe) {
+  b.outcomes.push({ at: Date.now(), kind });
+  if (kind !== "ok") b.lastFailure = { kind, at: new Date().toISOString() };
+
+  if (wasProbe) {
+    b.probing = false;
+    if (kind === "ok") {
+      b.outcomes = [];
+      b.openMs = OPEN_MS;
+      transition(catalog, b, CLOSED);
+    } else {
+      open(catalog, b, Math.min(MAX_OPEN_MS, b.openMs * 2));
+    }
+    return;
+  }
+  if (b.state !== CLOSED) return;
+  const r = rates(b);
+  if (
+    r.requests >= MIN_REQUESTS &&
+    (r.failure_rate >= FAILURE_RATE || r.timeout_rate >= TIMEOUT_RATE)
+  ) {
+    open(catalog, b, OPEN_MS);
+  }
+}
+
+// Express middleware: fast-fails while `catalog` is open and records the
+// outcome of every request it lets through. Routes report why a 5xx
+// happened via `res.locals.failure`, as do streams whose run failed after
+// their 200 went out; 4xx answers (bad input, 429) and clients hanging up
+// are not held against the catalog.
+export function guard(catalog) {
+  return (req, res, next) => {
+    const b = breaker(catalog);
+    let probe = false;
+
+    if (b.state === OPEN && Date.now() - b.openedAt >= b.openMs) {
+      transition(catalog, b, HALF_OPEN);
+    }
+    if (b.state === HALF_OPEN && !b.probing) {
+      b.probing = true;
+      probe = true;
+    } else if (b.state !== CLOSED) {
+      b.fastFailed += 1;
+      metrics.inc("breaker.fast_fail", { catalog });
+      const retryAfter = Math.max(
+        1,
+        Math.ceil((b.openedAt + b.openMs - Date.now()) / 1000)
+      );
+      res.set("Retry-After", String(retryAfter));
+      return res.status(503).json({
+        error: "Catalog unavailable",
+        catalog,
+        breaker: b.state,
+        last_failure: b.lastFailure,
+        retry_after_s: retryAfter,
+      });
+    }
+
+    res.on("close", () => {
+      let kind = null;
+      // A stream reports a failed run after its 200 went out
+      if (res.writableFinished && res.locals.failure) kind = res.locals.failure;
+      else if (res.writableFinished && res.statusCode < 400) kind = "ok";
+      else if (res.writableFinished && res.statusCode >= 500) kind = "error";
+      if (kind) record(catalog, b, kind, probe);
+      else if (probe) b.probing = false; // probe told us nothing, allow another
+    });
+    next();
+  };
+}
+
+export function stats() {
+  return Object.fromEntries(
+    [...breakers].map(([catalog, b]) => [
+      catalog,
+      {
+        state: b.state,
+        ...rates(b),
+        opened: b.opened,
+        fast_failed: b.fastFailed,
+        open_ms: b.openMs,
+        reopens_at:
+          b.state === OPEN ? new Date(b.openedAt + b.openMs).toISOString() : null,
+        last_failure: b.lastFailure,
+      },
+    ])
+  );
+}
@@ -0,0 +1,55 @@
+// Result cache for find-part answers, keyed by catalog, VIN and canonical
+// part (gateway/keywords.js), so spelling variants of a request share one
+// entry. Entries expire after RESULT_CACHE_TTL_S; past RESULT_CACHE_MAX
+// entries the least recently used one is dropped. Empty answers (null, no
+// part numbers) are not cached: a run that found nothing is retried.
+//
+//   RESULT_CACHE_TTL_S    seconds an answer is served from the cache (0 disables)
+//   RESULT_CACHE_MAX      entries kept
+
+import * as metrics from "./metrics.js";
+
+const TTL_MS = Number(process.env.RESULT_CACHE_TTL_S ?? 6 * 3600) * 1000;
+const MAX = Number(process.env.RESULT_CACHE_MAX || 5000);
+
+// Map iteration order is insertion order: re-inserting on a hit keeps the
+// least recently used entry first
+const entries = new Map();
+
+export function cacheKey(catalog, vin, part) {
+  return `${catalog}|${String(vin).trim().toUpperCase()}|${part}`;
+}
+
+export function get(key) {
+  if (TTL_MS <= 0) return undefined;
+  const entry = entries.get(key);
+  const catalog = key.split("|", 1)[0];
+  if (!entry || entry.expires <= Date.now()) {
+    if (entry) entries.delete(key);
+    metrics.inc("result_cache.lookups", { catalog, result: "miss" });
+    return undefined;
+  }
+  entries.delete(key);
+  entries.set(key, entry);
+  metrics.inc("result_cache.lookups", { catalog, result: "hit" });
+  return entry.value;
+}
+
+function empty(value) {
+  if (value === null || value === undefined || value === "") return true;
+  if (Array.isArray(value)) return value.length === 0;
+  return typeof value === "object" && Object.keys(value).length === 0;
+}
+
+export function set(key, value) {
+  if (TTL_MS <= 0 || empty(value)) return;
+  entries.delete(key);
+  entries.set(key, { value, expires: Date.now() + TTL_MS });
+  while (entries.size > MAX) {
+    entries.delete(entries.keys().next().value);
+  }
+}
+
+export function stats() {
+  return { entries: entries.size, max: MAX, ttl_s: TTL_MS / 1000 };
+}
@@ -0,0 +1,193 @@
+// Hedged scraper runs for latency-sensitive lookups. When a run has not
+// finished by a percentile of that script's recent latency, a second run is
+// started (a fresh process, so a fresh browser context); the first one to
+// succeed answers and the other is killed. Hedges are paid for out of a
+// budget that grows with every primary run, so they add at most
+// HEDGE_BUDGET extra runs per request on average, and each one needs a free
+// admission slot of its catalog (gateway/admission.js); without one the
+// hedge is skipped.
+//
+//   HEDGE                 "1" to enable (off by default)
+//   HEDGE_PERCENTILE      latency percentile that triggers a hedge (0.95)
+//   HEDGE_MIN_SAMPLES     successful runs needed before hedging a script
+//   HEDGE_MIN_DELAY_MS    never hedge earlier than this
+//   HEDGE_BUDGET          hedges allowed per primary run (0.1)
+
+import * as metrics from "./metrics.js";
+import { tryAcquire } from "./admission.js";
+import { startPython } from "./python.js";
+
+const ENABLED = ["1", "true", "yes"].includes(
+  (process.env.HEDGE || "0").toLowerCase()
+);
+const PERCENTILE = Number(process.env.HEDGE_PERCENTILE || 0.95);
+const MIN_SAMPLES = Number(process.env.HEDGE_MIN_SAMPLES || 20);
+const MIN_DELAY_MS = Number(process.env.HEDGE_MIN_DELAY_MS || 5000);
+const BUDGET = Number(process.env.HEDGE_BUDGET || 0.1);
+// Budget can be saved up for a burst of slow runs, but not without bound
+const MAX_BUDGET = 5;
+const HISTORY = 200;
+
+const scripts = new Map();
+let budget = 1;
+
+function scriptState(script) {
+  let state = scripts.get(script);
+  if (!state) {
+    state = { latencies: [], runs: 0, hedged: 0, wins: { primary: 0, hedge: 0 } };
+    scripts.set(script, state);
+  }
+  return state;
+}
+
+function percentile(values, p) {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))];
+}
+
+// Delay after which a run of `script` gets hedged, or null if it should not.
+function hedgeDelay(state) {
+  if (!ENABLED || state.latencies.length < MIN_SAMPLES) return null;
+  return Math.max(MIN_DELAY_MS, percentile(state.latencies, PERCENTILE));
+}
+
+// Collects one run; resolves with { code, stdout, stderr, ms, attempt }.
+function attempt(script, args, name, jobs) {
+  const job = startPython(script, args);
+  jobs.push(job);
+  const startedAt = Date.now();
+  let stdout = "";
+  let stderr = "";
+  job.on("stdout", (d) => (stdout += d));
+  job.on("stderr", (d) => (stderr += d));
+  return new Promise((resolve) =>
+    job.on("close", (code) =>
+      resolve({
+        code,
+        stdout,
+        stderr,
+        ms: Date.now() - startedAt,
+        attempt: name,
+        throttleMs: job.throttleMs,
+        failure: job.failure,
+        job,
+      })
+    )
+  );
+}
+
+function succeeded(result) {
+  if (result.code !== 0) return false;
+  try {
+    JSON.parse(result.stdout.trim());
+    return true;
+  } catch {
+    return false;
+  }
+}
+
+// Runs `script` of `catalog` with hedging; the primary run holds the
+// request's admission slot. Returns { result, cancel } where `result`
+// resolves like runPython() plus `attempt` ("primary" or "hedge").
+export function runHedged(catalog, script, args = []) {
+  const state = scriptState(script);
+  const jobs = [];
+  let timer = null;
+  let cancelled = false;
+  state.runs += 1;
+  budget = Math.min(MAX_BUDGET, budget + BUDGET);
+
+  const result = new Promise((resolve) => {
+    const delay = hedgeDelay(state);
+    let hedgePending = delay !== null;
+    let running = 0;
+    let settled = false;
+    let hedged = false;
+
+    const settle = (r) => {
+      settled = true;
+      clearTimeout(timer);
+      resolve(r);
+    };
+
+    const onResult = (r) => {
+      running -= 1;
+      if (settled) return;
+      if (succeeded(r)) {
+        state.latencies.push(r.ms);
+        if (state.latencies.length > HISTORY) state.latencies.shift();
+        if (hedged) {
+          state.wins[r.attempt] += 1;
+          metrics.inc("hedge.won", { script, attempt: r.attempt });
+        }
+        for (const job of jobs) if (job !== r.job) job.kill();
+        return settle(r);
+      }
+      // A failure only answers once nothing else can still succeed; a
+      // primary failing before the hedge point is not retried.
+      hedgePending = false;
+      if (running === 0) settle(r);
+    };
+
+    const run = (name, release = () => {}) => {
+      running += 1;
+      attempt(script, args, name, jobs).then((r) => {
+        release();
+        onResult(r);
+      });
+    };
+
+    run("primary");
+    if (hedgePending) {
+      timer = setTimeout(() => {
+        if (settled || cancelled || !hedgePending) return;
+        hedgePending = false;
+        if (budget < 1) {
+          metrics.inc("hedge.skipped", { script, reason: "budget" });
+          return;
+        }
+        const release = tryAcquire(catalog);
+        if (!release) {
+          metrics.inc("hedge.skipped", { script, reason: "admission" });
+          return;
+        }
+        budget -= 1;
+        hedged = true;
+        state.hedged += 1;
+        metrics.inc("hedge.started", { script });
+        run("hedge", release);
+      }, delay);
+    }
+  });
+
+  const cancel = () => {
+    cancelled = true;
+    clearTimeout(timer);
+    for (const job of jobs) job.kill();
+  };
+  return { result, cancel };
+}
+
+export function stats() {
+  return {
+    enabled: ENABLED,
+    percentile: PERCENTILE,
+    budget: Math.round(budget * 100) / 100,
+    scripts: Object.fromEntries(
+      [...scripts].map(([script, s]) => {
+        const decided = s.wins.primary + s.wins.hedge;
+        return [
+          script,
+          {
+            runs: s.runs,
+            hedged: s.hedged,
+            hedge_rate: s.runs ? s.hedged / s.runs : 0,
+            wins: s.wins,
+            hedge_win_rate: decided ? s.wins.hedge / decided : 0,
+            hedge_after_ms: hedgeDelay(s),
+          },
+        ];
+      })
+    ),
+  };
+}
@@ -0,0 +1,56 @@
+// Canonical part keywords of every catalog (scraper_common/keywords.json,
+// shared with the Python side). Lookups are a single Map get on the
+// normalized text, so a find-part request is resolved to its script and
+// canonical part, or rejected, before any process is started.
+
+import fs from "fs";
+import path from "path";
+import { fileURLToPath } from "url";
+
+const FILE = path.join(
+  path.dirname(fileURLToPath(import.meta.url)),
+  "..",
+  "scraper_common",
+  "keywords.json"
+);
+
+// Same rules as scraper_common/keywords.py normalize()
+export function normalize(text) {
+  return String(text || "")
+    .toLowerCase()
+    .replace(/[-_]+/g, " ")
+    .replace(/\s+/g, " ")
+    .trim();
+}
+
+const lookup = new Map();
+const canonical = new Map();
+
+for (const [catalog, spec] of Object.entries(
+  JSON.parse(fs.readFileSync(FILE, "utf8"))
+)) {
+  const byText = new Map();
+  for (const [name, entry] of Object.entries(spec.parts)) {
+    const { script, aliases = [], ...plan } = entry;
+    const resolved = Object.freeze({
+      catalog,
+      part: name,
+      script: `${spec.dir}/${script}`,
+      plan,
+    });
+    for (const text of [name, ...aliases]) byText.set(normalize(text), resolved);
+  }
+  lookup.set(catalog, byText);
+  canonical.set(catalog, Object.keys(spec.parts));
+}
+
+// { catalog, part, script, plan } for the part `text` names, or null.
+export function resolve(catalog, text) {
+  const byText = lookup.get(catalog);
+  return (byText && byText.get(normalize(text))) || null;
+}
+
+// Canonical part names of a catalog, for "Unsupported Keyword" answers.
+export function supported(catalog) {
+  return canonical.get(catalog) || [];
+}
@@ -0,0 +1,74 @@
+// In-process metrics registry exposed as JSON on GET /metrics.
+// Counters are plain sums; summaries keep count/sum/min/max plus cumulative
+// buckets so latency distributions can be read without an external agent.
+
+const DEFAULT_BUCKETS_MS = [
+  5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000,
+  300000,
+];
+
+const counters = new Map();
+const summaries = new Map();
+
+function key(name, labels) {
+  const parts = Object.keys(labels || {})
+    .sort()
+    .map((k) => `${k}=${labels[k]}`);
+  return parts.length ? `${name}{${parts.join(",")}}` : name;
+}
+
+export function inc(name, labels = {}, value = 1) {
+  const k = key(name, labels);
+  const entry = counters.get(k) || { name, labels, value: 0 };
+  entry.value += value;
+  counters.set(k, entry);
+}
+
+export function observe(name, labels = {}, value, buckets = DEFAULT_BUCKETS_MS) {
+  const k = key(name, labels);
+  let entry = summaries.get(k);
+  if (!entry) {
+    entry = {
+      name,
+      labels,
+      count: 0,
+      sum: 0,
+      min: Infinity,
+      max: -Infinity,
+      buckets: buckets.map((le) => ({ le, count: 0 })),
+    };
+    summaries.set(k, entry);
+  }
+  entry.count += 1;
+  entry.sum += value;
+  entry.min = Math.min(entry.min, value);
+  entry.max = Math.max(entry.max, value);
+  for (const b of entry.buckets) {
+    if (value <= b.le) b.count += 1;
+  }
+}
+
+export function snapshot() {
+  return {
+    counters: [...counters.values()],
+    summaries: [...summaries.values()].map((s) => ({
+      ...s,
+      avg: s.count ? s.sum / s.count : 0,
+    })),
+  };
+}
+
+// Lines a Python scraper writes to stderr via scraper_common.metrics.emit()
+export const METRIC_PREFIX = "@@metric ";
+
+// Returns the parsed sample (or null) so callers can also act on it.
+export function recordPythonMetric(line, extraLabels = {}) {
+  try {
+    const m = JSON.parse(line.slice(METRIC_PREFIX.length));
+    observe(m.name, { ...(m.labels || {}), ...extraLabels }, Number(m.value));
+    return m;
+  } catch {
+    // malformed metric line, ignore
+    return null;
+  }
+}
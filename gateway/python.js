@@ -0,0 +1,276 @@
+// Runs the Python scraper scripts, either by forking them from the
+// pre-imported runtime (scraper_common/forkserver.py) or, when that is not
+// available, by spawning a fresh python3 process as before.
+
+import { spawn } from "child_process";
+import { EventEmitter } from "events";
+import net from "net";
+import path from "path";
+import { fileURLToPath } from "url";
+import * as metrics from "./metrics.js";
+
+const ROOT = path.resolve(path.dirname(fileURLToPath(import.meta.url)), "..");
+const SOCKET_PATH =
+  process.env.PY_FORKSERVER_SOCKET || "/tmp/scraper-forkserver.sock";
+const FORKSERVER_ENABLED = !["0", "false", "no"].includes(
+  (process.env.PY_FORKSERVER || "1").toLowerCase()
+);
+
+// Typed failures a script writes to stderr, e.g. a blocked page
+const ERROR_PREFIX = "@@error ";
+
+const MEMORY_BUCKETS_MB = [64, 128, 256, 512, 768, 1024, 1280, 1536, 1792, 2048];
+
+let forkserver = null;
+let forkserverReady = false;
+let stopping = false;
+
+function pythonEnv() {
+  return {
+    ...process.env,
+    PYTHONPATH: [ROOT, process.env.PYTHONPATH].filter(Boolean).join(path.delimiter),
+  };
+}
+
+// Emits "stdout" / "stderr" (strings) and "close" (exit code), like the
+// ChildProcess pieces the endpoints used to listen on.
+class PythonJob extends EventEmitter {
+  constructor(script) {
+    super();
+    this.script = script;
+    this.label = path.basename(script, ".py");
+    this.startedAt = Date.now();
+    this.closed = false;
+    this._stderrTail = "";
+    this._kill = () => {};
+    // Time the script spent waiting on the per-site rate limiter
+    this.throttleMs = 0;
+    // Typed failure reported by the script (scraper_common/pagecheck.py)
+    this.failure = null;
+  }
+
+  _stdout(chunk) {
+    this.emit("stdout", chunk);
+  }
+
+  // Metric lines are consumed here; everything else is passed through.
+  _stderr(chunk) {
+    const text = this._stderrTail + chunk;
+    const lines = text.split("\n");
+    this._stderrTail = lines.pop();
+    const passthrough = [];
+    for (const line of lines) {
+      if (line.startsWith(ERROR_PREFIX)) {
+        try {
+          this.failure = JSON.parse(line.slice(ERROR_PREFIX.length));
+        } catch {
+          // malformed error line, ignore
+        }
+      } else if (line.startsWith(metrics.METRIC_PREFIX)) {
+        const m = metrics.recordPythonMetric(line, { script: this.label });
+        if (m && m.name === "ratelimit.wait_ms") this.throttleMs += Number(m.value) || 0;
+      } else {
+        passthrough.push(line + "\n");
+      }
+    }
+    if (passthrough.length) this.emit("stderr", passthrough.join(""));
+  }
+
+  _close(code, via) {
+    if (this.closed) return;
+    this.closed = true;
+    if (this._stderrTail) {
+      this.emit("stderr", this._stderrTail);
+      this._stderrTail = "";
+    }
+    metrics.observe(
+      "python.run_ms",
+      { script: this.label, via, code: String(code) },
+      Date.now() - this.startedAt
+    );
+    this.emit("close", code);
+  }
+
+  kill() {
+    this._kill();
+  }
+}
+
+function runSpawned(job, scriptPath, args, env) {
+  const child = spawn("python3", [scriptPath, ...args], {
+    env: { ...pythonEnv(), ...env },
+  });
+  child.stdout.setEncoding("utf8");
+  child.stderr.setEncoding("utf8");
+  child.stdout.on("data", (d) => job._stdout(d));
+  child.stderr.on("data", (d) => job._stderr(d));
+  child.on("error", (err) => {
+    job._stderr(`${err.message}\n`);
+    job._close(1, "spawn");
+  });
+  child.on("close", (code) => job._close(code ?? 1, "spawn"));
+  job._kill = () => child.kill("SIGKILL");
+}
+
+function runForked(job, scriptPath, args, env) {
+  let started = false;
+  let buffer = "";
+  const sock = net.createConnection(SOCKET_PATH);
+  sock.setEncoding("utf8");
+
+  sock.on("connect", () => {
+    started = true;
+    sock.write(JSON.stringify({ op: "run", script: scriptPath, args, env }) + "\n");
+  });
+
+  sock.on("data", (data) => {
+    buffer += data;
+    let nl;
+    while ((nl = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, nl);
+      buffer = buffer.slice(nl + 1);
+      let frame;
+      try {
+        frame = JSON.parse(line);
+      } catch {
+        continue;
+      }
+      if (frame.t === "out") job._stdout(frame.d);
+      else if (frame.t === "err") job._stderr(frame.d);
+      else if (frame.t === "exit") {
+        recordExitSample(job, frame);
+        job._close(frame.code, "fork");
+        sock.end();
+      }
+    }
+  });
+
+  sock.on("error", (err) => {
+    if (!started) {
+      // Fork server not reachable: run this job the old way
+      forkserverReady = false;
+      runSpawned(job, scriptPath, args, env);
+      return;
+    }
+    job._stderr(`${err.message}\n`);
+  });
+
+  sock.on("close", () => {
+    if (started) job._close(1, "fork");
+  });
+
+  job._kill = () => sock.destroy();
+}
+
+// Per-request memory samples the fork server attaches to the exit frame.
+function recordExitSample(job, frame) {
+  const labels = { script: job.label };
+  if (frame.maxrss_kb) {
+    metrics.observe("python.maxrss_mb", labels, frame.maxrss_kb / 1024, MEMORY_BUCKETS_MB);
+  }
+  if (frame.browser_id !== undefined) {
+    metrics.observe(
+      "browser.rss_mb",
+      { browser: String(frame.browser_id) },
+      frame.browser_rss_kb / 1024,
+      MEMORY_BUCKETS_MB
+    );
+    metrics.observe(
+      "request.total_rss_mb",
+      labels,
+      (frame.browser_rss_kb + (frame.maxrss_kb || 0)) / 1024,
+      MEMORY_BUCKETS_MB
+    );
+    if (frame.recycle) metrics.inc("browser.recycled", { reason: frame.recycle });
+  }
+}
+
+// `env` adds variables for this run only (e.g. SCRAPER_STREAM).
+export function startPython(script, args = [], { env = {} } = {}) {
+  const scriptPath = path.join(ROOT, script);
+  const job = new PythonJob(scriptPath);
+  const cleanArgs = args.map(String);
+  if (FORKSERVER_ENABLED && forkserverReady) {
+    runForked(job, scriptPath, cleanArgs, env);
+  } else {
+    runSpawned(job, scriptPath, cleanArgs, env);
+  }
+  return job;
+}
+
+// Collects the whole output of a script.
+export function runPython(script, args = []) {
+  return new Promise((resolve) => {
+    const job = startPython(script, args);
+    let stdout = "";
+    let stderr = "";
+    job.on("stdout", (d) => (stdout += d));
+    job.on("stderr", (d) => (stderr += d));
+    job.on("close", (code) =>
+      resolve({ code, stdout, stderr, failure: job.failure })
+    );
+  });
+}
+
+export function startForkserver() {
+  if (!FORKSERVER_ENABLED || stopping) return;
+  forkserver = spawn(
+    "python3",
+    ["-m", "scraper_common.forkserver", "--socket", SOCKET_PATH],
+    { env: pythonEnv(), cwd: ROOT }
+  );
+  forkserver.stdout.setEncoding("utf8");
+  forkserver.stdout.once("data", (line) => {
+    try {
+      const info = JSON.parse(line.trim().split("\n")[0]);
+      forkserverReady = Boolean(info.ready);
+      console.log(
+        `[FORKSERVER] ready on ${info.socket}, preload ms ${JSON.stringify(info.preload_ms)}`
+      );
+    } catch {
+      console.error(`[FORKSERVER] unexpected output: ${line}`);
+    }
+  });
+  forkserver.stderr.on("data", (d) => process.stderr.write(`[FORKSERVER] ${d}`));
+  forkserver.on("exit", (code) => {
+    forkserverReady = false;
+    forkserver = null;
+    if (stopping) return;
+    console.error(`[FORKSERVER] exited with ${code}, restarting`);
+    setTimeout(startForkserver, 2000);
+  });
+}
+
+export function stopForkserver() {
+  stopping = true;
+  if (forkserver) forkserver.kill("SIGTERM");
+}
+
+export function forkserverStatus() {
+  return { enabled: FORKSERVER_ENABLED, ready: forkserverReady };
+}
+
+// Live stats (pool browsers, recycle counts, recent RSS samples) from the
+// fork server; resolves to null when it is not running.
+export function forkserverStats(timeoutMs = 2000) {
+  if (!forkserverReady) return Promise.resolve(null);
+  return new Promise((resolve) => {
+    let buffer = "";
+    const sock = net.createConnection(SOCKET_PATH);
+    sock.setEncoding("utf8");
+    sock.setTimeout(timeoutMs, () => {
+      sock.destroy();
+      resolve(null);
+    });
+    sock.on("connect", () => sock.write('{"op": "stats"}\n'));
+    sock.on("data", (d) => (buffer += d));
+    sock.on("error", () => resolve(null));
+    sock.on("close", () => {
+      try {
+        resolve(JSON.parse(buffer.split("\n")[0]));
+      } catch {
+        resolve(null);
+      }
+    });
+  });
+}
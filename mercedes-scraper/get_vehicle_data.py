@@ -1,6 +1,8 @@
 import sys
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
+from scraper_common.browser import launch_chromium
+from scraper_common.pagecheck import goto
 import re
 import json
 import os
@@ -57,13 +59,13 @@ def main():
     vin = sys.argv[1]
 
     with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(headless=True,timeout=30000)
+        browser = launch_chromium(p, headless=True,timeout=30000)
         context = browser.new_context()
         context.set_default_timeout(60000)
         context.set_default_navigation_timeout(60000)
         page = context.new_page()
         # page.route("**/*", block_ads) might need this if website keeps showing popups
-        page.goto("https://mb-teilekatalog.info/?lang=E") #this will probably load in german so we need to change the language from the website header
+        goto(page, "https://mb-teilekatalog.info/?lang=E") #this will probably load in german so we need to change the language from the website header
         page.wait_for_load_state("domcontentloaded")
         page.locator("a[title='English']").click() #change to english
         page.wait_for_load_state("domcontentloaded")
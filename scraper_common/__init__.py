@@ -0,0 +1,5 @@
+"""Helpers shared by every catalog scraper (runtime, browser launch, metrics).
+
+The scraper scripts are spawned by ``server.js`` with the repository root on
+``PYTHONPATH`` so that ``import scraper_common`` works from any catalog folder.
+"""
@@ -0,0 +1,223 @@
+"""Account pools for catalogs that need a login (superetka, ssg).
+
+Each scraper process leases one account for its run. Leases live in
+``accounts.sqlite`` (see ``state``) so every process on the instance sees
+them, and an account never has more than ``ACCOUNT_MAX_SESSIONS`` runs at
+once; a run that finds every account busy waits for one up to
+``ACCOUNT_LEASE_TIMEOUT_S`` seconds. Leases of processes that died are
+cleared on the next lease.
+
+Accounts come from ``<SERVICE>_ACCOUNTS="user:pass,user2:pass2"``, or the
+single ``<SERVICE>_USER`` / ``<SERVICE>_PASS`` pair (ssg falls back to the
+ETKA accounts, the ones it has always used). Leases and failure counts
+belong to the credentials, not to the service using them, so ssg and etka
+runs on the same ETKA account share its session limit. The browser session
+of each account (cookies, local storage) is kept per service as a
+Playwright storage state file, so the next run on that account starts
+logged in.
+
+Failures (a login that did not take, a block page) are counted per account;
+after ``ACCOUNT_MAX_FAILURES`` in a row the account rests for
+``ACCOUNT_COOLDOWN_S`` seconds and its stored session is dropped. A clean
+run resets the count.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scraper_common import metrics, state
+
+MAX_SESSIONS = int(os.getenv("ACCOUNT_MAX_SESSIONS", "1"))
+LEASE_TIMEOUT_S = float(os.getenv("ACCOUNT_LEASE_TIMEOUT_S", "120"))
+MAX_FAILURES = int(os.getenv("ACCOUNT_MAX_FAILURES", "3"))
+COOLDOWN_S = float(os.getenv("ACCOUNT_COOLDOWN_S", "900"))
+
+# Credentials tried when a service has no accounts of its own
+FALLBACK = {"ssg": "etka"}
+
+_POLL_S = 0.5
+_DB_FILE = "accounts.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    service TEXT NOT NULL,
+    user TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS health (
+    service TEXT NOT NULL,
+    user TEXT NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    resting_until REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (service, user)
+);
+"""
+
+
+class NoAccount(RuntimeError):
+    """No account configured for a service, or none free in time."""
+
+
+def _own_credentials(service: str) -> List[Tuple[str, str]]:
+    prefix = service.upper()
+    pairs = []
+    for item in os.getenv(f"{prefix}_ACCOUNTS", "").split(","):
+        user, _, password = item.strip().partition(":")
+        if user:
+            pairs.append((user, password))
+    if not pairs and os.getenv(f"{prefix}_USER"):
+        pairs.append((os.getenv(f"{prefix}_USER"), os.getenv(f"{prefix}_PASS") or ""))
+    return pairs
+
+
+def credential_owner(service: str) -> str:
+    """The service whose accounts ``service`` runs on: its own, else its fallback's."""
+    if not _own_credentials(service) and service in FALLBACK:
+        return credential_owner(FALLBACK[service])
+    return service
+
+
+def credentials(service: str) -> List[Tuple[str, str]]:
+    """(user, password) pairs of ``service`` from the environment."""
+    return _own_credentials(credential_owner(service))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Account:
+    """One leased account: its credentials and stored browser session."""
+
+    def __init__(self, service: str, user: str, password: str):
+        self.service = service
+        self.user = user
+        self.password = password
+        self.storage_path = state.state_path(os.path.join("sessions", f"{service}-{user}.json"))
+        self.error: Optional[str] = None
+
+    def context_options(self) -> Dict:
+        """``browser.new_context`` options that restore the stored session."""
+        return {"storage_state": self.storage_path} if os.path.exists(self.storage_path) else {}
+
+    def save(self, context):
+        """Store the context's session for the account's next run."""
+        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
+        context.storage_state(path=self.storage_path)
+
+    def failed(self, reason: str):
+        """Count this run as a failure of the account."""
+        self.error = reason
+
+
+class Pool:
+    def __init__(self, service: str):
+        self.service = service
+        # Leases and health are kept under the credentials' service
+        self.owner = credential_owner(service)
+        self.accounts = credentials(service)
+        self.conn = state.connect(_DB_FILE)
+        self.conn.executescript(_SCHEMA)
+
+    def _try_lease(self) -> Optional[Tuple[str, str]]:
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for user, pid in self.conn.execute(
+                "SELECT user, pid FROM leases WHERE service = ?", (self.owner,)
+            ).fetchall():
+                if not _alive(pid):
+                    self.conn.execute(
+                        "DELETE FROM leases WHERE service = ? AND user = ? AND pid = ?", (self.owner, user, pid)
+                    )
+            busy = dict(self.conn.execute(
+                "SELECT user, COUNT(*) FROM leases WHERE service = ? GROUP BY user", (self.owner,)
+            ).fetchall())
+            health = {
+                user: (failures, resting_until)
+                for user, failures, resting_until in self.conn.execute(
+                    "SELECT user, failures, resting_until FROM health WHERE service = ?", (self.owner,)
+                ).fetchall()
+            }
+            # Least busy first, then the one with fewer recent failures
+            free = sorted(
+                (busy.get(user, 0), health.get(user, (0, 0))[0], i)
+                for i, (user, _) in enumerate(self.accounts)
+                if busy.get(user, 0) < MAX_SESSIONS and health.get(user, (0, 0))[1] <= now
+            )
+            picked = self.accounts[free[0][2]] if free else None
+            if picked:
+                self.conn.execute(
+                    "INSERT INTO leases (service, user, pid, started) VALUES (?, ?, ?, ?)",
+                    (self.owner, picked[0], os.getpid(), now),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return picked
+
+    def _release(self, account: Account):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "DELETE FROM leases WHERE rowid IN (SELECT rowid FROM leases"
+                " WHERE service = ? AND user = ? AND pid = ? LIMIT 1)",
+                (self.owner, account.user, os.getpid()),
+            )
+            if account.error is None:
+                self.conn.execute(
+                    "UPDATE health SET failures = 0 WHERE service = ? AND user = ?", (self.owner, account.user)
+                )
+            else:
+                row = self.conn.execute(
+                    "SELECT failures FROM health WHERE service = ? AND user = ?", (self.owner, account.user)
+                ).fetchone()
+                failures = (row[0] if row else 0) + 1
+                resting_until = time.time() + COOLDOWN_S if failures >= MAX_FAILURES else 0
+                self.conn.execute(
+                    "INSERT INTO health (service, user, failures, last_error, resting_until) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(service, user) DO UPDATE SET failures = excluded.failures, "
+                    "last_error = excluded.last_error, resting_until = excluded.resting_until",
+                    (self.owner, account.user, 0 if resting_until else failures, account.error, resting_until),
+                )
+                if resting_until and os.path.exists(account.storage_path):
+                    os.remove(account.storage_path)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def lease(self) -> Iterator[Account]:
+        if not self.accounts:
+            raise NoAccount(f"no {self.service} account configured")
+        started = time.monotonic()
+        picked = self._try_lease()
+        while picked is None:
+            if time.monotonic() - started > LEASE_TIMEOUT_S:
+                raise NoAccount(f"no {self.service} account free after {LEASE_TIMEOUT_S:.0f}s")
+            time.sleep(_POLL_S)
+            picked = self._try_lease()
+        metrics.emit("accounts.lease_wait_ms", (time.monotonic() - started) * 1000.0, service=self.service)
+
+        account = Account(self.service, *picked)
+        try:
+            yield account
+        finally:
+            if account.error is not None:
+                metrics.emit("accounts.failure", 1, service=self.service, user=account.user)
+            self._release(account)
+
+
+def lease(service: str):
+    """``with accounts.lease("etka") as account:`` -- one account of ``service`` for the run."""
+    return Pool(service).lease()
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import logging
+from typing import Optional
+
+from scraper_common import metrics, ratelimit
+from scraper_common.forkserver import request_lease
+from scraper_common.runtime import since_start_ms
+
+
+def script_name() -> str:
+    return os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+
+
+def _probe_first_navigation(target, script: str):
+    """Emit interpreter-to-first-navigation once, on the first document request."""
+    state = {"done": False}
+
+    def on_request(request):
+        if state["done"] or request.resource_type != "document":
+            return
+        state["done"] = True
+        metrics.emit("startup.first_navigation_ms", since_start_ms(), script=script)
+
+    try:
+        target.on("request", on_request)
+    except Exception:
+        pass
+
+
+def instrument_browser(browser):
+    """Report startup timings for ``browser`` and return it unchanged.
+
+    ``new_context``/``new_page`` are wrapped so the first document request of
+    the run is reported as ``startup.first_navigation_ms`` and catalog
+    requests go through the shared per-site rate limiter.
+    """
+    script = script_name()
+    metrics.emit("startup.browser_ready_ms", since_start_ms(), script=script)
+
+    new_context, new_page = browser.new_context, browser.new_page
+
+    def probed_new_context(*args, **kwargs):
+        context = new_context(*args, **kwargs)
+        _probe_first_navigation(context, script)
+        ratelimit.install(context)
+        return context
+
+    def probed_new_page(*args, **kwargs):
+        page = new_page(*args, **kwargs)
+        _probe_first_navigation(page, script)
+        ratelimit.install(page)
+        return page
+
+    browser.new_context = probed_new_context
+    browser.new_page = probed_new_page
+    return browser
+
+
+def _pooled_endpoint() -> Optional[str]:
+    """CDP endpoint of a pooled Chromium: ``SCRAPER_CDP_ENDPOINT``, else one leased from the fork server."""
+    endpoint = os.getenv("SCRAPER_CDP_ENDPOINT")
+    socket_path = os.getenv("SCRAPER_FORKSERVER_SOCKET")
+    if endpoint or not socket_path:
+        return endpoint
+    try:
+        return request_lease(socket_path)
+    except (OSError, ValueError) as e:
+        logging.getLogger("scraper_common.browser").warning("could not lease a pooled browser: %s", e)
+        return None
+
+
+def launch_chromium(p, **launch_kwargs):
+    """``p.chromium.launch`` with startup metrics; returns the ``Browser``.
+
+    Under the fork server a headless run leases a pooled Chromium here and
+    connects to it instead of launching its own. ``browser.close()`` on a
+    connected browser only closes the contexts this run created, the pool
+    owns the process.
+    """
+    script = script_name()
+    t0 = time.perf_counter()
+    endpoint = _pooled_endpoint() if launch_kwargs.get("headless", True) else None
+    if endpoint:
+        try:
+            browser = p.chromium.connect_over_cdp(endpoint, timeout=launch_kwargs.get("timeout", 30000))
+            metrics.emit("startup.browser_connect_ms", (time.perf_counter() - t0) * 1000.0, script=script)
+            return instrument_browser(browser)
+        except Exception as e:
+            logging.getLogger("scraper_common.browser").warning(
+                "pooled browser unavailable (%s), launching a new one", e)
+            t0 = time.perf_counter()
+    browser = p.chromium.launch(**launch_kwargs)
+    metrics.emit("startup.browser_launch_ms", (time.perf_counter() - t0) * 1000.0, script=script)
+    return instrument_browser(browser)
@@ -0,0 +1,295 @@
+"""Long-lived headless Chromium processes owned by the fork server.
+
+A forked request that launches Chromium leases one pooled browser from the
+fork server (see ``forkserver.request_lease``) and opens its own context on
+it through ``connect_over_cdp``; the context goes away with the request. Browsers are
+recycled by ``RecyclePolicy`` so a worker keeps a steady footprint:
+
+    BROWSER_POOL_SIZE          browsers kept warm (0 disables the pool)
+    BROWSER_RECYCLE_REQUESTS   recycle after N leases
+    BROWSER_RECYCLE_MINUTES    recycle after M minutes
+    BROWSER_RECYCLE_RSS_MB     recycle when Chromium tree RSS + request RSS
+                               crosses this many MB
+
+A browser picked for recycling stops taking leases and is killed once its
+in-flight requests finish; a replacement is launched after that, so old and
+new never overlap in memory.
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import signal
+import tempfile
+import selectors
+import subprocess
+from typing import Dict, List, Optional
+
+from scraper_common.memory import tree_rss_kb
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+RECYCLE_AFTER_REQUESTS = int(os.getenv("BROWSER_RECYCLE_REQUESTS", "50"))
+RECYCLE_AFTER_MINUTES = float(os.getenv("BROWSER_RECYCLE_MINUTES", "30"))
+RECYCLE_RSS_MB = float(os.getenv("BROWSER_RECYCLE_RSS_MB", "1200"))
+# Recent per-request samples kept for GET /metrics
+SAMPLE_HISTORY = 200
+# Browsers dying this soon after launch count as launch failures; after
+# MAX_LAUNCH_FAILURES in a row the pool turns itself off (scripts then
+# launch their own Chromium as before).
+EARLY_EXIT_S = 10.0
+MAX_LAUNCH_FAILURES = 3
+
+CHROMIUM_ARGS = [
+    "--headless=new",
+    "--remote-debugging-port=0",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--mute-audio",
+    "--hide-scrollbars",
+    "--password-store=basic",
+    # same switches playwright_stealth adds when it launches Chromium itself
+    "--disable-blink-features=AutomationControlled",
+    "--accept-lang=en-US,en",
+]
+
+_DEVTOOLS_LINE = re.compile(rb"DevTools listening on (ws://\S+)")
+
+
+class RecyclePolicy:
+    def __init__(self, max_requests: int, max_age_s: float, max_rss_kb: int):
+        self.max_requests = max_requests
+        self.max_age_s = max_age_s
+        self.max_rss_kb = max_rss_kb
+
+    @classmethod
+    def from_env(cls) -> "RecyclePolicy":
+        return cls(
+            RECYCLE_AFTER_REQUESTS,
+            RECYCLE_AFTER_MINUTES * 60.0,
+            int(RECYCLE_RSS_MB * 1024),
+        )
+
+    def reason(self, browser: "PooledBrowser", request_rss_kb: int = 0) -> Optional[str]:
+        """Why ``browser`` should be recycled now, or None to keep it."""
+        if self.max_requests and browser.requests >= self.max_requests:
+            return "requests"
+        if self.max_age_s and browser.age_s() >= self.max_age_s:
+            return "age"
+        if self.max_rss_kb and browser.rss_kb + request_rss_kb >= self.max_rss_kb:
+            return "rss"
+        return None
+
+
+class PooledBrowser:
+    def __init__(self, browser_id: int, proc: subprocess.Popen, user_data_dir: str):
+        self.id = browser_id
+        self.proc = proc
+        self.user_data_dir = user_data_dir
+        self.endpoint: Optional[str] = None
+        self.started = time.monotonic()
+        self.requests = 0
+        self.active = 0
+        self.rss_kb = 0
+        self.draining: Optional[str] = None
+        self._banner = b""
+
+    def age_s(self) -> float:
+        return time.monotonic() - self.started
+
+    def ready(self) -> bool:
+        return self.endpoint is not None and self.draining is None and self.proc.poll() is None
+
+    def describe(self) -> Dict:
+        return {
+            "id": self.id,
+            "pid": self.proc.pid,
+            "ready": self.ready(),
+            "requests": self.requests,
+            "active": self.active,
+            "age_s": round(self.age_s(), 1),
+            "rss_kb": self.rss_kb,
+            "draining": self.draining,
+        }
+
+
+def find_chromium() -> Optional[str]:
+    """Path of the Chromium build Playwright uses (CHROMIUM_PATH overrides)."""
+    path = os.getenv("CHROMIUM_PATH")
+    if path:
+        return path
+    # Asked in a throwaway interpreter: starting Playwright in the fork
+    # server itself would leave a driver and event loop behind in every child.
+    code = (
+        "from playwright.sync_api import sync_playwright\n"
+        "with sync_playwright() as p: print(p.chromium.executable_path)"
+    )
+    try:
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    path = out.stdout.strip()
+    return path if out.returncode == 0 and os.path.exists(path) else None
+
+
+class BrowserPool:
+    def __init__(self, sel: selectors.BaseSelector, size: int = POOL_SIZE,
+                 policy: Optional[RecyclePolicy] = None):
+        self.sel = sel
+        self.size = size
+        self.policy = policy or RecyclePolicy.from_env()
+        self.executable: Optional[str] = None
+        self.browsers: List[PooledBrowser] = []
+        self.next_id = 1
+        self.recycled: Dict[str, int] = {}
+        self.samples: List[Dict] = []
+        self.launch_failures = 0
+
+    def start(self) -> bool:
+        if self.size <= 0:
+            return False
+        self.executable = find_chromium()
+        if not self.executable:
+            self.size = 0
+            return False
+        self.fill()
+        return True
+
+    def fill(self):
+        live = [b for b in self.browsers if b.draining is None]
+        for _ in range(self.size - len(live)):
+            self._launch()
+
+    def _launch(self):
+        user_data_dir = tempfile.mkdtemp(prefix="pool-chromium-")
+        proc = subprocess.Popen(
+            [self.executable, *CHROMIUM_ARGS, f"--user-data-dir={user_data_dir}", "about:blank"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        browser = PooledBrowser(self.next_id, proc, user_data_dir)
+        self.next_id += 1
+        os.set_blocking(proc.stderr.fileno(), False)
+        self.sel.register(proc.stderr, selectors.EVENT_READ, ("chromium", browser))
+        self.browsers.append(browser)
+
+    def on_stderr(self, browser: PooledBrowser):
+        """Chromium stderr is readable: pick up the endpoint, drain the rest."""
+        try:
+            data = os.read(browser.proc.stderr.fileno(), 65536)
+        except BlockingIOError:
+            return
+        except (OSError, ValueError):
+            data = b""
+        if not data:
+            # Browser exited on its own
+            self._kill(browser, "exited")
+            self.fill()
+            return
+        if browser.endpoint is None:
+            browser._banner = (browser._banner + data)[-8192:]
+            m = _DEVTOOLS_LINE.search(browser._banner)
+            if m:
+                browser.endpoint = m.group(1).decode()
+                browser._banner = b""
+
+    def lease(self) -> Optional[PooledBrowser]:
+        ready = [b for b in self.browsers if b.ready()]
+        if not ready:
+            return None
+        browser = min(ready, key=lambda b: b.active)
+        browser.active += 1
+        browser.requests += 1
+        return browser
+
+    def release(self, browser: PooledBrowser, request_rss_kb: int) -> Dict:
+        """Return a lease, sample memory and apply the recycle policy."""
+        browser.active -= 1
+        browser.rss_kb = tree_rss_kb(browser.proc.pid) if browser.proc.poll() is None else 0
+        reason = self.policy.reason(browser, request_rss_kb)
+        if reason and browser.draining is None:
+            browser.draining = reason
+            self.recycled[reason] = self.recycled.get(reason, 0) + 1
+        sample = {
+            "browser_id": browser.id,
+            "browser_rss_kb": browser.rss_kb,
+            "request_rss_kb": request_rss_kb,
+            "recycle": reason,
+        }
+        self.samples.append(dict(sample, at=time.time()))
+        del self.samples[:-SAMPLE_HISTORY]
+        self.maintain()
+        return sample
+
+    def maintain(self):
+        """Retire drained or dead browsers and launch replacements."""
+        for browser in list(self.browsers):
+            if browser.draining is None and browser.active == 0 and browser.endpoint:
+                reason = self.policy.reason(browser)
+                if reason == "age":
+                    browser.draining = reason
+                    self.recycled[reason] = self.recycled.get(reason, 0) + 1
+            if browser.proc.poll() is not None:
+                self._kill(browser, "exited")
+            elif browser.draining and browser.active == 0:
+                self._kill(browser, browser.draining)
+        self.fill()
+
+    def _kill(self, browser: PooledBrowser, reason: str):
+        if browser not in self.browsers:
+            return
+        self.browsers.remove(browser)
+        try:
+            self.sel.unregister(browser.proc.stderr)
+        except (KeyError, ValueError):
+            pass
+        try:
+            os.killpg(browser.proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        try:
+            browser.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        browser.proc.stderr.close()
+        # The profile dir lives on tmpfs on Cloud Run, i.e. it is memory too
+        shutil.rmtree(browser.user_data_dir, ignore_errors=True)
+        if reason == "exited":
+            self.recycled["exited"] = self.recycled.get("exited", 0) + 1
+            if browser.endpoint is None or browser.age_s() < EARLY_EXIT_S:
+                self.launch_failures += 1
+                if self.launch_failures >= MAX_LAUNCH_FAILURES:
+                    self.size = 0
+        elif browser.endpoint is not None:
+            self.launch_failures = 0
+
+    def close_inherited(self):
+        """In a forked child: drop the pipe descriptors, leave the browsers be."""
+        for browser in self.browsers:
+            browser.proc.stderr.close()
+
+    def shutdown(self):
+        for browser in list(self.browsers):
+            self._kill(browser, "shutdown")
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.size,
+            "policy": {
+                "max_requests": self.policy.max_requests,
+                "max_age_s": self.policy.max_age_s,
+                "max_rss_kb": self.policy.max_rss_kb,
+            },
+            "browsers": [b.describe() for b in self.browsers],
+            "recycled": dict(self.recycled),
+            "samples": self.samples[-20:],
+        }
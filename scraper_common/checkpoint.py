@@ -0,0 +1,169 @@
+"""Checkpoints for long crawls that walk every subgroup of a catalog group.
+
+State is kept per (script, VIN, group, filters) in ``crawls.sqlite`` (see
+``state``): the planned subgroup list, each subgroup's parsed result once
+done, and failed subgroups with the reason. A rerun for the same key picks
+the stored results up and only visits what is still missing or failed;
+``report`` tells the caller how complete the crawl is.
+
+Checkpoints older than ``CRAWL_CHECKPOINT_TTL_H`` hours are started over.
+"""
+import os
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from scraper_common import state
+
+CHECKPOINT_TTL_S = float(os.getenv("CRAWL_CHECKPOINT_TTL_H", "24")) * 3600.0
+
+_DB_FILE = "crawls.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    key TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    updated REAL NOT NULL,
+    plan TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS subgroups (
+    crawl TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (crawl, name)
+);
+"""
+
+
+def unique_keys(names: List[str]) -> List[str]:
+    """Checkpoint keys for subgroup names, numbered when a name repeats."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        keys.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return keys
+
+
+def failure_reason(error: BaseException) -> str:
+    text = str(error).strip().splitlines()
+    return f"{type(error).__name__}: {text[0]}" if text else type(error).__name__
+
+
+class CrawlCheckpoint:
+    def __init__(self, script: str, vin: str, group: str, scope: Iterable[str] = ()):
+        self.key = "|".join([script, vin.strip().upper(), group, ",".join(sorted(scope))])
+        self.conn = state.connect(_DB_FILE)
+        self.conn.executescript(_SCHEMA)
+        self.resumed = 0
+        self._start()
+
+    def _start(self):
+        now = time.time()
+        row = self.conn.execute("SELECT started FROM crawls WHERE key = ?", (self.key,)).fetchone()
+        self.conn.execute("BEGIN IMMEDIATE")
+        if row and now - row[0] > CHECKPOINT_TTL_S:
+            self.conn.execute("DELETE FROM subgroups WHERE crawl = ?", (self.key,))
+            self.conn.execute("DELETE FROM crawls WHERE key = ?", (self.key,))
+            row = None
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO crawls (key, started, updated) VALUES (?, ?, ?)", (self.key, now, now)
+            )
+        else:
+            self.conn.execute("UPDATE crawls SET updated = ?, error = NULL WHERE key = ?", (now, self.key))
+        self.conn.execute("COMMIT")
+
+    # -- plan ---------------------------------------------------------------
+
+    def plan(self) -> Optional[List[str]]:
+        """Subgroup names recorded by an earlier run, in catalog order."""
+        row = self.conn.execute("SELECT plan FROM crawls WHERE key = ?", (self.key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def set_plan(self, names: List[str]):
+        self.conn.execute(
+            "UPDATE crawls SET plan = ?, updated = ? WHERE key = ?",
+            (json.dumps(names, ensure_ascii=False), time.time(), self.key),
+        )
+
+    # -- subgroups ----------------------------------------------------------
+
+    def result(self, name: str) -> Optional[Dict]:
+        """Stored result of a finished subgroup (counted as resumed)."""
+        row = self.conn.execute(
+            "SELECT result FROM subgroups WHERE crawl = ? AND name = ? AND status = 'done'",
+            (self.key, name),
+        ).fetchone()
+        if not row:
+            return None
+        self.resumed += 1
+        return json.loads(row[0])
+
+    def done(self, name: str, result: Dict):
+        self._put(name, "done", json.dumps(result, ensure_ascii=False), None)
+
+    def failed(self, name: str, error: BaseException):
+        self._put(name, "failed", None, failure_reason(error))
+
+    def _put(self, name: str, status: str, result: Optional[str], error: Optional[str]):
+        now = time.time()
+        self.conn.execute(
+            "INSERT INTO subgroups (crawl, name, status, result, error, attempts, updated) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT(crawl, name) DO UPDATE SET status = excluded.status, "
+            "result = excluded.result, error = excluded.error, "
+            "attempts = subgroups.attempts + 1, updated = excluded.updated",
+            (self.key, name, status, result, error, now),
+        )
+        self.conn.execute("UPDATE crawls SET updated = ? WHERE key = ?", (now, self.key))
+
+    def crawl_failed(self, error: BaseException):
+        """The crawl itself stopped (e.g. the group page never loaded)."""
+        self.conn.execute(
+            "UPDATE crawls SET error = ?, updated = ? WHERE key = ?",
+            (failure_reason(error), time.time(), self.key),
+        )
+
+    def load(self) -> Dict[str, Dict]:
+        """Results of every finished subgroup of the recorded plan, by key."""
+        stored = {}
+        for key in self.plan() or []:
+            result = self.result(key)
+            if result is not None:
+                stored[key] = result
+        return stored
+
+    # -- summary ------------------------------------------------------------
+
+    def report(self, names: Optional[List[str]] = None) -> Dict:
+        names = names if names is not None else (self.plan() or [])
+        rows = {
+            r[0]: r[1:]
+            for r in self.conn.execute(
+                "SELECT name, status, error, attempts FROM subgroups WHERE crawl = ?", (self.key,)
+            )
+        }
+        crawl_error = self.conn.execute(
+            "SELECT error FROM crawls WHERE key = ?", (self.key,)
+        ).fetchone()[0]
+        done = [n for n in names if rows.get(n, ("",))[0] == "done"]
+        failed = [
+            {"subgroup": n, "error": rows[n][1], "attempts": rows[n][2]}
+            for n in names
+            if rows.get(n, ("",))[0] == "failed"
+        ]
+        missing = [n for n in names if n not in rows]
+        return {
+            "complete": bool(names) and len(done) == len(names) and not crawl_error,
+            "total": len(names),
+            "done": len(done),
+            "resumed": self.resumed,
+            "failed": failed,
+            "missing": missing,
+            "error": crawl_error,
+        }
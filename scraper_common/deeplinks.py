@@ -0,0 +1,143 @@
+"""Deep links to catalog pages that are normally reached by clicking through.
+
+Getting to a parts page takes a chain of clicks (RealOEM: catalog, VIN,
+Search, Browse Parts, group, subgroup; 7zap: search, modification). The
+URL each step of the chain ends on is kept in ``deeplinks.sqlite`` (see
+``state``) per (catalog, vehicle, step), so the next lookup for the same
+vehicle opens it with one ``goto``.
+
+A stored link counts as stale when the page it opens does not show the
+element the step leads to; it is dropped and the click path runs instead,
+storing the URL it ends on. ``follow_path`` tries the deepest step first
+and falls back one step at a time, so a stale subgroup link still starts
+from the group page when that one is good.
+
+Links older than ``DEEPLINK_TTL_DAYS`` are not used. superetka is not
+covered: its catalog is one page whose selection lives in page state, the
+URL never changes.
+"""
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+from scraper_common import metrics, state
+from scraper_common.pagecheck import PageBlocked, check, goto
+
+TTL_S = float(os.getenv("DEEPLINK_TTL_DAYS", "30")) * 86400.0
+READY_TIMEOUT_MS = float(os.getenv("DEEPLINK_READY_TIMEOUT_MS", "15000"))
+
+_DB_FILE = "deeplinks.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    catalog TEXT NOT NULL,
+    vehicle TEXT NOT NULL,
+    step TEXT NOT NULL,
+    url TEXT NOT NULL,
+    stored REAL NOT NULL,
+    PRIMARY KEY (catalog, vehicle, step)
+);
+"""
+
+# (step name, selector the step's page shows, click from the previous step's page)
+Step = Tuple[str, str, Callable[[], None]]
+
+
+class DeepLinks:
+    """Stored links of one vehicle in one catalog."""
+
+    def __init__(self, catalog: str, vehicle: str):
+        self.catalog = catalog
+        self.vehicle = vehicle.strip().upper()
+        self.conn = state.connect(_DB_FILE)
+        self.conn.executescript(_SCHEMA)
+
+    def get(self, step: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT url, stored FROM links WHERE catalog = ? AND vehicle = ? AND step = ?",
+            (self.catalog, self.vehicle, step),
+        ).fetchone()
+        if not row or time.time() - row[1] > TTL_S:
+            return None
+        return row[0]
+
+    def put(self, step: str, url: str):
+        self.conn.execute(
+            "INSERT INTO links (catalog, vehicle, step, url, stored) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(catalog, vehicle, step) DO UPDATE SET url = excluded.url, stored = excluded.stored",
+            (self.catalog, self.vehicle, step, url, time.time()),
+        )
+
+    def drop(self, step: str):
+        self.conn.execute(
+            "DELETE FROM links WHERE catalog = ? AND vehicle = ? AND step = ?",
+            (self.catalog, self.vehicle, step),
+        )
+
+
+def follow(page, links: DeepLinks, step: str, ready: str,
+           click_path: Callable[[], Optional[str]], timeout: float = READY_TIMEOUT_MS) -> bool:
+    """Reach ``step``: by its stored link while that still shows ``ready``, else by ``click_path``.
+
+    ``click_path`` may return the URL it clicked from; when the click did not
+    change the URL there is nothing worth storing. Returns True when the
+    stored link was used.
+    """
+    result = "miss"
+    url = links.get(step)
+    if url:
+        try:
+            goto(page, url, wait_until="domcontentloaded")
+            page.locator(ready).first.wait_for(state="attached", timeout=timeout)
+            _emit(links, step, "hit")
+            return True
+        except PageBlocked:
+            raise
+        except Exception:
+            # An interstitial in place of the page is not a stale link
+            check(page)
+            links.drop(step)
+            result = "stale"
+
+    started_from = click_path()
+    _emit(links, step, result)
+    # Click navigations get the same check as goto
+    check(page)
+    try:
+        page.locator(ready).first.wait_for(state="attached", timeout=timeout)
+    except Exception:
+        check(page)
+        # Not (yet) the page the step leads to; the flow's own waits decide
+        return False
+    if page.url != started_from:
+        links.put(step, page.url)
+    return False
+
+
+def follow_path(page, links: DeepLinks, steps: List[Step], timeout: float = READY_TIMEOUT_MS) -> Optional[str]:
+    """Reach the last of ``steps`` from the deepest one with a good stored link.
+
+    The first step's click must start from wherever the page is (it usually
+    opens the catalog's home page itself). Returns the step whose stored
+    link was followed, or None when everything was clicked.
+    """
+    used: List[str] = []
+
+    def reach(i: int):
+        step, ready, click = steps[i]
+
+        def click_path() -> Optional[str]:
+            if i:
+                reach(i - 1)
+            started_from = page.url if i else None
+            click()
+            return started_from
+
+        if follow(page, links, step, ready, click_path, timeout):
+            used.append(step)
+
+    reach(len(steps) - 1)
+    return used[0] if used else None
+
+
+def _emit(links: DeepLinks, step: str, result: str):
+    metrics.emit("deeplink.follow", 1, catalog=links.catalog, step=step.split("/", 1)[0], result=result)
@@ -0,0 +1,420 @@
+"""Pre-forking runtime for the scraper scripts.
+
+The gateway starts one long-lived ``python -m scraper_common.forkserver``. It
+imports the heavy modules once (see ``runtime.HEAVY_MODULES``) and then forks
+a child per request, so a request no longer pays interpreter startup plus the
+playwright/stealth/camoufox imports before its first navigation.
+
+Protocol (unix socket, one JSON object per line):
+
+    -> {"op": "run", "script": "/app/etka/get_ac_parts.py", "args": [...], "env": {...}}
+    <- {"t": "out", "d": "..."}          stdout chunk
+    <- {"t": "err", "d": "..."}          stderr chunk
+    <- {"t": "exit", "code": 0, "ms": 1234.5, "maxrss_kb": 81234,
+        "browser_id": 1, "browser_rss_kb": 412000, "recycle": null}
+
+    -> {"op": "stats"}
+    <- {"t": "stats", ...}
+
+    -> {"op": "lease", "pid": 4242}      sent by a running job
+    <- {"t": "lease", "endpoint": "ws://..."}
+
+Closing the connection while a job runs kills the job's process group.
+
+A job leases a pooled browser (see ``browser_pool``) only when it launches
+Chromium: ``browser.launch_chromium`` asks the server named by
+``SCRAPER_FORKSERVER_SOCKET`` for one (``request_lease``), so Camoufox runs
+and browser-less scripts hold none. The exit frame of a job that leased one
+carries the per-request RSS samples.
+"""
+import os
+import sys
+import json
+import time
+import codecs
+import fcntl
+import runpy
+import signal
+import socket
+import argparse
+import selectors
+import traceback
+from typing import Dict, Optional
+
+from scraper_common import runtime
+from scraper_common.browser_pool import BrowserPool
+from scraper_common.memory import rss_kb
+
+SOCKET_PATH = os.getenv("PY_FORKSERVER_SOCKET", "/tmp/scraper-forkserver.sock")
+# How long to wait for stdout/stderr EOF after the child itself has exited;
+# a leaked grandchild holding the pipe must not keep the request open.
+EXIT_DRAIN_GRACE_S = 2.0
+
+
+class Job:
+    def __init__(self, conn: socket.socket, pid: int, out_fd: int, err_fd: int):
+        self.conn = conn
+        self.pid = pid
+        self.streams = {
+            out_fd: ("out", codecs.getincrementaldecoder("utf-8")(errors="replace")),
+            err_fd: ("err", codecs.getincrementaldecoder("utf-8")(errors="replace")),
+        }
+        self.started = time.monotonic()
+        self.exited_at: Optional[float] = None
+        self.code: Optional[int] = None
+        self.maxrss_kb = 0
+        self.lease = None
+
+
+def _run_child(request: Dict):
+    """Body of a forked request. Never returns."""
+    code = 0
+    try:
+        script = os.path.abspath(request["script"])
+        sys.argv = [script] + [str(a) for a in request.get("args") or []]
+        # Same sys.path[0] as `python3 script.py`, so `from utils import ...` works
+        sys.path.insert(0, os.path.dirname(script))
+        os.environ.update({k: str(v) for k, v in (request.get("env") or {}).items()})
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(code)
+
+
+class ForkServer:
+    def __init__(self, path: str):
+        self.path = path
+        self.sel = selectors.DefaultSelector()
+        self.listener: Optional[socket.socket] = None
+        self.pending: Dict[socket.socket, bytearray] = {}
+        self.jobs: Dict[int, Job] = {}
+        self.served = 0
+        self.preload_ms: Dict[str, Optional[float]] = {}
+        self.wake_r, self.wake_w = os.pipe()
+        self.pool = BrowserPool(self.sel)
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        self.preload_ms = runtime.preload()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(64)
+        self.listener.setblocking(False)
+        self.sel.register(self.listener, selectors.EVENT_READ, ("accept", None))
+
+        for fd in (self.wake_r, self.wake_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        signal.set_wakeup_fd(self.wake_w)
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+        signal.signal(signal.SIGTERM, self._shutdown)
+        self.sel.register(self.wake_r, selectors.EVENT_READ, ("wake", None))
+        pooled = self.pool.start()
+
+        print(json.dumps({
+            "ready": True,
+            "socket": self.path,
+            "preload_ms": self.preload_ms,
+            "browser_pool": self.pool.size if pooled else 0,
+        }), flush=True)
+
+    def serve_forever(self):
+        self.start()
+        while True:
+            for key, _ in self.sel.select(timeout=0.5):
+                kind, obj = key.data
+                if kind == "accept":
+                    self._accept()
+                elif kind == "request":
+                    self._read_request(key.fileobj)
+                elif kind == "client":
+                    self._read_client(key.fileobj, obj)
+                elif kind == "pipe":
+                    self._read_pipe(key.fd, obj)
+                elif kind == "chromium":
+                    self.pool.on_stderr(obj)
+                elif kind == "wake":
+                    try:
+                        os.read(self.wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+            self._reap()
+            self.pool.maintain()
+
+    def _shutdown(self, *_):
+        for job in list(self.jobs.values()):
+            self._kill(job)
+        self.pool.shutdown()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        os._exit(0)
+
+    # ---------- connections ----------
+
+    def _accept(self):
+        try:
+            conn, _ = self.listener.accept()
+        except BlockingIOError:
+            return
+        conn.settimeout(10.0)
+        self.pending[conn] = bytearray()
+        self.sel.register(conn, selectors.EVENT_READ, ("request", None))
+
+    def _read_request(self, conn: socket.socket):
+        data = conn.recv(65536)
+        if not data:
+            self._drop(conn)
+            return
+        buf = self.pending[conn]
+        buf.extend(data)
+        if b"\n" not in buf:
+            return
+        line = bytes(buf.split(b"\n", 1)[0])
+        del self.pending[conn]
+        self.sel.unregister(conn)
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self._send(conn, {"t": "exit", "code": 2, "error": "bad request"})
+            conn.close()
+            return
+        op = request.get("op")
+        if op == "run":
+            self._spawn(conn, request)
+        elif op == "stats":
+            self._send(conn, dict(self.stats(), t="stats"))
+            conn.close()
+        elif op == "lease":
+            self._send(conn, {"t": "lease", "endpoint": self._lease(request.get("pid"))})
+            conn.close()
+        else:
+            self._send(conn, {"t": "exit", "code": 2, "error": f"unknown op {op!r}"})
+            conn.close()
+
+    def _read_client(self, conn: socket.socket, job: Job):
+        try:
+            data = conn.recv(4096)
+        except OSError:
+            data = b""
+        if not data:
+            # Client went away (request cancelled / hedge lost): stop the work
+            try:
+                self.sel.unregister(conn)
+            except (KeyError, ValueError):
+                pass
+            self._kill(job)
+
+    def _drop(self, conn: socket.socket):
+        self.pending.pop(conn, None)
+        try:
+            self.sel.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+    def _send(self, conn: socket.socket, frame: Dict) -> bool:
+        try:
+            conn.sendall((json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8"))
+            return True
+        except OSError:
+            return False
+
+    # ---------- jobs ----------
+
+    def _spawn(self, conn: socket.socket, request: Dict):
+        request["env"] = dict(request.get("env") or {}, SCRAPER_FORKSERVER_SOCKET=self.path)
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.setsid()
+            signal.set_wakeup_fd(-1)
+            for sig in (signal.SIGCHLD, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            for fd in (out_r, out_w, err_r, err_w):
+                os.close(fd)
+            self._close_inherited(conn)
+            _run_child(request)
+
+        os.close(out_w)
+        os.close(err_w)
+        job = Job(conn, pid, out_r, err_r)
+        self.jobs[pid] = job
+        self.served += 1
+        for fd in (out_r, err_r):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            self.sel.register(fd, selectors.EVENT_READ, ("pipe", job))
+        self.sel.register(conn, selectors.EVENT_READ, ("client", job))
+
+    def _lease(self, pid) -> Optional[str]:
+        """Endpoint of the pooled browser job ``pid`` runs on, leasing one on first ask."""
+        job = self.jobs.get(pid)
+        if job is None or job.code is not None:
+            return None
+        if job.lease is None:
+            job.lease = self.pool.lease()
+        return job.lease.endpoint if job.lease is not None else None
+
+    def _close_inherited(self, own_conn: socket.socket):
+        """In the child: release every descriptor the server owns."""
+        self.sel.close()
+        self.pool.close_inherited()
+        self.listener.close()
+        own_conn.close()
+        for conn in self.pending:
+            conn.close()
+        for job in self.jobs.values():
+            job.conn.close()
+            for fd in job.streams:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+    def _read_pipe(self, fd: int, job: Job):
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        name, decoder = job.streams[fd]
+        text = decoder.decode(data, final=not data)
+        if text:
+            self._send(job.conn, {"t": name, "d": text})
+        if not data:
+            self._close_stream(fd, job)
+
+    def _close_stream(self, fd: int, job: Job):
+        try:
+            self.sel.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+        os.close(fd)
+        del job.streams[fd]
+
+    def _reap(self):
+        now = time.monotonic()
+        for pid, job in list(self.jobs.items()):
+            if job.code is None:
+                try:
+                    wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+                except ChildProcessError:
+                    wpid, status, rusage = pid, 0, None
+                if wpid == 0:
+                    continue
+                job.code = os.waitstatus_to_exitcode(status) if rusage else 1
+                job.maxrss_kb = rusage.ru_maxrss if rusage else 0
+                job.exited_at = now
+            if job.streams and now - job.exited_at < EXIT_DRAIN_GRACE_S:
+                continue
+            for fd in list(job.streams):
+                self._read_pipe(fd, job)
+                if fd in job.streams:
+                    self._close_stream(fd, job)
+            self._finish(job)
+
+    def _finish(self, job: Job):
+        # Take down anything the script left running (driver, browser)
+        try:
+            os.killpg(job.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        frame = {
+            "t": "exit",
+            "code": job.code,
+            "ms": round((job.exited_at - job.started) * 1000.0, 1),
+            "maxrss_kb": job.maxrss_kb,
+        }
+        if job.lease is not None:
+            frame.update(self.pool.release(job.lease, job.maxrss_kb))
+        self._send(job.conn, frame)
+        try:
+            self.sel.unregister(job.conn)
+        except (KeyError, ValueError):
+            pass
+        job.conn.close()
+        del self.jobs[job.pid]
+
+    def _kill(self, job: Job):
+        try:
+            os.killpg(job.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "running": len(self.jobs),
+            "served": self.served,
+            "preload_ms": self.preload_ms,
+            "rss_kb": rss_kb(os.getpid()),
+            "browser_pool": self.pool.stats(),
+        }
+
+
+def _request(path: str, frame: Dict) -> Dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(5.0)
+        s.connect(path)
+        s.sendall((json.dumps(frame) + "\n").encode("utf-8"))
+        buf = b""
+        while b"\n" not in buf:
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+    return json.loads(buf.split(b"\n", 1)[0])
+
+
+def request_stats(path: str = SOCKET_PATH) -> Dict:
+    """Client helper: ask a running fork server for its stats."""
+    return _request(path, {"op": "stats"})
+
+
+def request_lease(path: str) -> Optional[str]:
+    """In a forked job: lease a pooled browser; returns its CDP endpoint, or None."""
+    return _request(path, {"op": "lease", "pid": os.getpid()}).get("endpoint")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forking runtime for scraper scripts.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--stats", action="store_true", help="print stats of a running server")
+    args = parser.parse_args()
+    if args.stats:
+        print(json.dumps(request_stats(args.socket), indent=1))
+        return
+    ForkServer(args.socket).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Canonical part keywords of every catalog, shared with the gateway.
+
+``keywords.json`` lists, per catalog, the canonical parts a find-part flow
+supports: the script that handles it, spelling variants (``aliases``) and
+the navigation plan the script needs (every other field). The gateway
+(gateway/keywords.js) resolves requests against the same file, rejects
+unknown parts before starting anything and passes the canonical name on.
+
+Free text is compared after ``normalize``: lower case, ``-``/``_`` as
+spaces, whitespace collapsed, so "Brake-Discs" and "brake discs" are the
+same part.
+"""
+import os
+import re
+import json
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+Resolved = namedtuple("Resolved", "catalog part script plan")
+
+_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.json")
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[-_]+", " ", (text or "").lower())).strip()
+
+
+def _compile():
+    with open(_PATH, encoding="utf-8") as f:
+        catalogs = json.load(f)
+    parts: Dict[str, Dict[str, Resolved]] = {}
+    lookup: Dict[str, Dict[str, Resolved]] = {}
+    for catalog, spec in catalogs.items():
+        parts[catalog] = {}
+        lookup[catalog] = {}
+        for name, entry in spec["parts"].items():
+            plan = {k: v for k, v in entry.items() if k not in ("script", "aliases")}
+            resolved = Resolved(catalog, name, f"{spec['dir']}/{entry['script']}", plan)
+            parts[catalog][name] = resolved
+            for text in [name, *entry.get("aliases", [])]:
+                lookup[catalog][normalize(text)] = resolved
+    return parts, lookup
+
+
+_PARTS, _LOOKUP = _compile()
+
+
+def resolve(catalog: str, text: str) -> Optional[Resolved]:
+    """The canonical part ``text`` names in ``catalog``, or None."""
+    return _LOOKUP.get(catalog, {}).get(normalize(text))
+
+
+def parts(catalog: str, script: Optional[str] = None) -> Dict[str, Resolved]:
+    """Canonical parts of ``catalog``, optionally only those ``script`` handles."""
+    return {
+        name: r
+        for name, r in _PARTS[catalog].items()
+        if script is None or r.script.endswith("/" + script)
+    }
+
+
+def names(catalog: str, part: str) -> List[str]:
+    """Canonical name and aliases of ``part``, normalized."""
+    return [text for text, r in _LOOKUP[catalog].items() if r.part == part]
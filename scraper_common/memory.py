@@ -0,0 +1,51 @@
+"""Resident-set-size sampling from /proc (Linux only; 0 elsewhere)."""
+import os
+from typing import Dict, Iterable, List
+
+
+def rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _parent_map() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def process_tree(pid: int) -> List[int]:
+    """``pid`` and all of its descendants."""
+    try:
+        children = _parent_map()
+    except OSError:
+        return [pid]
+    tree, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        tree.append(p)
+        stack.extend(children.get(p, ()))
+    return tree
+
+
+def tree_rss_kb(pid: int) -> int:
+    """RSS of a process and its descendants (e.g. Chromium and its renderers)."""
+    return sum_rss_kb(process_tree(pid))
+
+
+def sum_rss_kb(pids: Iterable[int]) -> int:
+    return sum(rss_kb(p) for p in pids)
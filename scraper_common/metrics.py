@@ -0,0 +1,30 @@
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+# Lines starting with this prefix on stderr are picked up by gateway/python.js
+# and aggregated into GET /metrics instead of being treated as error output.
+METRIC_PREFIX = "@@metric "
+
+
+def emit(name: str, value: float, **labels):
+    """Write one metric sample to the gateway's stderr channel."""
+    payload = {"name": name, "value": round(float(value), 3)}
+    if labels:
+        payload["labels"] = {k: str(v) for k, v in labels.items()}
+    try:
+        sys.stderr.write(METRIC_PREFIX + json.dumps(payload, ensure_ascii=False) + "\n")
+        sys.stderr.flush()
+    except Exception:
+        pass
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Emit the wall time of the ``with`` block in milliseconds."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit(name, (time.perf_counter() - t0) * 1000.0, **labels)
@@ -0,0 +1,180 @@
+"""Classify a loaded page as normal, challenge, login wall, rate limit or error.
+
+Catalog sites answer bans and outages with interstitials (Cloudflare
+challenges, "Too Many Requests", login pages, 5xx) that otherwise surface as
+a selector timeout tens of seconds later. ``check`` looks for their
+fingerprints right after a navigation and raises ``PageBlocked``;
+``wait_for`` waits for the expected selector *or* an interstitial, whichever
+comes first.
+
+A raised ``PageBlocked`` is also reported to the gateway as an ``@@error``
+line on stderr, so it is recognised even when the script catches it.
+"""
+import sys
+import json
+from typing import Dict, Optional
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+from scraper_common import metrics
+from scraper_common.browser import script_name
+
+# Lines starting with this prefix on stderr carry a typed failure for
+# gateway/python.js (one JSON object per line).
+ERROR_PREFIX = "@@error "
+
+NORMAL = "normal"
+CHALLENGE = "challenge"
+LOGIN_WALL = "login_wall"
+RATE_LIMIT = "rate_limit"
+ERROR = "error"
+
+# Runs in the page; returns {kind, reason}. Body text is only inspected on
+# small pages: interstitials are short, catalog pages are not, and a parts
+# table mentioning "access" or "error" must not trip it.
+_FINGERPRINT_JS = """
+({ allowLogin }) => {
+  const title = (document.title || "").toLowerCase();
+  const body = document.body ? (document.body.innerText || "") : "";
+  const text = body.length < 4000 ? body.toLowerCase() : "";
+  const has = (sel) => !!document.querySelector(sel);
+  const visible = (sel) => Array.from(document.querySelectorAll(sel))
+    .some((el) => el.offsetParent !== null);
+  const nav = performance.getEntriesByType("navigation")[0];
+  const status = (nav && nav.responseStatus) || 0;
+  const hit = (kind, reason) => ({ kind, reason });
+
+  if (location.protocol === "chrome-error:" || location.href.startsWith("about:neterror")) {
+    return hit("error", "browser error page");
+  }
+  if (title.includes("just a moment") || title.includes("attention required")) {
+    return hit("challenge", "cloudflare interstitial: " + document.title);
+  }
+  for (const sel of [
+    "#challenge-form", "#cf-challenge-running", ".cf-turnstile",
+    "iframe[src*='challenges.cloudflare.com']", "#px-captcha",
+    "iframe[src*='recaptcha']", "iframe[src*='hcaptcha']", "#captcha-container",
+  ]) {
+    if (has(sel)) return hit("challenge", "captcha element " + sel);
+  }
+  for (const phrase of [
+    "verify you are human", "checking your browser",
+    "checking if the site connection is secure", "enable javascript and cookies to continue",
+  ]) {
+    if (text.includes(phrase)) return hit("challenge", phrase);
+  }
+  if (status === 429 || title.includes("too many requests")) {
+    return hit("rate_limit", "HTTP " + (status || 429));
+  }
+  for (const phrase of [
+    "too many requests", "you are being rate limited", "error 1015",
+    "error 1020", "access denied", "your ip has been blocked", "temporarily blocked",
+  ]) {
+    if (text.includes(phrase)) return hit("rate_limit", phrase);
+  }
+  if (status >= 500 || /^(500|502|503|504)\\b/.test(title) ||
+      ["bad gateway", "service unavailable", "internal server error", "gateway time-out"]
+        .some((p) => title.includes(p))) {
+    return hit("error", status ? "HTTP " + status : document.title);
+  }
+  if (!allowLogin && visible("input[type=password]")) {
+    return hit("login_wall", "login form shown");
+  }
+  return hit("normal", "");
+}
+"""
+
+# Resolves to the selector's match, or to a fingerprint once the page is an
+# interstitial; polled by wait_for_function. Login forms are not looked for
+# while polling, a page mid-way through logging in still shows one.
+_WAIT_JS = """
+({ selector }) => {
+  if (document.querySelector(selector)) return { kind: "normal", reason: "" };
+  const fp = (%s)({ allowLogin: true });
+  return fp.kind === "normal" ? null : fp;
+}
+""" % _FINGERPRINT_JS.strip()
+
+
+class PageBlocked(Exception):
+    """The catalog served an interstitial instead of the page we asked for."""
+
+    def __init__(self, kind: str, url: str, reason: str = ""):
+        super().__init__(f"{kind} page at {url}: {reason}".rstrip(": "))
+        self.kind = kind
+        self.url = url
+        self.reason = reason
+
+    def to_dict(self) -> Dict:
+        return {"type": "blocked", "kind": self.kind, "url": self.url, "reason": self.reason}
+
+
+def report(error: PageBlocked):
+    """Tell the gateway why this run failed (see ``ERROR_PREFIX``)."""
+    metrics.emit("page.blocked", 1, kind=error.kind, script=script_name())
+    try:
+        sys.stderr.write(ERROR_PREFIX + json.dumps(error.to_dict(), ensure_ascii=False) + "\n")
+        sys.stderr.flush()
+    except Exception:
+        pass
+
+
+def _blocked(page, fingerprint: Dict) -> PageBlocked:
+    error = PageBlocked(fingerprint["kind"], page.url, fingerprint.get("reason") or "")
+    report(error)
+    return error
+
+
+def classify(page, allow_login: bool = True) -> Dict:
+    """``{"kind": ..., "reason": ...}`` for the page as it is now."""
+    try:
+        return page.evaluate(_FINGERPRINT_JS, {"allowLogin": allow_login})
+    except Exception:
+        # Page mid-navigation or closed: nothing to say about it yet
+        return {"kind": NORMAL, "reason": ""}
+
+
+def check(page, response=None, allow_login: bool = True):
+    """Raise ``PageBlocked`` unless the current page looks normal.
+
+    ``response`` (from ``goto``) adds the HTTP status to the fingerprint.
+    Pass ``allow_login=False`` once the session is supposed to be logged in.
+    """
+    status = response.status if response is not None else 0
+    fingerprint = classify(page, allow_login)
+    if fingerprint["kind"] == NORMAL and status == 429:
+        fingerprint = {"kind": RATE_LIMIT, "reason": "HTTP 429"}
+    elif fingerprint["kind"] == NORMAL and status >= 500:
+        fingerprint = {"kind": ERROR, "reason": f"HTTP {status}"}
+    if fingerprint["kind"] != NORMAL:
+        raise _blocked(page, fingerprint)
+
+
+def goto(page, url: str, allow_login: bool = True, **kwargs):
+    """``page.goto`` followed by ``check``; returns the response."""
+    response = page.goto(url, **kwargs)
+    check(page, response, allow_login)
+    return response
+
+
+def wait_for(page, selector: str, timeout: float = 30000, allow_login: bool = True):
+    """Wait until ``selector`` is attached, failing fast on an interstitial.
+
+    Raises ``PageBlocked`` as soon as the page turns out to be one, and
+    Playwright's ``TimeoutError`` when neither shows up in time. With
+    ``allow_login=False`` a timeout on a page showing a login form is
+    reported as a login wall instead. Returns a locator for ``selector``.
+    """
+    try:
+        handle = page.wait_for_function(
+            _WAIT_JS, arg={"selector": selector}, timeout=timeout, polling=250
+        )
+    except PlaywrightTimeout:
+        fingerprint = classify(page, allow_login)
+        if fingerprint["kind"] != NORMAL:
+            raise _blocked(page, fingerprint)
+        raise
+    fingerprint: Optional[Dict] = handle.json_value()
+    if fingerprint and fingerprint["kind"] != NORMAL:
+        raise _blocked(page, fingerprint)
+    return page.locator(selector)
@@ -0,0 +1,303 @@
+"""Reverse index from part number to where it is used (vehicle, group, subgroup, item).
+
+Scrapers ``add`` entries as they parse parts tables; lookups answer from two
+files under ``state.STATE_DIR``:
+
+``partindex.log``
+    new entries, one ``PART\\tvehicle\\tgroup\\tsubgroup\\titem`` line each,
+    appended under a file lock by any process.
+``partindex.bin``
+    the compacted index, memory-mapped by readers::
+
+        header   "PIX1", record count, location count, reserved  (<4sIII)
+        records  (part number, location id, item) sorted by part  (<20sIHxx)
+        offsets  location count + 1 uint32 offsets into the blob
+        blob     "vehicle\\tgroup\\tsubgroup" strings, UTF-8
+
+A lookup is a binary search over the fixed-width records plus a substring
+search of the (small) log. Once the log holds ``PARTINDEX_COMPACT_EVERY``
+lines the writer that crossed it merges it into a new ``partindex.bin``
+(written aside and renamed over, so open readers keep their mapping).
+
+Entries are only ever added: a vehicle that stopped listing a part keeps
+its entry until the index is rebuilt from the parts database.
+"""
+import os
+import re
+import mmap
+import fcntl
+import struct
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from scraper_common import metrics, state
+
+COMPACT_EVERY = int(os.getenv("PARTINDEX_COMPACT_EVERY", "2000"))
+
+_MAGIC = b"PIX1"
+_HEADER = struct.Struct("<4sIII")
+_RECORD = struct.Struct("<20sIHxx")
+_OFFSET = struct.Struct("<I")
+_KEY_WIDTH = 20
+_NO_ITEM = 0xFFFF
+
+_BIN_FILE = "partindex.bin"
+_LOG_FILE = "partindex.log"
+_LOCK_FILE = "partindex.lock"
+
+# (part number, vehicle, group, subgroup, item number or None)
+Entry = Tuple[str, str, str, str, Optional[str]]
+
+
+def normalize(part_number: str) -> str:
+    """Part numbers compare without spaces, dots or dashes ("64 11 9 179 802")."""
+    return re.sub(r"[^0-9A-Z]", "", (part_number or "").upper())[:_KEY_WIDTH]
+
+
+def _clean(text: Optional[str]) -> str:
+    return re.sub(r"[\t\r\n]+", " ", text or "").strip()
+
+
+def _item(item_no: Optional[str]) -> int:
+    return int(item_no) if item_no and item_no.isdigit() and int(item_no) < _NO_ITEM else _NO_ITEM
+
+
+@contextmanager
+def _locked():
+    with open(state.state_path(_LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# -- writing ------------------------------------------------------------------
+
+def add(entries: Iterable[Entry]):
+    """Append entries to the log; compacts when the log has grown past the threshold."""
+    lines = []
+    for part_number, vehicle, group, subgroup, item_no in entries:
+        key = normalize(part_number)
+        if key:
+            lines.append("\t".join([key, _clean(vehicle), _clean(group), _clean(subgroup), item_no or ""]))
+    if not lines:
+        return
+    try:
+        with _locked():
+            with open(state.state_path(_LOG_FILE), "a", encoding="utf-8") as log:
+                log.write("\n".join(lines) + "\n")
+            if _log_lines() >= COMPACT_EVERY:
+                _compact()
+    except Exception:
+        # The index is a convenience; never fail a scrape over it
+        pass
+
+
+def _log_lines() -> int:
+    with open(state.state_path(_LOG_FILE), "rb") as log:
+        return log.read().count(b"\n")
+
+
+def _lower_bound(block, count: int, key: bytes, base: int = 0) -> int:
+    """First of ``count`` records at ``base`` in ``block`` whose key is not below ``key`` (padded)."""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = base + mid * _RECORD.size
+        if block[start:start + _KEY_WIDTH] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _read_bin() -> Tuple[bytes, List[str]]:
+    """Records block and location strings of the current index."""
+    path = state.state_path(_BIN_FILE)
+    if not os.path.exists(path):
+        return b"", []
+    with open(path, "rb") as f:
+        data = f.read()
+    _, count, locs, _ = _HEADER.unpack_from(data, 0)
+    base = _HEADER.size + count * _RECORD.size
+    offsets = struct.unpack_from(f"<{locs + 1}I", data, base)
+    blob = data[base + (locs + 1) * _OFFSET.size:]
+    return data[_HEADER.size:base], [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(locs)]
+
+
+def _write_bin(block: bytes, locations: List[str]):
+    blob = bytearray()
+    offsets = []
+    for loc in locations:
+        offsets.append(len(blob))
+        blob += loc.encode("utf-8")
+    offsets.append(len(blob))
+
+    path = state.state_path(_BIN_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(block) // _RECORD.size, len(locations), 0))
+        f.write(block)
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _compact():
+    """Merge the log into ``partindex.bin``; caller holds the lock.
+
+    Log records are spliced into the sorted block at their binary-searched
+    positions, so the cost grows with the log, not with the index.
+    """
+    started = time.perf_counter()
+    block, locations = _read_bin()
+    loc_ids = {loc: i for i, loc in enumerate(locations)}
+    new = set()
+    with open(state.state_path(_LOG_FILE), "r", encoding="utf-8") as log:
+        for line in log:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 5:
+                continue
+            loc = "\t".join(fields[1:4])
+            if loc not in loc_ids:
+                loc_ids[loc] = len(locations)
+                locations.append(loc)
+            new.add(_RECORD.pack(fields[0].encode("ascii"), loc_ids[loc], _item(fields[4])))
+
+    count = len(block) // _RECORD.size
+    pieces = []
+    done = 0
+    for record in sorted(new):
+        key = record[:_KEY_WIDTH]
+        at = _lower_bound(block, count, key)
+        run = at
+        while run < count and block[run * _RECORD.size:run * _RECORD.size + _KEY_WIDTH] == key:
+            if block[run * _RECORD.size:(run + 1) * _RECORD.size] == record:
+                break
+            run += 1
+        else:
+            pieces.append(block[done * _RECORD.size:at * _RECORD.size])
+            pieces.append(record)
+            done = at
+    pieces.append(block[done * _RECORD.size:])
+    _write_bin(b"".join(pieces), locations)
+    open(state.state_path(_LOG_FILE), "w").close()
+    metrics.emit("partindex.compact_ms", (time.perf_counter() - started) * 1000.0, merged=len(new))
+
+
+def compact():
+    with _locked():
+        _compact()
+
+
+def rebuild(entries: Iterable[Entry]):
+    """Replace the whole index (and drop the log) with ``entries``."""
+    locations: List[str] = []
+    loc_ids: Dict[str, int] = {}
+    records = set()
+    for part_number, vehicle, group, subgroup, item_no in entries:
+        key = normalize(part_number)
+        if not key:
+            continue
+        loc = "\t".join([_clean(vehicle), _clean(group), _clean(subgroup)])
+        if loc not in loc_ids:
+            loc_ids[loc] = len(locations)
+            locations.append(loc)
+        records.add(_RECORD.pack(key.encode("ascii"), loc_ids[loc], _item(item_no)))
+    with _locked():
+        _write_bin(b"".join(sorted(records)), locations)
+        open(state.state_path(_LOG_FILE), "w").close()
+
+
+# -- reading ------------------------------------------------------------------
+
+class PartIndex:
+    """Reader; keeps ``partindex.bin`` mapped and remaps it after a compaction."""
+
+    def __init__(self):
+        self._map = None
+        self._ident = None
+        self._count = 0
+        self._offsets = 0
+        self._blob = 0
+
+    def _refresh(self):
+        path = state.state_path(_BIN_FILE)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._map, self._ident, self._count = None, None, 0
+            return
+        ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if ident == self._ident:
+            return
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, locs, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a part index")
+        self._offsets = _HEADER.size + self._count * _RECORD.size
+        self._blob = self._offsets + (locs + 1) * _OFFSET.size
+        self._ident = ident
+
+    def _location(self, loc: int) -> str:
+        start, end = struct.unpack_from("<II", self._map, self._offsets + loc * _OFFSET.size)
+        return self._map[self._blob + start:self._blob + end].decode("utf-8")
+
+    def _from_bin(self, key: bytes) -> List[Tuple[str, int]]:
+        padded = key.ljust(_KEY_WIDTH, b"\0")
+        at = _lower_bound(self._map, self._count, padded, _HEADER.size)
+        found = []
+        while at < self._count:
+            start = _HEADER.size + at * _RECORD.size
+            if self._map[start:start + _KEY_WIDTH] != padded:
+                break
+            _, loc, item = _RECORD.unpack_from(self._map, start)
+            found.append((self._location(loc), item))
+            at += 1
+        return found
+
+    @staticmethod
+    def _from_log(key: bytes) -> List[Tuple[str, int]]:
+        try:
+            with open(state.state_path(_LOG_FILE), "rb") as log:
+                data = log.read()
+        except FileNotFoundError:
+            return []
+        found = []
+        needle = b"\n" + key + b"\t"
+        data = b"\n" + data
+        at = data.find(needle)
+        while at >= 0:
+            end = data.find(b"\n", at + 1)
+            fields = data[at + 1:end if end >= 0 else None].decode("utf-8").split("\t")
+            if len(fields) == 5:
+                found.append(("\t".join(fields[1:4]), _item(fields[4])))
+            at = data.find(needle, at + 1)
+        return found
+
+    def lookup(self, part_number: str) -> List[Dict]:
+        """Every (vehicle, group, subgroup, item) the part number was seen at."""
+        key = normalize(part_number).encode("ascii")
+        if not key:
+            return []
+        self._refresh()
+        hits = (self._from_bin(key) if self._map else []) + self._from_log(key)
+        results = []
+        for loc, item in dict.fromkeys(hits):
+            vehicle, group, subgroup = loc.split("\t")
+            results.append({
+                "vehicle": vehicle,
+                "group": group,
+                "subgroup": subgroup,
+                "item_no": None if item == _NO_ITEM else f"{item:02d}",
+            })
+        return results
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self._count
@@ -0,0 +1,170 @@
+"""Per-site token buckets shared by all scraper processes on the instance.
+
+Buckets live in one SQLite file (see ``state``), so forked requests, parallel
+pages and batch jobs all draw from the same budget per catalog site. A request
+takes a token and, when the bucket is empty, reserves one from the future and
+waits until it is due; waiters are therefore served in arrival order without
+polling.
+
+Limits are ``rate/burst`` (tokens per second / bucket size) per site and can
+be overridden with ``RATE_LIMITS="realoem.com=2/6,7zap.com=0.5/2"``.
+``RATE_LIMIT=0`` turns throttling off.
+
+Document requests (navigations) to a catalog host draw from the site's
+bucket. xhr and fetch requests, which the single-page catalogs (superetka,
+7zap) send many of per page, draw from a bucket of their own per site
+sized ``RATE_LIMIT_XHR_FACTOR`` times the site's. The time spent waiting is
+emitted as ``ratelimit.wait_ms`` per request.
+
+A request that has to wait is held with ``page.wait_for_timeout``, not a
+sleep: route handlers run on Playwright's dispatcher, and sleeping there
+would stall every page of the process, not just the one waiting.
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from scraper_common import metrics, state
+
+ENABLED = os.getenv("RATE_LIMIT", "1").lower() not in ("0", "false", "no")
+
+# tokens per second, burst
+SITE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "realoem.com": (2.0, 6.0),
+    "superetka.com": (1.0, 4.0),
+    "7zap.com": (0.5, 3.0),
+    "mb-teilekatalog.info": (1.0, 4.0),
+    "ssg.asia": (1.0, 4.0),
+    "autodoc.co.uk": (1.0, 3.0),
+}
+
+THROTTLED_RESOURCE_TYPES = ("document", "xhr", "fetch")
+XHR_FACTOR = float(os.getenv("RATE_LIMIT_XHR_FACTOR", "5"))
+
+_DB_FILE = "ratelimit.sqlite"
+_log = logging.getLogger("scraper_common.ratelimit")
+_conn: Optional[sqlite3.Connection] = None
+_conn_pid: Optional[int] = None
+
+
+def _load_overrides():
+    for item in os.getenv("RATE_LIMITS", "").split(","):
+        m = re.match(r"^\s*([\w.-]+)\s*=\s*([\d.]+)\s*/\s*([\d.]+)\s*$", item)
+        if m:
+            SITE_LIMITS[m.group(1)] = (float(m.group(2)), float(m.group(3)))
+
+
+_load_overrides()
+
+
+def site_for_url(url: str) -> Optional[str]:
+    host = (urlsplit(url).hostname or "").lower()
+    for site in SITE_LIMITS:
+        if host == site or host.endswith("." + site):
+            return site
+    return None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = state.connect(_DB_FILE)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (site TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+        _conn_pid = os.getpid()
+    return _conn
+
+
+def _bucket(site: str, resource_type: str) -> Tuple[str, float, float]:
+    rate, burst = SITE_LIMITS[site]
+    if resource_type == "document":
+        return site, rate, burst
+    return f"{site}#xhr", rate * XHR_FACTOR, burst * XHR_FACTOR
+
+
+def reserve(site: str, resource_type: str = "document") -> float:
+    """Take one token for a ``resource_type`` request to ``site``; returns seconds to wait for it."""
+    bucket, rate, burst = _bucket(site, resource_type)
+    if rate <= 0:
+        return 0.0
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE site = ?", (bucket,)).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+        tokens -= 1.0
+        conn.execute(
+            "INSERT INTO buckets (site, tokens, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(site) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+            (bucket, tokens, now),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return max(0.0, -tokens / rate)
+
+
+def acquire(site: str, resource_type: str = "document", page=None) -> float:
+    """Wait until a request to ``site`` may go out; returns ms waited.
+
+    With ``page`` the wait runs on the page (the dispatcher keeps serving
+    other pages meanwhile), else the process sleeps.
+    """
+    if not ENABLED or site not in SITE_LIMITS:
+        return 0.0
+    try:
+        wait_s = reserve(site, resource_type)
+    except sqlite3.Error as e:
+        # Never fail a scrape because the limiter's state is unavailable
+        _log.warning("rate limiter unavailable for %s: %s", site, e)
+        return 0.0
+    if wait_s > 0:
+        if page is not None:
+            page.wait_for_timeout(wait_s * 1000.0)
+        else:
+            time.sleep(wait_s)
+    return wait_s * 1000.0
+
+
+def _page_of(request):
+    try:
+        return request.frame.page
+    except Exception:
+        # e.g. service worker requests have no frame
+        return None
+
+
+def _throttle_route(route):
+    request = route.request
+    if request.resource_type in THROTTLED_RESOURCE_TYPES:
+        site = site_for_url(request.url)
+        if site:
+            waited = acquire(site, request.resource_type, _page_of(request))
+            metrics.emit("ratelimit.wait_ms", waited, site=site, type=request.resource_type)
+    route.fallback()
+
+
+def install(target):
+    """Throttle catalog requests made by a page or context.
+
+    Installed before the scripts' own handlers, so it runs after them in
+    Playwright's route chain; handlers that let a request through must use
+    ``route.fallback()`` for it to get here.
+    """
+    if not ENABLED:
+        return target
+    pattern = re.compile(
+        r"^https?://([^/]*\.)?(" + "|".join(re.escape(s) for s in SITE_LIMITS) + r")(:\d+)?/"
+    )
+    try:
+        target.route(pattern, _throttle_route)
+    except Exception as e:
+        _log.warning("could not install rate limiting: %s", e)
+    return target
@@ -0,0 +1,128 @@
+"""Startup budget tooling and the pre-imported runtime the fork server forks from.
+
+``python -m scraper_common.runtime`` profiles the import cost of the heavy
+third-party modules with ``-X importtime`` and exits non-zero when the total
+exceeds ``STARTUP_BUDGET_MS``.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+from typing import Dict, List, Optional
+
+# Modules every scraper pays for at startup. Importing them once in the fork
+# server means a forked request starts with them already in sys.modules.
+HEAVY_MODULES = (
+    "playwright.sync_api",
+    "playwright_stealth",
+    "dotenv",
+    "camoufox.sync_api",
+)
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)\s*$")
+_MODULE_T0 = time.time()
+
+
+def process_start_time() -> float:
+    """Epoch seconds at which this process was created (fork or exec)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # comm may contain spaces, fields after the closing paren are fixed
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/stat") as f:
+            btime = next(int(l.split()[1]) for l in f if l.startswith("btime"))
+        return btime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return _MODULE_T0
+
+
+def since_start_ms() -> float:
+    return max(0.0, (time.time() - process_start_time()) * 1000.0)
+
+
+def preload(modules=HEAVY_MODULES) -> Dict[str, Optional[float]]:
+    """Import ``modules`` into this interpreter; missing ones map to None."""
+    timings: Dict[str, Optional[float]] = {}
+    for name in modules:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = (time.perf_counter() - t0) * 1000.0
+        except ImportError:
+            timings[name] = None
+    return timings
+
+
+def profile_import(module: str, top: int = 5) -> Dict:
+    """Import ``module`` in a fresh interpreter and parse ``-X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+
+    cumulative_us = 0
+    entries = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, _, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        entries.append((name, self_us))
+        if name == module:
+            cumulative_us = cum_us
+    entries.sort(key=lambda e: e[1], reverse=True)
+    return {
+        "module": module,
+        "cumulative_ms": cumulative_us / 1000.0,
+        "heaviest": [{"module": n, "self_ms": s / 1000.0} for n, s in entries[:top]],
+    }
+
+
+def profile_startup(modules=HEAVY_MODULES, top: int = 5, budget_ms: float = STARTUP_BUDGET_MS) -> Dict:
+    """Profile each module on its own plus the interpreter baseline."""
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=False)
+    interpreter_ms = (time.perf_counter() - t0) * 1000.0
+
+    results: List[Dict] = [profile_import(m, top=top) for m in modules]
+    imports_ms = sum(r.get("cumulative_ms", 0.0) for r in results)
+    return {
+        "interpreter_ms": interpreter_ms,
+        "imports_ms": imports_ms,
+        "total_ms": interpreter_ms + imports_ms,
+        "budget_ms": budget_ms,
+        "modules": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile scraper startup imports.")
+    parser.add_argument("modules", nargs="*", default=list(HEAVY_MODULES))
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    report = profile_startup(args.modules, top=args.top, budget_ms=args.budget_ms)
+    print(f"interpreter startup: {report['interpreter_ms']:8.1f} ms")
+    for r in report["modules"]:
+        if "error" in r:
+            print(f"{r['module']:<28} not importable: {' '.join(r['error'])}")
+            continue
+        print(f"{r['module']:<28} {r['cumulative_ms']:8.1f} ms")
+        for h in r["heaviest"]:
+            print(f"    {h['module']:<40} {h['self_ms']:8.1f} ms self")
+    total = report["total_ms"]
+    print(f"total: {total:.1f} ms (budget {report['budget_ms']:.0f} ms)")
+    sys.exit(0 if total <= report["budget_ms"] else 1)
+
+
+if __name__ == "__main__":
+    main()
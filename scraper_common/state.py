@@ -0,0 +1,24 @@
+"""Local state shared by every scraper process on an instance.
+
+Everything lives under ``SCRAPER_STATE_DIR`` (default: the temp dir), one
+SQLite file per concern. Connections are opened per process, never inherited
+across the fork server's ``fork()``.
+"""
+import os
+import sqlite3
+import tempfile
+
+STATE_DIR = os.getenv("SCRAPER_STATE_DIR") or os.path.join(tempfile.gettempdir(), "scraper-state")
+
+
+def state_path(filename: str) -> str:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, filename)
+
+
+def connect(filename: str, timeout: float = 10.0) -> sqlite3.Connection:
+    """Autocommit connection in WAL mode; use ``BEGIN IMMEDIATE`` for writes."""
+    conn = sqlite3.connect(state_path(filename), timeout=timeout, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -1,10 +1,23 @@
 import express from "express";
-import { spawn } from "child_process";
 import path from "path";
 import { fileURLToPath } from "url";
 import fs from "fs";
 import dotenv from "dotenv";
 import axios from "axios";
+import * as metrics from "./gateway/metrics.js";
+import { admit, stats as admissionStats } from "./gateway/admission.js";
+import { runHedged, stats as hedgeStats } from "./gateway/hedge.js";
+import { guard, stats as breakerStats } from "./gateway/breaker.js";
+import * as keywords from "./gateway/keywords.js";
+import * as resultCache from "./gateway/cache.js";
+import {
+  startPython,
+  runPython,
+  startForkserver,
+  stopForkserver,
+  forkserverStatus,
+  forkserverStats,
+} from "./gateway/python.js";
 
 // Basic setup
 const __filename = fileURLToPath(import.meta.url);
@@ -59,135 +72,284 @@ app.get("/", (req, res) => {
     status: "ok",
     message: "Scraper services running",
     timestamp: new Date().toISOString(),
+    breakers: breakerStats(),
   });
 });
 
-// ====== ENDPOINTS ======
+app.get("/metrics", async (req, res) => {
+  res.json({
+    timestamp: new Date().toISOString(),
+    forkserver: { ...forkserverStatus(), stats: await forkserverStats() },
+    gateway_rss_mb: process.memoryUsage().rss / 1024 / 1024,
+    admission: admissionStats(),
+    hedging: hedgeStats(),
+    result_cache: resultCache.stats(),
+    ...metrics.snapshot(),
+  });
+});
 
-// etka Scraper - Get Car Details
-app.get("/superetka/get-car-details/:vin", (req, res) => {
-  const { vin } = req.params;
-  if (!vin) {
-    return res.status(400).json({ error: "VIN is required." });
+// Middleware for a scraper endpoint: circuit breaker, then admission.
+function catalogRoute(catalog, options) {
+  return [guard(catalog), admit(catalog, options)];
+}
+
+// Middleware for a find-part endpoint, ahead of catalogRoute: resolves the
+// requested part to its canonical name and script (gateway/keywords.js) and
+// answers repeated requests from the result cache. An unknown part is
+// rejected here, before any admission or process start, unless `fallback`
+// lets the handler deal with it (res.locals.resolved is then null).
+function resolvePart(catalog, { fallback = false } = {}) {
+  return (req, res, next) => {
+    const { vin, part } = req.body || {};
+    if (!vin || !part) {
+      return res.status(400).json({ error: "vin and part are required." });
+    }
+    const resolved = keywords.resolve(catalog, part);
+    if (!resolved) {
+      if (fallback) {
+        res.locals.resolved = null;
+        return next();
+      }
+      return res.status(400).json({
+        error: "Unsupported Keyword",
+        supported: keywords.supported(catalog),
+      });
+    }
+    res.locals.resolved = resolved;
+    res.locals.cacheKey = resultCache.cacheKey(catalog, vin, resolved.part);
+    const cached = resultCache.get(res.locals.cacheKey);
+    if (cached !== undefined) {
+      res.set("X-Cache", "hit");
+      return res.json(cached);
+    }
+    next();
+  };
+}
+
+// Kind of failure of a script run, for the circuit breaker.
+function classifyFailure(output, error) {
+  if (/TimeoutError|Timeout \d+ms exceeded|timed out/i.test(`${error}\n${output}`)) {
+    return "timeout";
+  }
+  return "error";
+}
+
+// Sends a finished script run as the response: its stdout JSON, or a 500.
+// A run that stopped on a block/captcha page answers 503 with its kind.
+function sendScriptResult(res, code, output, error, throttleMs = 0, failure = null) {
+  if (res.headersSent) return;
+  res.set("X-Throttle-Ms", String(Math.round(throttleMs)));
+  let resultObj;
+  try {
+    resultObj = code === 0 ? JSON.parse(output.trim()) : undefined;
+  } catch (e) {
+    // handled below
+  }
+  if (resultObj !== undefined) {
+    if (res.locals.cacheKey) resultCache.set(res.locals.cacheKey, resultObj);
+    return res.json(resultObj);
   }
 
-  // Call the Python script to get car details
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "etka", "get_vehicle_data.py"),
-    vin,
-  ]);
+  if (failure && failure.type === "blocked") {
+    res.locals.failure = "blocked";
+    return res.status(503).json({
+      error: "Catalog blocked the request",
+      kind: failure.kind,
+      reason: failure.reason,
+      url: failure.url,
+    });
+  }
+  res.locals.failure = classifyFailure(output, error);
+  if (code !== 0) {
+    return res.status(500).json({ error: error || "Python script error." });
+  }
+  res.status(500).json({
+    error: "Invalid JSON from Python script.",
+    details: output.trim(),
+  });
+}
 
-  pythonProcess.stdout.setEncoding("utf8");
+// Runs a scraper script and relays its stdout JSON as the response.
+function relayJson(res, script, args) {
+  const pythonProcess = startPython(script, args);
   let output = "";
   let error = "";
 
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
+  pythonProcess.on("stdout", (data) => {
+    output += data;
   });
 
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
+  pythonProcess.on("stderr", (data) => {
+    error += data;
+  });
+
+  // Client went away: stop the scraper instead of finishing for nobody
+  res.on("close", () => {
+    if (!res.writableFinished) pythonProcess.kill();
   });
 
   pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
+    sendScriptResult(
+      res,
+      code,
+      output,
+      error,
+      pythonProcess.throttleMs,
+      pythonProcess.failure
+    );
+  });
+  return pythonProcess;
+}
+
+// Streaming clients of a script that prints NDJSON records
+// (SCRAPER_STREAM=ndjson): "sse" relays each record as a server-sent event,
+// anything else relays the lines as-is in a chunked NDJSON response.
+function streamFormat(req) {
+  const wanted = String(req.query.stream || "").toLowerCase();
+  const accept = req.get("accept") || "";
+  if (wanted === "sse" || accept.includes("text/event-stream")) return "sse";
+  if (wanted === "ndjson" || accept.includes("application/x-ndjson")) return "ndjson";
+  return null;
+}
+
+function relayStream(res, format, script, args) {
+  if (res.headersSent) return null;
+  const pythonProcess = startPython(script, args, {
+    env: { SCRAPER_STREAM: "ndjson" },
+  });
+  let buffer = "";
+  let error = "";
+  let records = 0;
+  const startedAt = Date.now();
+
+  res.status(200);
+  res.set({
+    "Content-Type":
+      format === "sse" ? "text/event-stream" : "application/x-ndjson",
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+  });
+  res.flushHeaders();
+
+  const send = (line) => {
+    let type = "message";
     try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
+      type = JSON.parse(line).type || type;
+    } catch {
+      return; // not a record (stray print), drop it
     }
+    if (records === 0) {
+      metrics.observe("stream.first_record_ms", { script }, Date.now() - startedAt);
+    }
+    records += 1;
+    res.write(format === "sse" ? `event: ${type}\ndata: ${line}\n\n` : `${line}\n`);
+  };
+
+  pythonProcess.on("stdout", (data) => {
+    buffer += data;
+    let nl;
+    while ((nl = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, nl).trim();
+      buffer = buffer.slice(nl + 1);
+      if (line) send(line);
+    }
+  });
+  pythonProcess.on("stderr", (data) => {
+    error += data;
   });
+  res.on("close", () => {
+    if (!res.writableFinished) pythonProcess.kill();
+  });
+  pythonProcess.on("close", (code) => {
+    if (buffer.trim()) send(buffer.trim());
+    if (code !== 0) {
+      const failure = pythonProcess.failure;
+      // The 200 went out before the script ran: the breaker takes the
+      // outcome from here (gateway/breaker.js)
+      res.locals.failure = failure ? "blocked" : classifyFailure(buffer, error);
+      send(
+        JSON.stringify({
+          type: "error",
+          error: failure ? "Catalog blocked the request" : "Python script error.",
+          ...(failure ? { kind: failure.kind } : {}),
+          code,
+          details: failure ? undefined : error.slice(-2000),
+        })
+      );
+    }
+    res.end();
+  });
+  return pythonProcess;
+}
+
+// Like relayJson, but a slow run gets a hedged second attempt (gateway/hedge.js).
+function relayHedged(res, catalog, script, args) {
+  const { result, cancel } = runHedged(catalog, script, args);
+  res.on("close", () => {
+    if (!res.writableFinished) cancel();
+  });
+  result.then((r) => {
+    res.set("X-Attempt", r.attempt);
+    sendScriptResult(res, r.code, r.stdout, r.stderr, r.throttleMs, r.failure);
+  });
+}
+
+// ====== ENDPOINTS ======
+
+// etka Scraper - Get Car Details
+app.get("/superetka/get-car-details/:vin", catalogRoute("superetka"), (req, res) => {
+  const { vin } = req.params;
+  if (!vin) {
+    return res.status(400).json({ error: "VIN is required." });
+  }
+
+  relayJson(res, "etka/get_vehicle_data.py", [vin]);
 });
 
-// etka Scraper - Find Part
-app.post("/superetka/find-part", (req, res) => {
-  const { vin, part } = req.body;
-  if (!vin || !part) {
-    return res.status(400).json({ error: "vin and part are required." });
-  }
-
-  const ac_keywords = [
-    "compressor",
-    "evaporator",
-    "compressor bracket",
-    "expansion valve",
-  ];
-  const quick_service_keywords = [
-    "oil-filter",
-    "engine oil",
-    "engine oil filter",
-    "air filter",
-    "air-filter",
-    "spark plugs",
-    "spark-plugs",
-    "dust filter",
-    "pollen filter",
-    "ac filter",
-    "insert filter",
-    "harmful substance filter",
-    "transmission oil",
-    "brake discs",
-    "brake-discs",
-    "disc brake pads",
-    "toothed belt",
-    "assembly belt",
-    "timing belt",
-    "timing belt kit",
-  ];
+// etka Scraper - Find Part. Not hedged: a second run would only wait for
+// the leased account the first one holds (scraper_common/accounts.py).
+app.post("/superetka/find-part", resolvePart("superetka"), catalogRoute("superetka"), (req, res) => {
+  const { script, part } = res.locals.resolved;
+  relayJson(res, script, [req.body.vin, part]);
+});
 
-  let selected_operation = "";
-  try {
-    if (ac_keywords.includes(part)) {
-      selected_operation = "get_ac_parts.py";
-    } else if (quick_service_keywords.includes(part)) {
-      selected_operation = "get_maintenance_parts.py";
-    } else {
-      throw new Error("Unsupported Keyword!");
-    }
-  } catch (e) {
-    res.status(500).json({
-      error: "Unsupported Keyword",
-    });
+// etka Scraper - Every AC part in one call
+app.post("/superetka/ac-parts", catalogRoute("superetka"), (req, res) => {
+  const { vin } = req.body || {};
+  if (!vin) {
+    return res.status(400).json({ error: "VIN is required." });
   }
 
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "etka", selected_operation),
-    vin,
-    part,
-  ]);
+  relayJson(res, "etka/get_ac_parts.py", [vin, "--all"]);
+});
 
-  let output = "";
-  let error = "";
+// etka Scraper - Every service and wear category in one pass
+app.post("/superetka/maintenance", catalogRoute("superetka"), (req, res) => {
+  const { vin } = req.body || {};
+  if (!vin) {
+    return res.status(400).json({ error: "VIN is required." });
+  }
 
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
+  relayJson(res, "etka/get_maintenance_parts.py", [vin, "--all"]);
+});
 
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
+// etka Scraper - Vehicle data and several parts from one session
+app.post("/superetka/snapshot", catalogRoute("superetka"), (req, res) => {
+  const { vin, parts = [] } = req.body || {};
+  if (!vin || !Array.isArray(parts)) {
+    return res.status(400).json({ error: "VIN and a parts array are required." });
+  }
+  const unknown = parts.filter((p) => !keywords.resolve("superetka", p));
+  if (unknown.length) {
+    return res.status(400).json({
+      error: "Unsupported Keyword",
+      unsupported: unknown,
+      supported: keywords.supported("superetka"),
+    });
+  }
 
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  const canonical = [...new Set(parts.map((p) => keywords.resolve("superetka", p).part))];
+  relayJson(res, "etka/get_snapshot.py", [vin, ...canonical]);
 });
 // BMW Scraper - Find Part
 const ALLOWED_GROUP_KEYS = [
@@ -228,93 +390,76 @@ const ALLOWED_GROUP_KEYS = [
   "auxiliary materials fluidscolorsystem",
 ];
 
-app.post("/realoem/find-part", (req, res) => {
-  const { vin, part } = req.body;
-  if (!vin || !part) {
-    return res.status(400).json({ error: "vin and part are required." });
-  }
-
-  const ac_keywords = [
-    "compressor",
-    "evaporator",
-    "compressor bracket",
-    "expansion valve",
-    "condenser",
-  ];
-  const quick_service_keywords = [
-    "oil-filter",
-    "air filter",
-    "spark plugs",
-    "spark plug",
-    "brake disc",
-    "brake discs",
-  ];
-
-  const brake_keywords = [
-    "front brake disc",
-    "rear brake disc",
-    "brake pads",
-    "front brake pad wear sensor",
-  ];
-
-  const radiator_keywords = [
-    "expansion tank",
-    "radiator",
-    "fan housing w/ fan",
-  ];
-  let selected_operation = "";
+// A part with no scripted flow is answered from the offline parts database
+// here, ahead of catalogRoute: no RealOEM request is made, so it takes no
+// admission slot and neither depends on nor counts toward the breaker.
+function realoemOfflineFallback(req, res, next) {
+  if (res.locals.resolved) return next();
+  answerFromSearch(res, req.body.vin, req.body.part);
+}
+
+app.post(
+  "/realoem/find-part",
+  resolvePart("realoem", { fallback: true }),
+  realoemOfflineFallback,
+  catalogRoute("realoem"),
+  (req, res) => {
+    const resolved = res.locals.resolved;
+    relayHedged(res, "realoem", resolved.script, [req.body.vin, resolved.part]);
+  }
+);
+// Answers a find-part from the offline full-text index (search_parts.py).
+// A VIN whose vehicle has not been crawled gets the 400 "Unsupported
+// Keyword" other catalogs give unknown parts; only a failed search is a 500.
+async function answerFromSearch(res, vin, part) {
+  const { code, stdout, stderr } = await runPython("bmw-scraper/search_parts.py", [
+    "--numbers",
+    `--vin=${vin}`,
+    "--",
+    part,
+  ]);
+  if (res.headersSent) return;
+  if (code !== 0) {
+    return res.status(500).json({ error: "Python script error.", details: stderr.slice(-2000) });
+  }
+  let numbers;
   try {
-    if (ac_keywords.includes(part.toLowerCase())) {
-      selected_operation = "get_ac_parts.py";
-    } else if (quick_service_keywords.includes(part.toLowerCase())) {
-      selected_operation = "get_maintenance_parts.py";
-    } else if (brake_keywords.includes(part.toLowerCase())) {
-      selected_operation = "get_brakes.py";
-    } else if (radiator_keywords.includes(part.toLowerCase())) {
-      selected_operation = "get_radiator_parts.py";
-    } else {
-      throw new Error("Unsupported Keyword!");
-    }
-  } catch (e) {
-    res.status(500).json({
+    numbers = JSON.parse(stdout.trim());
+  } catch {
+    return res.status(500).json({ error: "Invalid JSON from Python script.", details: stdout.trim() });
+  }
+  if (numbers === null) {
+    return res.status(400).json({
       error: "Unsupported Keyword",
+      reason: "vehicle not crawled",
+      supported: keywords.supported("realoem"),
     });
   }
+  res.set("X-Source", "offline-search");
+  res.json(numbers);
+}
+
+// Free-text search over crawled vehicles: ?q=...&vin=...&from_date=...&to_date=...&limit=...
+app.get("/realoem/search", (req, res) => {
+  const { q, vin, from_date, to_date, limit } = req.query;
+  if (!q) {
+    return res.status(400).json({ error: "q is required." });
+  }
 
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "bmw-scraper", selected_operation),
-    vin,
-    part,
-  ]);
-
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
+  const args = [];
+  if (vin) args.push(`--vin=${vin}`);
+  if (from_date) args.push(`--from=${from_date}`);
+  if (to_date) args.push(`--to=${to_date}`);
+  if (limit) args.push(`--limit=${Math.min(Number(limit) || 50, 500)}`);
+  relayJson(res, "bmw-scraper/search_parts.py", [...args, "--", String(q)]);
+});
 
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+// Cached vehicles that take a part number (scraper_common/partindex.py)
+app.get("/realoem/where-used/:part_number", (req, res) => {
+  relayJson(res, "bmw-scraper/where_used.py", [req.params.part_number]);
 });
-app.post("/realoem/query-group", (req, res) => {
+
+app.post("/realoem/query-group", catalogRoute("realoem", { priority: "bulk" }), (req, res) => {
   const { vin, group } = req.body;
   if (!vin || !group) {
     return res.status(400).json({ error: "vin, group and are required." });
@@ -328,46 +473,15 @@ app.post("/realoem/query-group", (req, res) => {
       throw new Error("Unsupported Keyword!");
     }
   } catch (e) {
-    res.status(500).json({
+    return res.status(500).json({
       error: "Unsupported Keyword",
     });
   }
 
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "bmw-scraper", selected_operation),
-    vin,
-    group,
-  ]);
-
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  relayJson(res, `bmw-scraper/${selected_operation}`, [vin, group]);
 });
 
-app.post("/realoem/query-subgroup", (req, res) => {
+app.post("/realoem/query-subgroup", catalogRoute("realoem", { priority: "bulk" }), (req, res) => {
   const { vin, group, subgroup } = req.body;
   if (!vin || !group || !subgroup) {
     return res
@@ -383,47 +497,20 @@ app.post("/realoem/query-subgroup", (req, res) => {
       throw new Error("Unsupported Keyword!");
     }
   } catch (e) {
-    res.status(500).json({
+    return res.status(500).json({
       error: "Unsupported Keyword",
     });
   }
 
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "bmw-scraper", selected_operation),
-    vin,
-    group,
-    subgroup,
-  ]);
-
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  const args = [vin, group, subgroup];
+  const format = streamFormat(req);
+  if (format) {
+    return relayStream(res, format, `bmw-scraper/${selected_operation}`, args);
+  }
+  relayJson(res, `bmw-scraper/${selected_operation}`, args);
 });
 
-app.post("/realoem/get-subgroups", (req, res) => {
+app.post("/realoem/get-subgroups", catalogRoute("realoem"), (req, res) => {
   const { vin, group } = req.body;
   if (!vin || !group) {
     return res
@@ -439,88 +526,53 @@ app.post("/realoem/get-subgroups", (req, res) => {
       throw new Error("Unsupported Keyword!");
     }
   } catch (e) {
-    res.status(500).json({
+    return res.status(500).json({
       error: "Unsupported Keyword",
     });
   }
 
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "bmw-scraper", selected_operation),
-    vin,
-    group,
-  ]);
-
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  relayJson(res, `bmw-scraper/${selected_operation}`, [vin, group]);
 });
 
 // BMW Scraper - Get Car Details
-app.get("/realoem/get-car-details/:vin", (req, res) => {
+app.get("/realoem/get-car-details/:vin", catalogRoute("realoem"), (req, res) => {
   const { vin } = req.params;
   if (!vin) {
     return res.status(400).json({ error: "VIN is required." });
   }
 
-  // Call the Python script to get car details
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "bmw-scraper", "get_car_details.py"),
-    vin,
-  ]);
+  relayJson(res, "bmw-scraper/get_car_details.py", [vin]);
+});
 
-  pythonProcess.stdout.setEncoding("utf8");
-  let output = "";
-  let error = "";
+// BMW Scraper - Offline parts database (bmw-scraper/partsdb.py). Crawled
+// vehicles answer /realoem/find-part without a browser. A crawl stores each
+// group as it finishes, so a cut-off request resumes where it stopped.
+app.post("/realoem/offline/crawl", catalogRoute("realoem", { priority: "bulk" }), (req, res) => {
+  const { vin, groups = [], refresh_days } = req.body;
+  if (!vin || !Array.isArray(groups)) {
+    return res.status(400).json({ error: "vin is required, groups must be a list." });
+  }
+  const unknown = groups.filter((g) => !ALLOWED_GROUP_KEYS.includes(g));
+  if (unknown.length) {
+    return res.status(400).json({ error: "Unsupported group", groups: unknown });
+  }
 
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
+  const args = refresh_days ? [`--every=${Number(refresh_days)}`] : [];
+  relayJson(res, "bmw-scraper/crawl_vehicle.py", [...args, vin, ...groups]);
+});
 
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
+// Crawls the vehicles whose refresh is due; meant for a scheduled job.
+app.post("/realoem/offline/refresh", catalogRoute("realoem", { priority: "bulk" }), (req, res) => {
+  const limit = Number((req.body && req.body.limit) || 0);
+  relayJson(res, "bmw-scraper/crawl_vehicle.py", limit > 0 ? ["--due", String(limit)] : ["--due"]);
+});
 
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+app.get("/realoem/offline/coverage", (req, res) => {
+  relayJson(res, "bmw-scraper/crawl_vehicle.py", ["--report"]);
 });
 
 //autodoc
-app.get("/autodoc/:part_number/", async (req, res) => {
+app.get("/autodoc/:part_number/", catalogRoute("autodoc"), async (req, res) => {
   const { part_number } = req.params;
   const format = req.query.format || "json"; // Default to JSON if not specified
 
@@ -528,265 +580,120 @@ app.get("/autodoc/:part_number/", async (req, res) => {
     return res.status(400).json({ error: "part_number is required." });
   }
 
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "autodoc", "autodoc.py"),
-    part_number,
-  ]);
+  const {
+    code,
+    stdout: output,
+    stderr: error,
+    failure,
+  } = await runPython("autodoc/autodoc.py", [part_number]);
 
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", async (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
+  if (code !== 0) {
+    return sendScriptResult(res, code, output, error, 0, failure);
+  }
+  try {
+    const resultObj = JSON.parse(output.trim());
+
+    // Return JSON with OE numbers and image URL
+    if (format === "json") {
+      return res.json({
+        success: true,
+        oe_numbers: resultObj.oe_numbers || [],
+        image_url: resultObj.image || null,
+      });
     }
-    try {
-      const resultObj = JSON.parse(output.trim());
-
-      // Return JSON with OE numbers and image URL
-      if (format === "json") {
-        return res.json({
-          success: true,
-          oe_numbers: resultObj.oe_numbers || [],
-          image_url: resultObj.image || null,
-        });
+
+    // Return image directly
+    if (format === "image") {
+      if (!resultObj.image) {
+        return res
+          .status(404)
+          .json({ error: "No image found for this part" });
       }
 
-      // Return image directly
-      if (format === "image") {
-        if (!resultObj.image) {
-          return res
-            .status(404)
-            .json({ error: "No image found for this part" });
-        }
-
-        try {
-          const imageResponse = await axios.get(resultObj.image, {
-            responseType: "arraybuffer",
-          });
-          const contentType =
-            imageResponse.headers["content-type"] || "image/jpeg";
-          res.set("Content-Type", contentType);
-          return res.send(Buffer.from(imageResponse.data));
-        } catch (imageError) {
-          return res.status(500).json({
-            error: "Failed to fetch image",
-            details: imageError.message,
-          });
-        }
+      try {
+        const imageResponse = await axios.get(resultObj.image, {
+          responseType: "arraybuffer",
+        });
+        const contentType =
+          imageResponse.headers["content-type"] || "image/jpeg";
+        res.set("Content-Type", contentType);
+        return res.send(Buffer.from(imageResponse.data));
+      } catch (imageError) {
+        return res.status(500).json({
+          error: "Failed to fetch image",
+          details: imageError.message,
+        });
       }
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
     }
-  });
+  } catch (e) {
+    res.status(500).json({
+      error: "Invalid JSON from Python script.",
+      details: output.trim(),
+    });
+  }
 });
 
-app.get("/7zap/get-car-details/:vin", (req, res) => {
+// Answered without a browser while the VIN's modifications table, captured
+// by any 7zap VIN search, is fresh (7zap/store.py)
+app.get("/7zap/get-car-details/:vin", catalogRoute("7zap"), (req, res) => {
   const { vin } = req.params;
   if (!vin) {
     return res.status(400).json({ error: "VIN is required." });
   }
 
-  // Call the Python script to get car details
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "7zap", "get_car_details.py"),
-    vin,
-  ]);
-
-  pythonProcess.stdout.setEncoding("utf8");
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  relayJson(res, "7zap/get_car_details.py", [vin]);
 });
-app.post("/7zap/find-part", (req, res) => {
-  const { vin, part } = req.body;
-  if (!vin || !part) {
-    return res.status(400).json({ error: "vin and part are required." });
+// Parts missing from the shared keywords are forwarded as given, as they
+// always were; get_ac_parts.py answers them with an empty list.
+app.post("/7zap/find-part", resolvePart("7zap", { fallback: true }), catalogRoute("7zap"), (req, res) => {
+  const resolved = res.locals.resolved;
+  if (!resolved) {
+    return relayJson(res, "7zap/get_ac_parts.py", [req.body.vin, req.body.part]);
   }
-
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "7zap", "get_ac_parts.py"),
-    vin,
-    part,
-  ]);
-
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  relayJson(res, resolved.script, [req.body.vin, resolved.part]);
 });
-app.post("/mercedes/find-part", (req, res) => {
-  const { vin, part } = req.body;
-  if (!vin || !part) {
-    return res.status(400).json({ error: "vin and part are required." });
+// Several (or, without `parts`, all) AC parts from one visit of the AC section
+app.post("/7zap/ac-parts", catalogRoute("7zap"), (req, res) => {
+  const { vin, parts } = req.body || {};
+  if (!vin || (parts !== undefined && !Array.isArray(parts))) {
+    return res.status(400).json({ error: "VIN is required; parts must be an array." });
+  }
+  if (!parts) {
+    return relayJson(res, "7zap/get_ac_parts.py", [vin, "--all"]);
+  }
+  const unknown = parts.filter((p) => !keywords.resolve("7zap", p));
+  if (unknown.length || !parts.length) {
+    return res.status(400).json({
+      error: "Unsupported Keyword",
+      unsupported: unknown,
+      supported: keywords.supported("7zap"),
+    });
   }
 
-  // Call the Python script with vin and part as arguments
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "mercedes-scraper", "get_ac_parts.py"),
-    vin,
-    part,
-  ]);
-
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  const canonical = [...new Set(parts.map((p) => keywords.resolve("7zap", p).part))];
+  relayJson(res, "7zap/get_ac_parts.py", [vin, canonical.join(",")]);
+});
+app.post("/mercedes/find-part", resolvePart("mercedes"), catalogRoute("mercedes"), (req, res) => {
+  const { script, part } = res.locals.resolved;
+  relayJson(res, script, [req.body.vin, part]);
 });
 
-app.get("/mercedes/get-car-details/:vin", (req, res) => {
+app.get("/mercedes/get-car-details/:vin", catalogRoute("mercedes"), (req, res) => {
   const { vin } = req.params;
   if (!vin) {
     return res.status(400).json({ error: "VIN is required." });
   }
 
-  // Call the Python script to get car details
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "mercedes-scraper", "get_vehicle_data.py"),
-    vin,
-  ]);
-
-  pythonProcess.stdout.setEncoding("utf8");
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  relayJson(res, "mercedes-scraper/get_vehicle_data.py", [vin]);
 });
 
-app.get("/ssg/get-car-details/:vin", (req, res) => {
+app.get("/ssg/get-car-details/:vin", catalogRoute("ssg"), (req, res) => {
   const { vin } = req.params;
   if (!vin) {
     return res.status(400).json({ error: "VIN is required." });
   }
 
-  // Call the Python script to get car details
-  const pythonProcess = spawn("python3", [
-    path.join(__dirname, "ssg", "get_vehicle_data.py"),
-    vin,
-  ]);
-
-  pythonProcess.stdout.setEncoding("utf8");
-  let output = "";
-  let error = "";
-
-  pythonProcess.stdout.on("data", (data) => {
-    output += data.toString();
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    error += data.toString();
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code !== 0) {
-      return res.status(500).json({ error: error || "Python script error." });
-    }
-    try {
-      const resultObj = JSON.parse(output.trim());
-      res.json(resultObj);
-    } catch (e) {
-      res.status(500).json({
-        error: "Invalid JSON from Python script.",
-        details: output.trim(),
-      });
-    }
-  });
+  relayJson(res, "ssg/get_vehicle_data.py", [vin]);
 });
 
 // 404 Handler
@@ -800,11 +707,13 @@ app.use((req, res) => {
 // Start server
 app.listen(PORT, "0.0.0.0", async () => {
   //await initBrowser();
+  startForkserver();
   console.log(`[SERVER] Server running on port ${PORT}`);
 });
 
 // Handle shutdown gracefully
 process.on("SIGTERM", () => {
   console.log("[SERVER] SIGTERM received, shutting down gracefully");
+  stopForkserver();
   process.exit(0);
 });
@@ -0,0 +1,61 @@
+"""SSG session steps shared by the scripts.
+
+Every SSG run opens a page on a leased account (``scraper_common.accounts``)
+starting from that account's stored session, and logs in only when the
+login link still shows.
+"""
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from scraper_common import accounts
+from scraper_common.browser import launch_chromium
+from scraper_common.checkpoint import failure_reason
+from scraper_common.pagecheck import PageBlocked, goto
+
+SSG_URL = "https://ssg.asia/"
+
+# #login > div.menulogin > div > a.cboxElement
+_LOGIN_LINK = "#login > div.menulogin > div > a.cboxElement"
+
+
+def login(page, account: accounts.Account):
+    """Open SSG, logging in as ``account`` when the login link shows."""
+    goto(page, SSG_URL)
+    page.wait_for_load_state("domcontentloaded")
+    if page.locator(_LOGIN_LINK).count() == 0:
+        return
+    page.locator(_LOGIN_LINK).click()
+    page.wait_for_selector("#cboxLoadedContent")
+    page.locator("#iduserlogin").fill(account.user)
+    page.locator("#iduserpassword").fill(account.password)
+
+    ##cboxLoadedContent > form > table > tbody > tr:nth-child(3) > td:nth-child(2) > input
+    page.locator("#cboxLoadedContent > form > table > tbody > tr").nth(2).locator("td").nth(1).locator("input").click()
+    page.wait_for_selector("#cboxLoadedContent", state="detached")
+
+
+@contextmanager
+def open_session(p, headless: bool = True) -> Iterator[Any]:
+    """Logged-in SSG page on a leased account; the browser closes on exit.
+
+    The account's session is stored once logged in. A failed login or a
+    block page counts against the account.
+    """
+    with accounts.lease("ssg") as account:
+        browser = launch_chromium(p, headless=headless, timeout=30000)
+        logged_in = False
+        try:
+            context = browser.new_context(**account.context_options())
+            context.set_default_timeout(60000)
+            context.set_default_navigation_timeout(60000)
+            page = context.new_page()
+            login(page, account)
+            logged_in = True
+            account.save(context)
+            yield page
+        except Exception as e:
+            if not logged_in or isinstance(e, PageBlocked):
+                account.failed(failure_reason(e))
+            raise
+        finally:
+            browser.close()